@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""Benchmarks for the AccurateRip hot path in cdripper/accuraterip.py.
+
+Run with:  python3 bench_accuraterip.py [--json results.json] [--compare baseline.json]
+
+Times every available CRC backend (native, numpy, pure) on a synthetic track
+of CD length, and parse_bin()/verify_track() on a dBAR blob with many
+pressings, reporting throughput and peak Python memory. All input is made
+from a fixed seed, so runs on different commits are comparable; --compare
+exits with status 1 if anything got slower than --threshold allows. The CRC
+backends must agree with each other (CRCv1 from all of them, CRCv2 from
+native and numpy), or the run fails before any timing is reported.
+
+The module is imported directly by path so that importing the ``cdripper``
+package (which pulls in ``discid`` and ``picard``) is not required.
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import wave
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+_spec = importlib.util.spec_from_file_location(
+    'accuraterip', os.path.join(_HERE, 'cdripper', 'accuraterip.py')
+)
+accuraterip = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(accuraterip)
+
+SEED = 17
+SAMPLE_BYTES = 4  # one 16-bit stereo sample
+SAMPLES_PER_SECOND = 44100
+
+
+def crc_backends() -> dict:
+    """name -> f(wav_path, track_idx, total_tracks) returning (crcv1, crcv2)."""
+    backends = {}
+    if accuraterip._HAS_NATIVE:
+        backends['native'] = accuraterip._arc.calculate
+    if accuraterip._HAS_NUMPY:
+        backends['numpy'] = accuraterip._compute_crcs_numpy
+    backends['pure'] = lambda *args: (accuraterip._compute_crcv1_pure(*args), 0)
+    return backends
+
+
+def write_wav(path: str, seconds: float, rng: random.Random) -> int:
+    """Write a CD-format WAV of random PCM; return its size in PCM bytes."""
+    n_bytes = int(seconds * SAMPLES_PER_SECOND) * SAMPLE_BYTES
+    with wave.open(path, 'wb') as w:
+        w.setnchannels(2)
+        w.setsampwidth(2)
+        w.setframerate(SAMPLES_PER_SECOND)
+        for start in range(0, n_bytes, accuraterip.CHUNK_BYTES):
+            w.writeframes(rng.randbytes(min(accuraterip.CHUNK_BYTES, n_bytes - start)))
+    return n_bytes
+
+
+def make_bin(n_tracks: int, pressings: int, rng: random.Random) -> bytes:
+    """A dBAR blob with `pressings` matching pressings and a few of other lengths."""
+    data = bytearray()
+    for i in range(pressings):
+        n = n_tracks if i % 10 else n_tracks + 1  # every tenth is skipped by parse_bin
+        data += accuraterip.PRESSING_HEADER.pack(n, rng.getrandbits(32), rng.getrandbits(32),
+                                                 rng.getrandbits(32))
+        for _ in range(n):
+            data += accuraterip.TRACK_ENTRY.pack(rng.randrange(1, 200), rng.getrandbits(32),
+                                                 rng.getrandbits(32))
+    return bytes(data)
+
+
+def measure(fn, repeat: int) -> tuple[dict, object]:
+    """Time `repeat` runs of fn, then one more under tracemalloc for peak memory.
+
+    Returns ({'seconds': best wall time, 'peak_kib': ...}, fn's last result).
+    Memory allocated outside Python (the native backend) is not seen.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        value = fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'seconds': round(best, 6), 'peak_kib': round(peak / 1024, 1)}, value
+
+
+def run(seconds: float, n_tracks: int, pressings: int, repeat: int, backends: list) -> dict:
+    rng = random.Random(SEED)
+    available = crc_backends()
+    results = {}
+    tmpdir = tempfile.mkdtemp(prefix='bench-accuraterip-')
+    try:
+        wav_path = os.path.join(tmpdir, 'track.wav')
+        n_bytes = write_wav(wav_path, seconds, rng)
+        with open(wav_path, 'rb') as f:  # time the CRCs, not the first read from disk
+            while f.read(accuraterip.CHUNK_BYTES):
+                pass
+
+        crcs = {}
+        for name in backends or available:
+            if name not in available:
+                print(f'{name}: not available, skipped', file=sys.stderr)
+                continue
+            crc = available[name]
+            result, crcs[name] = measure(lambda: crc(wav_path, 1, 3), repeat)
+            result['mb_per_s'] = round(n_bytes / result['seconds'] / 1e6, 1)
+            results[f'crc_{name}'] = result
+        _check_agreement(crcs)
+    finally:
+        shutil.rmtree(tmpdir)
+
+    data = make_bin(n_tracks, pressings, rng)
+    result, _ = measure(lambda: accuraterip.parse_bin(data, n_tracks), repeat)
+    result['mb_per_s'] = round(len(data) / result['seconds'] / 1e6, 1)
+    results['parse_bin'] = result
+
+    # verify_track is first called on freshly parsed entries, so time it
+    # with the lazy CRC indexes still to be built.
+    parsed = [accuraterip.parse_bin(data, n_tracks) for _ in range(repeat + 1)]
+    wanted = [entries[len(entries) // 2][1:] for entries in parsed[0]]
+
+    def verify():
+        for entries, track_crcs in zip(parsed.pop(), wanted):
+            assert accuraterip.verify_track(track_crcs, entries)[0]
+
+    result, _ = measure(verify, repeat)
+    result['tracks_per_s'] = round(n_tracks / result['seconds'], 1)
+    results['verify_track'] = result
+    return results
+
+
+def _check_agreement(crcs: dict) -> None:
+    v1 = {name: c[0] for name, c in crcs.items()}
+    v2 = {name: c[1] for name, c in crcs.items() if name != 'pure'}
+    for label, values in (('CRCv1', v1), ('CRCv2', v2)):
+        if len(set(values.values())) > 1:
+            found = ', '.join(f'{name} {value:08x}' for name, value in values.items())
+            raise SystemExit(f'{label} differs between backends: {found}')
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Return a line for each benchmark more than threshold slower than in baseline."""
+    slower = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before and result['seconds'] > before['seconds'] * (1 + threshold):
+            slower.append(f'{name}: {before["seconds"]:.4f}s -> {result["seconds"]:.4f}s '
+                          f'({result["seconds"] / before["seconds"]:.2f}x)')
+    return slower
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=300,
+                        help='length of the synthetic track (default: %(default)s)')
+    parser.add_argument('--tracks', type=int, default=20,
+                        help='tracks per pressing in the dBAR blob (default: %(default)s)')
+    parser.add_argument('--pressings', type=int, default=500,
+                        help='pressings in the dBAR blob (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='timed runs per benchmark; the best is kept (default: %(default)s)')
+    parser.add_argument('--backend', action='append', dest='backends', default=[],
+                        help='CRC backend to time, e.g. numpy (repeatable; default: all available)')
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--compare', help='results file of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='allowed slowdown against --compare (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    results = run(args.seconds, args.tracks, args.pressings, args.repeat, args.backends)
+    for name, result in results.items():
+        rate = (f'{result["mb_per_s"]:8.1f} MB/s' if 'mb_per_s' in result
+                else f'{result["tracks_per_s"]:8.1f} tracks/s')
+        print(f'{name:14} {result["seconds"]:9.4f}s {rate}  peak {result["peak_kib"]:9.1f} KiB')
+
+    report = {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'crc_backend': accuraterip.crc_backend(),
+        'params': {'seconds': args.seconds, 'tracks': args.tracks,
+                   'pressings': args.pressings, 'repeat': args.repeat},
+        'results': results,
+    }
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline['params'] != report['params']:
+            print(f'warning: {args.compare} was run with {baseline["params"]}', file=sys.stderr)
+        slower = compare(results, baseline['results'], args.threshold)
+        for line in slower:
+            print(f'slower: {line}')
+        return 1 if slower else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
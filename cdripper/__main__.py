@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""Rip CDs without Picard: python -m cdripper DEVICE[,DEVICE...] OUTDIR
+
+Progress is written to stdout as one JSON object per line; see
+engine.Pipeline. With several drives they are ripped at the same time into
+OUTDIR/<drive name>, sharing one pool of worker threads (see engine.Farm).
+The exit status is 0 if every track verified (or the disc is not in the
+AccurateRip database), 1 if a track failed verification (or could not be
+verified because the database was unreachable, or --offline and the disc
+is not cached) and 2 if a rip itself failed.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from . import accuraterip, engine, scratch, trackstore
+
+
+def _default_cache_dir(name: str = 'accuraterip') -> str:
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(cache_home, 'cdripper', name)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m cdripper', description=__doc__.splitlines()[0])
+    parser.add_argument('device', help='CD device, e.g. /dev/sr0, or a comma-separated list of drives')
+    parser.add_argument('outdir', help='directory for the FLAC files')
+    parser.add_argument('--cdparanoia-opts', default=engine.CDPARANOIA_OPTS)
+    parser.add_argument('--flac-opts', default=engine.FLAC_OPTS)
+    parser.add_argument('--retries', type=int, default=3,
+                        help='re-rips of a track that fails AccurateRip (default: %(default)s)')
+    parser.add_argument('--offset-window', type=int, default=accuraterip.OFFSET_WINDOW,
+                        help='samples either side searched for the drive offset; 0 disables')
+    parser.add_argument('--whole-track-rerip', dest='segmented', action='store_false',
+                        help='re-rip whole tracks instead of only the disagreeing segments')
+    parser.add_argument('--streaming', action='store_true',
+                        help='pipe cdparanoia straight into flac without temporary WAV files')
+    parser.add_argument('--jobs', type=int, default=0,
+                        help='concurrent checksum and flac jobs (default: one per CPU)')
+    parser.add_argument('--cache-dir', default=_default_cache_dir(),
+                        help='AccurateRip cache directory (default: %(default)s)')
+    parser.add_argument('--offline', action='store_true',
+                        help='only use cached AccurateRip data')
+    parser.add_argument('--ar-url', default=accuraterip.BASE_URL,
+                        help='AccurateRip database or mirror to fetch from (default: %(default)s)')
+    parser.add_argument('--mirror',
+                        help='local AccurateRip mirror to look discs up in first '
+                             '(made with python -m cdripper.armirror)')
+    parser.add_argument('--job-dir',
+                        help='where unfinished rips are kept, to be resumed when the disc is '
+                             'ripped again (default: OUTDIR/.cdripper-jobs)')
+    parser.add_argument('--ram-dir', default=scratch.default_ram_root(),
+                        help='RAM-backed directory (tmpfs) for the WAV files of discs that fit; '
+                             'empty to always use --job-dir (default: %(default)s)')
+    parser.add_argument('--scratch-wait', type=float,
+                        help='seconds to wait for other drives to free scratch space before '
+                             'giving up on a disc (default: as long as that can help)')
+    parser.add_argument('--store-dir', default=_default_cache_dir('tracks'),
+                        help='where verified tracks are kept, so the disc is not read again '
+                             'next time (default: %(default)s)')
+    parser.add_argument('--store-size', type=int, default=trackstore.MAX_BYTES // 2**20,
+                        help='size limit of --store-dir in MiB; 0 disables it (default: %(default)s)')
+    args = parser.parse_args(argv)
+    try:
+        accuraterip.shared_client(args.ar_url)
+    except ValueError as e:
+        parser.error(str(e))
+
+    def progress(event: dict) -> None:
+        print(json.dumps(event), flush=True)
+
+    options = dict(
+        cdparanoia_opts=args.cdparanoia_opts, flac_opts=args.flac_opts, retries=args.retries,
+        offset_window=args.offset_window, segmented=args.segmented, streaming=args.streaming,
+        cache_dir=args.cache_dir, offline=args.offline, ar_url=args.ar_url,
+        mirror_path=args.mirror, job_dir=args.job_dir, ram_dir=args.ram_dir or None,
+        scratch_wait=args.scratch_wait,
+        store_dir=args.store_dir if args.store_size else None, store_bytes=args.store_size * 2**20)
+    devices = [device for device in args.device.split(',') if device]
+    if len(devices) == 1:
+        try:
+            discs = {devices[0]: engine.Pipeline(
+                devices[0], args.outdir, jobs=args.jobs, progress=progress, **options).run()}
+        except Exception as e:
+            progress({'event': 'error', 'device': devices[0], 'message': str(e)})
+            return 2
+    else:
+        discs = engine.Farm(devices, args.outdir, args.jobs, progress, **options).run()
+        for device, result in discs.items():
+            if isinstance(result, Exception):
+                progress({'event': 'error', 'device': device, 'message': str(result)})
+        if any(isinstance(result, Exception) for result in discs.values()):
+            return 2
+    ok = all(r['ar']['ok'] for results in discs.values() for r in results.values())
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
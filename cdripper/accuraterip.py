@@ -1,19 +1,57 @@
 # -*- coding: utf-8 -*-
 
-import struct
-import urllib.request
-import urllib.error
 import os
-from typing import Optional
-
-try:
-    import accuraterip_checksum as _arc
-    _HAS_NATIVE = True
-except ImportError:
-    _HAS_NATIVE = False
+import random
+import struct
+import threading
+import time
+import urllib.parse
+from array import array
+from typing import Iterable, Optional
 
 
 LEAD_IN = 150  # standard 2-second (150-sector) lead-in
+SKIP = 2940  # 5 CD frames * 588 samples/frame, ignored on the first/last track
+CANONICAL_HEADER = 44  # RIFF + fmt + data headers with no extra chunks
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+NUMPY_BATCH = 1 << 20  # samples per vectorized batch
+CHUNK_BYTES = 1 << 20  # PCM read per chunk; bounds memory use per verification
+PRESSING_HEADER = struct.Struct('<BIII')  # track count + 3 disc IDs
+TRACK_ENTRY = struct.Struct('<BII')  # confidence, crcv1, crcv2
+_U32 = 'I' if array('I').itemsize == 4 else 'L'
+BASE_URL = 'http://www.accuraterip.com/accuraterip'
+_BACKENDS = ('_arc', '_np', '_HAS_NATIVE', '_HAS_NUMPY')
+
+
+def _load_backends() -> None:
+    """Import the checksum backends, on first use rather than with this module.
+
+    NumPy alone takes longer to import than the rest of the plugin, and most
+    imports of this module (Picard loading its plugins, lookups) never
+    compute a checksum. _HAS_NUMPY is set last: its presence marks the
+    backends as loaded.
+    """
+    global _arc, _np, _HAS_NATIVE, _HAS_NUMPY
+    if '_HAS_NUMPY' in globals():
+        return
+    try:
+        import accuraterip_checksum as _arc
+    except ImportError:
+        _arc = None
+    try:
+        import numpy as _np
+    except ImportError:
+        _np = None
+    _HAS_NATIVE = _arc is not None
+    _HAS_NUMPY = _np is not None
+
+
+def __getattr__(name: str):
+    if name in _BACKENDS:
+        _load_backends()
+        return globals()[name]
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
 
 def compute_disc_ids(disc):
@@ -36,24 +74,163 @@ def compute_disc_ids(disc):
     return id1, id2, cddb_id
 
 
-def fetch(disc) -> Optional[bytes]:
-    """Fetch the AccurateRip .bin file for the disc. Returns None if not found."""
-    n = len(disc.tracks)
-    id1, id2, cddb_id = compute_disc_ids(disc)
-    filename = f'dBAR-{n:03d}-{id1:08x}-{id2:08x}-{cddb_id:08x}.bin'
-    url = (
-        f'http://www.accuraterip.com/accuraterip/'
-        f'{id1 & 0xF:x}/{(id1 >> 4) & 0xF:x}/{(id1 >> 8) & 0xF:x}/{filename}'
-    )
-    try:
-        with urllib.request.urlopen(url, timeout=10) as resp:
-            return resp.read()
-    except urllib.error.HTTPError as e:
-        if e.code == 404:
-            return None
-        raise
-    except Exception:
-        return None
+class FetchError(Exception):
+    """The AccurateRip database could not be reached, or answered with an error."""
+
+
+class NotCached(FetchError):
+    """Offline, and the disc is in neither the mirror nor the cache, so it was not looked up."""
+
+
+class Client:
+    """Keep-alive HTTP client for the AccurateRip database, safe to share between threads.
+
+    Up to max_connections persistent connections to base_url are kept and
+    each lent to one request at a time, so lookups for many discs run side
+    by side without a new connection each. Transport errors and 429/5xx
+    answers are retried up to `retries` times, after a backoff that doubles
+    from `backoff` up to max_backoff seconds, with full jitter. base_url may
+    point at a mirror or a local stand-in. http.client (and the email
+    package under it) is only imported once a client is made.
+    """
+    RETRY_STATUS = frozenset({429, 500, 502, 503, 504})
+
+    def __init__(
+        self,
+        base_url: str = BASE_URL,
+        max_connections: int = 4,
+        timeout: float = 10.0,
+        retries: int = 3,
+        backoff: float = 0.5,
+        max_backoff: float = 8.0,
+    ) -> None:
+        import http.client
+
+        parts = urllib.parse.urlsplit(base_url)
+        if parts.scheme not in ('http', 'https') or not parts.netloc:
+            raise ValueError(f'Not an http(s) URL: {base_url}')
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._connection_class = (http.client.HTTPSConnection if parts.scheme == 'https'
+                                  else http.client.HTTPConnection)
+        self._netloc = parts.netloc
+        self._prefix = parts.path.rstrip('/')
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._lock = threading.Lock()
+        self._idle: list = []
+
+    def get(self, path: str) -> Optional[bytes]:
+        """Return the body of base_url/path, or None if the server has no such file.
+
+        Raises FetchError once the retries are used up.
+        """
+        import http.client
+
+        error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1))))
+            try:
+                status, data = self._request(f'{self._prefix}/{path}')
+            except (OSError, http.client.HTTPException) as e:
+                error = e
+                continue
+            if status == 200:
+                return data
+            if status == 404:
+                return None
+            error = f'HTTP {status}'
+            if status not in self.RETRY_STATUS:
+                break
+        raise FetchError(f'{self.base_url}/{path}: {error}')
+
+    def close(self) -> None:
+        """Close the idle connections; connections in use close when their request is done."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+    def _request(self, path: str) -> tuple[int, bytes]:
+        import http.client
+
+        with self._slots:
+            with self._lock:
+                connection = self._idle.pop() if self._idle else None
+            if connection is not None:
+                try:
+                    return self._send(connection, path)
+                except (http.client.RemoteDisconnected, ConnectionError):
+                    pass  # closed by the server while idle; not worth a backoff
+            return self._send(self._connection_class(self._netloc, timeout=self.timeout), path)
+
+    def _send(self, connection: 'http.client.HTTPConnection', path: str) -> tuple[int, bytes]:
+        try:
+            connection.request('GET', path)
+            response = connection.getresponse()
+            data = response.read()
+        except BaseException:
+            connection.close()
+            raise
+        if response.will_close:
+            connection.close()
+        else:
+            with self._lock:
+                self._idle.append(connection)
+        return response.status, data
+
+
+_clients: dict = {}
+_clients_lock = threading.Lock()
+
+
+def shared_client(base_url: str = BASE_URL) -> Client:
+    """The Client every lookup of base_url in this process shares."""
+    with _clients_lock:
+        if base_url not in _clients:
+            _clients[base_url] = Client(base_url)
+        return _clients[base_url]
+
+
+def bin_path(disc) -> str:
+    """Path of the disc's .bin file below the database's base URL."""
+    id1, _, _ = compute_disc_ids(disc)
+    return f'{id1 & 0xF:x}/{(id1 >> 4) & 0xF:x}/{(id1 >> 8) & 0xF:x}/dBAR-{disc_id_string(disc)}.bin'
+
+
+def fetch(disc, cache=None, offline: bool = False, client=None, mirror=None) -> Optional[bytes]:
+    """Fetch the AccurateRip .bin file for the disc. Returns None if not found.
+
+    mirror is an armirror.Mirror (or anything with the same get method),
+    consulted first; discs it does not have are looked up as usual. cache is
+    an arcache.BinCache (or anything with the same get/put methods). Hits,
+    including remembered 404s, are served without touching the network;
+    downloads and 404s are stored in it. With offline=True only the mirror
+    and the cache are consulted, and NotCached is raised for a disc in
+    neither: unlike a remembered 404, that says nothing about the database.
+    client is a Client (by default the shared_client() of BASE_URL); if the
+    database cannot be reached its FetchError is raised, and nothing is
+    cached.
+    """
+    disc_id = disc_id_string(disc)
+    if mirror is not None:
+        data = mirror.get(disc_id)
+        if data is not None:
+            return data
+    if cache is not None:
+        hit, data = cache.get(disc_id)
+        if hit:
+            return data
+    if offline:
+        raise NotCached(f'{disc_id} is not in the AccurateRip cache, and only cached data may be used')
+
+    data = (client or shared_client()).get(bin_path(disc))
+    if cache is not None:
+        cache.put(disc_id, data)
+    return data
 
 
 def disc_id_string(disc) -> str:
@@ -63,83 +240,466 @@ def disc_id_string(disc) -> str:
     return f'{n:03d}-{id1:08x}-{id2:08x}-{cddb_id:08x}'
 
 
-def parse_bin(data: bytes, n_tracks: int) -> list[list[tuple[int, int, int]]]:
+class TrackEntries:
+    """One track's AccurateRip entries, packed into typed arrays.
+
+    Behaves as a read-only sequence of (confidence, crcv1, crcv2) tuples, at
+    9 bytes per pressing. The indexes mapping each CRC to the best confidence
+    of any pressing with it are built on first use, so a cached disc that is
+    never verified does not pay for them.
+    """
+    __slots__ = ('_confidence', '_crcv1', '_crcv2', '_v1_index', '_v2_index')
+
+    def __init__(self, confidence: array, crcv1: array, crcv2: array) -> None:
+        self._confidence = confidence
+        self._crcv1 = crcv1
+        self._crcv2 = crcv2
+        self._v1_index: Optional[dict[int, int]] = None
+        self._v2_index: Optional[dict[int, int]] = None
+
+    @classmethod
+    def from_tuples(cls, entries: Iterable[tuple[int, int, int]]) -> 'TrackEntries':
+        confidence, crcv1, crcv2 = array('B'), array(_U32), array(_U32)
+        for conf, v1, v2 in entries:
+            confidence.append(conf)
+            crcv1.append(v1)
+            crcv2.append(v2)
+        return cls(confidence, crcv1, crcv2)
+
+    def __len__(self) -> int:
+        return len(self._confidence)
+
+    def __getitem__(self, i: int) -> tuple[int, int, int]:
+        return self._confidence[i], self._crcv1[i], self._crcv2[i]
+
+    def __iter__(self):
+        return zip(self._confidence, self._crcv1, self._crcv2)
+
+    def __repr__(self) -> str:
+        return f'TrackEntries({list(self)!r})'
+
+    def v1_index(self) -> dict[int, int]:
+        """CRCv1 -> best confidence."""
+        if self._v1_index is None:
+            self._v1_index = _best_confidence(self._crcv1, self._confidence)
+        return self._v1_index
+
+    def v2_index(self) -> dict[int, int]:
+        """CRCv2 -> best confidence. Pressings without a CRCv2 are left out."""
+        if self._v2_index is None:
+            self._v2_index = _best_confidence(self._crcv2, self._confidence)
+            self._v2_index.pop(0, None)
+        return self._v2_index
+
+    def pressings(self, crcs: tuple[int, int]) -> dict[int, int]:
+        """Pressing index -> confidence of each pressing matching (crcv1, crcv2).
+
+        A crcv2 of 0 matches nothing, as in verify_track().
+        """
+        crcv1, crcv2 = crcs
+        return {i: conf for i, (conf, v1, v2) in enumerate(self)
+                if conf and (v1 == crcv1 or (crcv2 and v2 == crcv2))}
+
+
+def _best_confidence(crcs: array, confidence: array) -> dict[int, int]:
+    index: dict[int, int] = {}
+    for crc, conf in zip(crcs, confidence):
+        if conf > index.get(crc, 0):
+            index[crc] = conf
+    return index
+
+
+def parse_bin(data: bytes, n_tracks: int) -> list[TrackEntries]:
     """Parse AccurateRip .bin data.
 
-    Returns a list of length n_tracks, where each element is a list of
-    (confidence, crcv1, crcv2) tuples — one per pressing in the database.
+    Returns a list of length n_tracks, where each element is a TrackEntries
+    sequence of (confidence, crcv1, crcv2) — one per pressing in the database.
+    Pressings with a different track count are skipped.
     """
-    results: list[list[tuple[int, int, int]]] = [[] for _ in range(n_tracks)]
+    if n_tracks <= 0:
+        return []
+    # Gather the entries of every matching pressing, then decode them in one
+    # pass. Entry k belongs to track k % n_tracks, so a pressing cut short at
+    # the end of the data still lines up.
+    records = bytearray()
+    view = memoryview(data)
     offset = 0
-    while offset < len(data):
-        if offset + 13 > len(data):
-            break
-        n = struct.unpack_from('B', data, offset)[0]
-        offset += 1 + 4 + 4 + 4  # skip track count + 3 disc IDs
-        if n != n_tracks:
-            # Different pressing with different track count — skip
-            offset += n * 9
-            continue
-        for i in range(n):
-            if offset + 9 > len(data):
-                break
-            confidence = struct.unpack_from('B', data, offset)[0]
-            crcv1 = struct.unpack_from('<I', data, offset + 1)[0]
-            crcv2 = struct.unpack_from('<I', data, offset + 5)[0]
-            results[i].append((confidence, crcv1, crcv2))
-            offset += 9
-    return results
+    while offset + PRESSING_HEADER.size <= len(data):
+        n = data[offset]
+        offset += PRESSING_HEADER.size
+        size = n * TRACK_ENTRY.size
+        if n == n_tracks:
+            records += view[offset:offset + size]
+        offset += size
+    del records[len(records) - len(records) % TRACK_ENTRY.size:]
+
+    confidence, crcv1, crcv2 = array('B'), array(_U32), array(_U32)
+    for conf, v1, v2 in TRACK_ENTRY.iter_unpack(records):
+        confidence.append(conf)
+        crcv1.append(v1)
+        crcv2.append(v2)
+    return [
+        TrackEntries(confidence[i::n_tracks], crcv1[i::n_tracks], crcv2[i::n_tracks])
+        for i in range(n_tracks)
+    ]
+
+
+def _track_entries(entries: Iterable[tuple[int, int, int]]) -> TrackEntries:
+    if isinstance(entries, TrackEntries):
+        return entries
+    return TrackEntries.from_tuples(entries)
+
+
+def crc_backend() -> str:
+    """Name of the backend compute_crcs() will use: 'native', 'numpy' or 'pure'."""
+    _load_backends()
+    if _HAS_NATIVE:
+        return 'native'
+    if _HAS_NUMPY:
+        return 'numpy'
+    return 'pure'
 
 
 def compute_crcs(wav_path: str, track_idx: int, total_tracks: int) -> tuple[int, int]:
     """Compute AccurateRip CRCv1 and CRCv2 for a WAV file.
 
-    track_idx is 0-based. Uses the C extension if available, else pure Python
-    (CRCv1 only; returns 0 for CRCv2 in the fallback case).
+    track_idx is 0-based. Uses the C extension if available, then NumPy, else
+    pure Python (CRCv1 only; returns 0 for CRCv2 in the fallback case). The C
+    extension is only handed files with a canonical 44-byte header; anything
+    with extra chunks goes through the Python backends, which parse the RIFF
+    structure. Raises ValueError if the file is not CD-format PCM.
     """
+    _load_backends()
     if _HAS_NATIVE:
-        return _arc.calculate(wav_path, track_idx, total_tracks)
+        with open(wav_path, 'rb') as f:
+            offset, _ = parse_wav_header(f)
+        if offset == CANONICAL_HEADER:
+            return _arc.calculate(wav_path, track_idx, total_tracks)
+        if not _HAS_NUMPY:
+            return _compute_crcv1_pure(wav_path, track_idx, total_tracks), 0
+    if _HAS_NUMPY:
+        return _compute_crcs_numpy(wav_path, track_idx, total_tracks)
     return _compute_crcv1_pure(wav_path, track_idx, total_tracks), 0
 
 
-def _compute_crcv1_pure(wav_path: str, track_idx: int, total_tracks: int) -> int:
-    """Pure-Python AccurateRip CRCv1 implementation."""
-    SKIP = 2940  # 5 CD frames * 588 samples/frame
-    WAV_HEADER = 44
+def _check_range(count: int, track_idx: int, total_tracks: int) -> tuple[int, int]:
+    """Return the inclusive range of 1-based sample multipliers that are summed.
+
+    Matches the reference implementation: the first track ignores multipliers
+    below SKIP and the last track ignores the final SKIP samples.
+    """
+    first = SKIP if track_idx == 0 else 1
+    last = count - SKIP if track_idx == total_tracks - 1 else count
+    return first, last
+
+
+def parse_wav_header(f) -> tuple[int, int]:
+    """Locate the PCM samples in a RIFF/WAVE file.
+
+    Walks the chunk list of the open binary file f, skipping LIST, fact and any
+    other chunks, and returns (offset, length) of the ``data`` payload. Raises
+    ValueError unless the audio is 16-bit 44.1 kHz stereo PCM.
+    """
+    size = os.fstat(f.fileno()).st_size
+    f.seek(0)
+    header = f.read(12)
+    if len(header) < 12 or header[:4] != b'RIFF' or header[8:] != b'WAVE':
+        raise ValueError('not a RIFF/WAVE file')
+
+    have_fmt = False
+    pos = 12
+    while pos + 8 <= size:
+        f.seek(pos)
+        chunk_id, chunk_len = struct.unpack('<4sI', f.read(8))
+        pos += 8
+        if chunk_id == b'fmt ':
+            fmt = f.read(chunk_len)
+            if len(fmt) < 16:
+                raise ValueError('truncated fmt chunk')
+            tag, channels, rate, _, _, bits = struct.unpack_from('<HHIIHH', fmt)
+            if tag == WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+                tag = struct.unpack_from('<H', fmt, 24)[0]  # SubFormat GUID prefix
+            if tag != WAVE_FORMAT_PCM or (channels, rate, bits) != (2, 44100, 16):
+                raise ValueError(
+                    f'unsupported WAV format (tag {tag:#06x}, {channels} channels, '
+                    f'{rate} Hz, {bits}-bit); expected 16-bit 44.1 kHz stereo PCM')
+            have_fmt = True
+        elif chunk_id == b'data':
+            if not have_fmt:
+                raise ValueError('WAV data chunk precedes fmt chunk')
+            # Writers that stream to a pipe may leave a placeholder length.
+            return pos, min(chunk_len, size - pos)
+        pos += chunk_len + (chunk_len & 1)  # chunks are word-aligned
+    raise ValueError('WAV file has no data chunk')
+
+
+class CrcAccumulator:
+    """Incremental AccurateRip CRCv1/CRCv2 over a stream of PCM chunks.
 
+    n_samples is the total length of the track, which is needed up front for
+    the last-track skip. Only the running sample index and partial sums are
+    kept between chunks, so memory use does not depend on the track length.
+    Chunks may split a sample; the leftover bytes are carried into the next
+    update(). Without NumPy only CRCv1 is computed (CRCv2 is reported as 0).
+    """
+
+    def __init__(
+        self,
+        n_samples: int,
+        track_idx: int,
+        total_tracks: int,
+        use_numpy: Optional[bool] = None,
+    ) -> None:
+        self._first, self._last = _check_range(n_samples, track_idx, total_tracks)
+        _load_backends()
+        self._use_numpy = _HAS_NUMPY if use_numpy is None else use_numpy
+        self._pos = 0  # 0-based index of the next sample
+        self._lo = 0
+        self._hi = 0
+        self._partial = b''
+
+    def update(self, data) -> None:
+        view = memoryview(data).cast('B')
+        if self._partial:
+            need = 4 - len(self._partial)
+            self._partial += bytes(view[:need])
+            view = view[need:]
+            if len(self._partial) < 4:
+                return
+            self._add(memoryview(self._partial))
+            self._partial = b''
+        aligned = len(view) & ~3
+        if aligned < len(view):
+            self._partial = bytes(view[aligned:])
+        if aligned:
+            self._add(view[:aligned])
+
+    def crcs(self) -> tuple[int, int]:
+        """Return (crcv1, crcv2) for the samples seen so far."""
+        lo = self._lo & 0xFFFFFFFF
+        if not self._use_numpy:
+            return lo, 0
+        return lo, (self._lo + self._hi) & 0xFFFFFFFF
+
+    def _add(self, view: memoryview) -> None:
+        # view holds whole samples; clip it to the multipliers that count.
+        pos = self._pos
+        count = len(view) // 4
+        self._pos += count
+        start = max(self._first - 1 - pos, 0)
+        stop = min(self._last - pos, count)
+        if start >= stop:
+            return
+        if self._use_numpy:
+            self._add_numpy(view, pos, start, stop)
+        else:
+            self._add_pure(view, pos, start, stop)
+
+    def _add_numpy(self, view: memoryview, pos: int, start: int, stop: int) -> None:
+        # A batch of NUMPY_BATCH low halves stays well below 2**64, so the
+        # per-batch sums cannot overflow.
+        samples = _np.frombuffer(view, dtype='<u4')
+        for begin in range(start, stop, NUMPY_BATCH):
+            end = min(begin + NUMPY_BATCH, stop)
+            products = samples[begin:end].astype(_np.uint64)
+            products *= _np.arange(pos + begin + 1, pos + end + 1, dtype=_np.uint64)
+            self._lo += int((products & 0xFFFFFFFF).sum(dtype=_np.uint64))
+            self._hi += int((products >> 32).sum(dtype=_np.uint64))
+
+    def _add_pure(self, view: memoryview, pos: int, start: int, stop: int) -> None:
+        crc = self._lo
+        samples = struct.iter_unpack('<I', view[start * 4:stop * 4])
+        for mul, (sample,) in enumerate(samples, start=pos + start + 1):
+            crc += mul * sample
+        self._lo = crc & 0xFFFFFFFF
+
+
+def _read_chunks(f, length: int):
+    """Yield up to length bytes from f as memoryviews over one reused buffer.
+
+    Each view is only valid until the next one is produced.
+    """
+    buf = bytearray(CHUNK_BYTES)
+    while length > 0:
+        n = f.readinto(memoryview(buf)[:min(length, CHUNK_BYTES)])
+        if not n:
+            break
+        length -= n
+        yield memoryview(buf)[:n]
+
+
+def _compute_crcs_file(
+    wav_path: str, track_idx: int, total_tracks: int, use_numpy: bool,
+) -> tuple[int, int]:
     with open(wav_path, 'rb') as f:
-        f.seek(WAV_HEADER)
-        raw = f.read()
+        offset, length = parse_wav_header(f)
+        f.seek(offset)
+        acc = CrcAccumulator(length // 4, track_idx, total_tracks, use_numpy=use_numpy)
+        for chunk in _read_chunks(f, length):
+            acc.update(chunk)
+    return acc.crcs()
+
 
-    count = len(raw) // 4
-    is_first = track_idx == 0
-    is_last = track_idx == total_tracks - 1
+def _compute_crcs_numpy(wav_path: str, track_idx: int, total_tracks: int) -> tuple[int, int]:
+    """Vectorized AccurateRip CRCv1 and CRCv2 implementation.
+
+    Each stereo sample is read as one little-endian uint32. The 64-bit products
+    sample * multiplier are summed in batches; the low halves give CRCv1 and
+    low + high halves give CRCv2.
+    """
+    return _compute_crcs_file(wav_path, track_idx, total_tracks, use_numpy=True)
 
-    skip_start = SKIP if is_first else 0
-    skip_end = SKIP if is_last else 0
 
-    crc = 0
-    for i in range(count - skip_end):
-        sample = struct.unpack_from('<I', raw, i * 4)[0]
-        if i < skip_start:
-            continue
-        crc = (crc + (i + 1) * sample) & 0xFFFFFFFF
-    return crc
+def _compute_crcv1_pure(wav_path: str, track_idx: int, total_tracks: int) -> int:
+    """Pure-Python AccurateRip CRCv1 implementation."""
+    return _compute_crcs_file(wav_path, track_idx, total_tracks, use_numpy=False)[0]
 
 
 def verify_track(
     crcs: tuple[int, int],
-    entries: list[tuple[int, int, int]],
+    entries: Iterable[tuple[int, int, int]],
 ) -> tuple[bool, int]:
     """Check computed CRCs against AccurateRip database entries.
 
+    entries is a TrackEntries (or any iterable of (confidence, crcv1, crcv2)).
     Returns (matched, best_confidence).
     """
     crcv1, crcv2 = crcs
-    best_confidence = 0
-    for confidence, db_crcv1, db_crcv2 in entries:
-        if crcv1 == db_crcv1 or (crcv2 and crcv2 == db_crcv2):
-            if confidence > best_confidence:
-                best_confidence = confidence
+    entries = _track_entries(entries)
+    best_confidence = entries.v1_index().get(crcv1, 0)
+    if crcv2:
+        best_confidence = max(best_confidence, entries.v2_index().get(crcv2, 0))
     matched = best_confidence > 0
     return matched, best_confidence
+
+
+OFFSET_WINDOW = 2940  # default +/- samples searched for the drive read offset
+
+
+def offset_crcs(
+    wav_path: str,
+    track_idx: int,
+    total_tracks: int,
+    max_offset: int = OFFSET_WINDOW,
+    prev_wav_path: Optional[str] = None,
+    next_wav_path: Optional[str] = None,
+) -> dict[int, int]:
+    """Return {offset: crcv1} for every read offset in [-max_offset, max_offset].
+
+    An offset of s checksums the track as if it had been read s samples later,
+    i.e. it is the correction to pass to cdparanoia's --sample-offset. Samples
+    shifted in from beyond the track come from the neighbouring track files if
+    given, else are treated as silence.
+
+    The audio is read once: the samples shared by every shifted window are
+    summed in a single pass, then the window slides one sample at a time by
+    adjusting only its two edges, using crc(s) = sum((k + 1) * x[k]) - s * sum(x[k])
+    over the window's 0-based sample indices k.
+    """
+    with open(wav_path, 'rb') as f:
+        _, length = parse_wav_header(f)
+    count = length // 4
+    first, last = _check_range(count, track_idx, total_tracks)
+    a, b = first - 1, last - 1  # 0-based window at offset 0, inclusive
+    m = max(min(max_offset, (b - a + 1) // 2), 0)
+
+    sum0, sum1 = _window_sums(wav_path, a + m, b - m + 1)
+    head = _context_samples(wav_path, count, prev_wav_path, next_wav_path, a - m, a + m)
+    tail = _context_samples(wav_path, count, prev_wav_path, next_wav_path, b - m + 1, b + m + 1)
+    for k, x in enumerate(head, start=a - m):
+        sum0 += x
+        sum1 += (k + 1) * x
+
+    crcs = {}
+    for s in range(-m, m + 1):
+        crcs[s] = (sum1 - s * sum0) & 0xFFFFFFFF
+        if s == m:
+            break
+        x, k = head[s + m], a + s  # leaves the window
+        sum0 -= x
+        sum1 -= (k + 1) * x
+        x, k = tail[s + m], b + s + 1  # enters the window
+        sum0 += x
+        sum1 += (k + 1) * x
+    return crcs
+
+
+def find_offsets(
+    crcs_by_offset: dict[int, int],
+    entries: Iterable[tuple[int, int, int]],
+) -> list[tuple[int, int]]:
+    """Match offset_crcs() output against AccurateRip database entries.
+
+    Returns (offset, confidence) for every offset whose CRCv1 matches a
+    pressing, best confidence first and smaller shifts first among equals.
+    """
+    index = _track_entries(entries).v1_index()
+    # An all-silent window sums to 0 at every offset, so 0 never counts.
+    matches = [(s, index[crc]) for s, crc in crcs_by_offset.items() if crc and crc in index]
+    matches.sort(key=lambda match: (-match[1], abs(match[0])))
+    return matches
+
+
+def _window_sums(wav_path: str, start: int, stop: int) -> tuple[int, int]:
+    """Return (sum(x[k]), sum((k + 1) * x[k])) mod 2**32 for k in [start, stop)."""
+    sum0 = sum1 = 0
+    if start >= stop:
+        return sum0, sum1
+    _load_backends()
+    with open(wav_path, 'rb') as f:
+        offset, _ = parse_wav_header(f)
+        f.seek(offset + start * 4)
+        k = start
+        for chunk in _read_chunks(f, (stop - start) * 4):
+            n = len(chunk) // 4
+            if _HAS_NUMPY:
+                samples = _np.frombuffer(chunk, dtype='<u4', count=n)
+                products = samples.astype(_np.uint64)
+                products *= _np.arange(k + 1, k + n + 1, dtype=_np.uint64)
+                sum0 += int(samples.sum(dtype=_np.uint64))
+                sum1 += int((products & 0xFFFFFFFF).sum(dtype=_np.uint64))
+            else:
+                for mul, (x,) in enumerate(struct.iter_unpack('<I', chunk[:n * 4]), start=k + 1):
+                    sum0 += x
+                    sum1 += mul * x
+            k += n
+    return sum0 & 0xFFFFFFFF, sum1 & 0xFFFFFFFF
+
+
+def _read_samples(wav_path: Optional[str], start: int, stop: int) -> list[int]:
+    """Return samples [start, stop) of wav_path; anything outside it reads as 0."""
+    samples = [0] * max(stop - start, 0)
+    if wav_path is None:
+        return samples
+    with open(wav_path, 'rb') as f:
+        offset, length = parse_wav_header(f)
+        lo, hi = max(start, 0), min(stop, length // 4)
+        if lo < hi:
+            f.seek(offset + lo * 4)
+            samples[lo - start:hi - start] = struct.unpack(f'<{hi - lo}I', f.read((hi - lo) * 4))
+    return samples
+
+
+def _context_samples(
+    wav_path: str,
+    count: int,
+    prev_wav_path: Optional[str],
+    next_wav_path: Optional[str],
+    start: int,
+    stop: int,
+) -> list[int]:
+    """Samples [start, stop) of a track of count samples, extended into its neighbours."""
+    samples = []
+    if start < 0:
+        prev_count = _sample_count(prev_wav_path) if prev_wav_path else 0
+        samples += _read_samples(prev_wav_path, prev_count + start, prev_count + min(stop, 0))
+    if start < count and stop > 0:
+        samples += _read_samples(wav_path, max(start, 0), min(stop, count))
+    if stop > count:
+        samples += _read_samples(next_wav_path, max(start, count) - count, stop - count)
+    return samples
+
+
+def _sample_count(wav_path: str) -> int:
+    with open(wav_path, 'rb') as f:
+        return parse_wav_header(f)[1] // 4
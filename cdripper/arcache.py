@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+
+import os
+import tempfile
+import time
+from typing import Optional
+
+
+MAX_BYTES = 64 * 1024 * 1024
+MAX_AGE = 30 * 24 * 3600  # seconds a downloaded .bin is trusted
+NEGATIVE_TTL = 24 * 3600  # seconds a "not in database" answer is trusted
+
+_FOUND = '.bin'
+_MISSING = '.missing'
+
+
+class BinCache:
+    """On-disk cache of AccurateRip .bin responses keyed by disc ID string.
+
+    Each disc is one file: ``dBAR-<disc id>.bin`` holds the downloaded data and
+    an empty ``dBAR-<disc id>.missing`` records a 404. Entries expire after
+    max_age (negative_ttl for 404s); when the directory grows past max_bytes
+    the least recently used entries are removed.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int = MAX_BYTES,
+        max_age: float = MAX_AGE,
+        negative_ttl: float = NEGATIVE_TTL,
+    ) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.negative_ttl = negative_ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def get(self, disc_id: str) -> tuple[bool, Optional[bytes]]:
+        """Return (hit, data); data is None for a cached "not in database"."""
+        now = time.time()
+        for suffix, ttl in ((_FOUND, self.max_age), (_MISSING, self.negative_ttl)):
+            path = self._path(disc_id, suffix)
+            try:
+                age = now - os.stat(path).st_mtime
+                if age > ttl:
+                    os.unlink(path)
+                    continue
+                if suffix == _MISSING:
+                    return True, None
+                with open(path, 'rb') as f:
+                    data = f.read()
+                os.utime(path, (now, os.stat(path).st_mtime))  # access time drives LRU
+                return True, data
+            except OSError:
+                continue
+        return False, None
+
+    def put(self, disc_id: str, data: Optional[bytes]) -> None:
+        """Store a response; pass None to record that the disc is not in the database.
+
+        The cache is best-effort: write failures are ignored.
+        """
+        suffix, stale = (_MISSING, _FOUND) if data is None else (_FOUND, _MISSING)
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        except OSError:
+            return
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data or b'')
+            os.replace(tmp, self._path(disc_id, suffix))
+        except OSError:
+            self._remove(tmp)
+            return
+        self._remove(self._path(disc_id, stale))
+        self.evict()
+
+    def evict(self) -> None:
+        """Remove expired entries, then least recently used ones until under max_bytes."""
+        now = time.time()
+        entries = []
+        for entry in os.scandir(self.directory):
+            name = entry.name
+            if not name.startswith('dBAR-'):
+                continue
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            ttl = self.negative_ttl if name.endswith(_MISSING) else self.max_age
+            if now - st.st_mtime > ttl:
+                self._remove(entry.path)
+                continue
+            entries.append((st.st_atime, st.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def _path(self, disc_id: str, suffix: str) -> str:
+        return os.path.join(self.directory, f'dBAR-{disc_id}{suffix}')
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
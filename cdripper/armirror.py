@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""Local AccurateRip mirror: python -m cdripper.armirror import|compact|info DB ...
+
+Keeps the dBAR data of many discs in one SQLite file, so an offline site
+can look discs up without the network and without a directory of thousands
+of small .bin files. Import reads .bin files (or trees of them, as laid out
+on the AccurateRip server) and can be repeated to add new ones; files
+imported before and unchanged since are skipped.
+"""
+
+import argparse
+import os
+import re
+import sqlite3
+import struct
+import sys
+import threading
+from typing import Iterable, Optional
+
+PRESSING_HEADER = struct.Struct('<BIII')  # track count + 3 disc IDs
+TRACK_ENTRY = struct.Struct('<BII')  # confidence, crcv1, crcv2
+
+_NAME = re.compile(r'dBAR-(\d{3})-([0-9a-f]{8})-([0-9a-f]{8})-([0-9a-f]{8})\.bin$', re.IGNORECASE)
+_DISC_ID = re.compile(r'(\d{3})-([0-9a-f]{8})-([0-9a-f]{8})-([0-9a-f]{8})$', re.IGNORECASE)
+_IMPORT_BATCH = 1000  # files per transaction
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS discs (
+    n_tracks INTEGER NOT NULL,
+    id1 INTEGER NOT NULL,
+    id2 INTEGER NOT NULL,
+    cddb_id INTEGER NOT NULL,
+    entries BLOB NOT NULL,
+    source_size INTEGER NOT NULL,
+    source_mtime INTEGER NOT NULL,
+    PRIMARY KEY (n_tracks, id1, id2, cddb_id)
+) WITHOUT ROWID
+'''
+
+
+class Mirror:
+    """SQLite store of AccurateRip data indexed by (n_tracks, id1, id2, cddb_id).
+
+    Each disc is one row holding the track entries of its pressings, packed
+    as in a .bin file but without the per-pressing headers (which repeat the
+    disc IDs). Only pressings with the disc's track count are kept, since
+    accuraterip.parse_bin() skips the others. get() rebuilds the .bin data,
+    so a mirror can stand in for the download. A mirror opened read-only
+    can be shared by lookups on several threads.
+    """
+
+    def __init__(self, path: str, readonly: bool = False) -> None:
+        self.path = path
+        if readonly:
+            uri = 'file:' + os.path.abspath(path).replace('?', '%3f').replace('#', '%23') + '?mode=ro'
+            self._db = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        else:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(_SCHEMA)
+            self._db.commit()
+        self._lock = threading.Lock()
+
+    def get(self, disc_id: str) -> Optional[bytes]:
+        """The .bin data of a disc ID string (see accuraterip.disc_id_string()), or None."""
+        match = _DISC_ID.match(disc_id)
+        if match is None:
+            return None
+        key = _key(match)
+        with self._lock:
+            row = self._db.execute(
+                'SELECT entries FROM discs WHERE n_tracks=? AND id1=? AND id2=? AND cddb_id=?',
+                key).fetchone()
+        if row is None:
+            return None
+        entries = row[0]
+        header = PRESSING_HEADER.pack(*key)
+        size = key[0] * TRACK_ENTRY.size
+        return b''.join(header + entries[i:i + size] for i in range(0, len(entries), size))
+
+    def import_files(self, paths: Iterable[str]) -> tuple[int, int, int]:
+        """Import .bin files and directory trees of them.
+
+        Returns (imported, unchanged, rejected) counts. Files are rejected if
+        their name is not a dBAR file name or they hold no complete pressing
+        with the track count in their name; a later import of a disc replaces
+        the earlier one.
+        """
+        imported = unchanged = rejected = 0
+        batch = []
+        for path in _bin_files(paths):
+            match = _NAME.search(os.path.basename(path))
+            try:
+                st = os.stat(path)
+            except OSError:
+                rejected += 1
+                continue
+            if match is None:
+                rejected += 1
+                continue
+            key = _key(match)
+            with self._lock:
+                row = self._db.execute(
+                    'SELECT source_size, source_mtime FROM discs '
+                    'WHERE n_tracks=? AND id1=? AND id2=? AND cddb_id=?', key).fetchone()
+            if row == (st.st_size, st.st_mtime_ns):
+                unchanged += 1
+                continue
+            try:
+                with open(path, 'rb') as f:
+                    entries = _pack(f.read(), key[0])
+            except OSError:
+                entries = b''
+            if not entries:
+                rejected += 1
+                continue
+            batch.append(key + (entries, st.st_size, st.st_mtime_ns))
+            imported += 1
+            if len(batch) >= _IMPORT_BATCH:
+                self._insert(batch)
+                batch = []
+        self._insert(batch)
+        return imported, unchanged, rejected
+
+    def compact(self) -> tuple[int, int]:
+        """Rebuild the file without the space left by replaced discs; return its size before and after."""
+        before = os.path.getsize(self.path)
+        with self._lock:
+            self._db.execute('VACUUM')
+        return before, os.path.getsize(self.path)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM discs').fetchone()[0]
+
+    def close(self) -> None:
+        self._db.close()
+
+    def _insert(self, rows: list) -> None:
+        if not rows:
+            return
+        with self._lock, self._db:
+            self._db.executemany('INSERT OR REPLACE INTO discs VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+
+
+def _key(match: re.Match) -> tuple[int, int, int, int]:
+    n, id1, id2, cddb_id = match.groups()
+    return int(n), int(id1, 16), int(id2, 16), int(cddb_id, 16)
+
+
+def _pack(data: bytes, n_tracks: int) -> bytes:
+    """The track entries of the complete pressings in .bin data that have n_tracks tracks."""
+    entries = bytearray()
+    size = n_tracks * TRACK_ENTRY.size
+    offset = 0
+    while offset + PRESSING_HEADER.size <= len(data):
+        n = data[offset]
+        offset += PRESSING_HEADER.size
+        if n == n_tracks and offset + size <= len(data):
+            entries += data[offset:offset + size]
+        offset += n * TRACK_ENTRY.size
+    return bytes(entries)
+
+
+def _bin_files(paths: Iterable[str]):
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for directory, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                if name.endswith('.bin'):
+                    yield os.path.join(directory, name)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m cdripper.armirror',
+                                     description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    do_import = commands.add_parser('import', help='add .bin files, or directories of them')
+    do_import.add_argument('database')
+    do_import.add_argument('paths', nargs='+')
+    do_compact = commands.add_parser('compact', help='reclaim the space of replaced discs')
+    do_compact.add_argument('database')
+    do_info = commands.add_parser('info', help='show how many discs the mirror holds')
+    do_info.add_argument('database')
+    args = parser.parse_args(argv)
+
+    try:
+        mirror = Mirror(args.database, readonly=args.command == 'info')
+    except sqlite3.Error as e:
+        parser.error(f'{args.database}: {e}')
+    try:
+        if args.command == 'import':
+            imported, unchanged, rejected = mirror.import_files(args.paths)
+            print(f'{imported} imported, {unchanged} unchanged, {rejected} rejected; '
+                  f'{len(mirror)} discs in {args.database}')
+            return 1 if rejected else 0
+        if args.command == 'compact':
+            before, after = mirror.compact()
+            print(f'{args.database}: {before} -> {after} bytes')
+        else:
+            print(f'{args.database}: {len(mirror)} discs, {os.path.getsize(args.database)} bytes')
+    finally:
+        mirror.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,1571 @@
+# -*- coding: utf-8 -*-
+
+import collections
+import concurrent.futures
+import heapq
+import itertools
+import os
+import queue
+import shutil
+import sqlite3
+import subprocess
+import threading
+import time
+from typing import Callable, Optional
+
+from . import accuraterip, arcache, armirror, rerip, ripjob, scratch, stats, stream, textlog, trackstore
+
+
+CDPARANOIA_BIN = '/usr/bin/cdparanoia'
+FLAC_BIN = '/usr/bin/flac'
+METAFLAC_BIN = '/usr/bin/metaflac'
+CDPARANOIA_OPTS = stream.CDPARANOIA_OPTS
+FLAC_OPTS = stream.FLAC_OPTS
+SAMPLES_PER_SECTOR = 588
+SECTORS_PER_SECOND = 75
+ERROR_LINES = 5  # lines of its error output that a failed command's message ends with
+
+
+def wav_name(track_num: int) -> str:
+    """File name cdparanoia gives a track in batch mode."""
+    return f'track{track_num:02d}.cdda.wav'
+
+
+def ar_tags(result: dict) -> dict:
+    """Vorbis comments recording an AccurateRip result."""
+    tags = {'ACCURATERIP_RESULT': result['status']}
+    if 'disc_id' in result:
+        tags['ACCURATERIP_DISCID'] = result['disc_id']
+    return tags
+
+
+def ar_disc_tags(result: dict) -> dict:
+    """Vorbis comments recording the AccurateRip verdict on the whole disc."""
+    return {'ACCURATERIP_DISC_RESULT': result['status']}
+
+
+def metaflac_args(tags: dict, flac_path: str) -> list:
+    """metaflac arguments that replace the given tags of an existing FLAC file."""
+    return ([f'--remove-tag={name}' for name in tags]
+            + [f'--set-tag={name}={value}' for name, value in tags.items()] + [flac_path])
+
+
+def _nothing(*args) -> None:
+    pass
+
+
+class Cancelled(Exception):
+    """Pipeline.run() was stopped by Pipeline.cancel()."""
+
+
+class ProcessFailed(subprocess.CalledProcessError):
+    """A command failed; the message ends with the last lines of its error output."""
+
+    def __str__(self) -> str:
+        message = super().__str__()
+        return f'{message}\n{self.stderr}' if self.stderr else message
+
+
+def run_logged(args: list, log: Callable[[str], None], cwd: Optional[str] = None,
+               started: Optional[Callable[[subprocess.Popen], None]] = None) -> float:
+    """Run a command, passing its error output to log line by line; return its CPU seconds.
+
+    Raises ProcessFailed if it fails. started is as for stats.run_process().
+    """
+    lines = textlog.LineDecoder(log, keep=ERROR_LINES)
+    status, cpu = stats.run_process(args, cwd, started, lines.feed)
+    lines.feed(b'', final=True)
+    if status:
+        raise ProcessFailed(status, args, stderr='\n'.join(lines.last))
+    return cpu
+
+
+class Lookup:
+    """Fetches and parses the disc's AccurateRip data.
+
+    Started as soon as the TOC is read so the lookup overlaps the rip; run()
+    may also be called directly on a thread of the caller's choosing. Once
+    done(), pressings holds the parse_bin() result, or None if the disc is not
+    in the database (or error is set if the lookup failed, and not_cached
+    too if only because it was offline and not cached). Discs in mirror
+    (an armirror.Mirror) are taken from it; downloads go through client, by
+    default the process's accuraterip.shared_client().
+    """
+
+    def __init__(
+        self,
+        disc_obj,
+        n_tracks: int,
+        cache: Optional[arcache.BinCache] = None,
+        offline: bool = False,
+        rip_stats: Optional[stats.RipStats] = None,
+        client: Optional[accuraterip.Client] = None,
+        mirror: Optional[armirror.Mirror] = None,
+    ) -> None:
+        self.disc_obj = disc_obj
+        self.n_tracks = n_tracks
+        self.cache = cache
+        self.offline = offline
+        self.client = client
+        self.mirror = mirror
+        self.stats = rip_stats or stats.RipStats()
+        self.pressings: Optional[list] = None
+        self.error: Optional[str] = None
+        self.not_cached = False
+        self._done = threading.Event()
+
+    def start(self) -> None:
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def run(self) -> None:
+        try:
+            with self.stats.measure('lookup') as measured:
+                ar_bin = accuraterip.fetch(self.disc_obj, self.cache, self.offline, self.client,
+                                           self.mirror)
+                measured['bytes'] = len(ar_bin) if ar_bin else 0
+            if ar_bin is not None:
+                with self.stats.measure('parse'):
+                    self.pressings = accuraterip.parse_bin(ar_bin, self.n_tracks)
+        except accuraterip.NotCached as e:
+            self.error = str(e)
+            self.not_cached = True
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            self._done.set()
+
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Wait up to timeout seconds (None: until done); return done()."""
+        return self._done.wait(timeout)
+
+
+class Verifier:
+    """Runs AccurateRip verification (and retries) for a disc being ripped.
+
+    Tracks are handed over with track_ripped() as cdparanoia finishes them and
+    rip_done() once the drive is idle. First checks run in parallel on a thread
+    pool (the NumPy and native checksum backends release the GIL) and overlap
+    the rest of the rip; re-rips need the drive, so failing tracks are queued
+    until rip_done() and retried one at a time. A track is checked once its
+    successor has been ripped (offset checks read into the neighbouring
+    tracks), and results are passed to track_verified in track order once the
+    successor's first check is done too.
+
+    run() blocks until every track has a result and returns them, or returns
+    None if cancelled. The result of a checked track has the CRCv1 of its
+    audio as 'crc'. A track that only matches once shifted by the drive
+    offset does not pass as ripped: it is re-ripped with the offset added to
+    the -O in cdparanoia_opts, and its 'offset' is the correction applied,
+    or it is reported as needing that correction if no retries are left.
+    Re-reads otherwise use the drive options of the rip in cdparanoia_opts,
+    and started is called with each cdparanoia process (see
+    stats.run_process()). Checksum, offset search and re-rip times go to
+    stats.
+    Tracks in known_results were verified by an earlier rip (one that was
+    interrupted, or one kept in a trackstore.TrackStore): their results are
+    passed on first and they are not handed over or checked again.
+
+    Once run() returns, disc_result holds the verdict on the whole disc (see
+    _disc_result()). Work that cannot change it is skipped: no track is
+    checked if no pressing has the disc's track count, and the drive offset
+    is only searched for if the first track does not match as ripped.
+    """
+
+    TICK = 0.25  # seconds between checks for finished work while waiting on the drive
+
+    def __init__(
+        self,
+        ar_tracks: list,
+        disc_obj,
+        lookup: Lookup,
+        retries: int,
+        tmpdir: str,
+        cdparanoia_bin: str,
+        offset_window: int = 0,
+        pool: Optional[concurrent.futures.Executor] = None,
+        segmented: bool = False,
+        device: Optional[str] = None,
+        cdparanoia_opts: str = '',
+        log: Callable[[str], None] = _nothing,
+        track_verified: Callable[[int, dict], None] = _nothing,
+        rip_stats: Optional[stats.RipStats] = None,
+        known_results: Optional[dict] = None,
+        started: Optional[Callable[[subprocess.Popen], None]] = None,
+    ) -> None:
+        self.ar_tracks = ar_tracks
+        self.disc_obj = disc_obj
+        self.lookup = lookup
+        self.retries = retries
+        self.tmpdir = tmpdir
+        self.cdparanoia_bin = cdparanoia_bin
+        self.offset_window = offset_window
+        self.pool = pool
+        self.segmented = segmented
+        self.cdparanoia_opts = cdparanoia_opts
+        self._cdparanoia = [cdparanoia_bin] + (['-d', device] if device else [])
+        self.log = log
+        self.track_verified = track_verified
+        self.stats = rip_stats or stats.RipStats()
+        self.started = started
+        self._ripped_at: dict = {}
+        self._wav_paths = {tn: path for tn, path, _ in ar_tracks}
+        self._streamed: dict = {}  # track_num -> (crcv1, crcv2) of a track streamed without a WAV
+        self._crcs: dict = {}  # track_num -> CRCv1 of the audio last checked
+        self._matched: dict = {}  # track_num -> (crcv1, crcv2) that matched a pressing
+        self._corrections: dict = {}  # track_num -> offset its audio only matches at
+        self._ripped: queue.Queue = queue.Queue()
+        self._rip_done = False
+        self._cancelled = False
+        self._results: dict = {}
+        self._known = dict(known_results or {})
+        self.disc_result: Optional[dict] = None
+
+    def track_ripped(self, track_num: int, crcs: Optional[tuple] = None) -> None:
+        """Hand over a ripped track; crcs are given if it was streamed, not saved."""
+        if crcs is not None:
+            self._streamed[track_num] = crcs
+        self._ripped_at[track_num] = time.monotonic()
+        self._ripped.put(track_num)
+
+    def rip_done(self) -> None:
+        self._ripped.put(None)
+
+    def cancel(self) -> None:
+        """Stop after the current track (or lookup) without reporting any more results."""
+        self._cancelled = True
+        self._ripped.put(None)
+
+    def run(self) -> Optional[dict]:
+        n_tracks = len(self.ar_tracks)
+        self.stats.info['crc_backend'] = accuraterip.crc_backend()
+        for track_num, result in sorted(self._known.items()):
+            self._release(track_num, result)
+        if len(self._known) == n_tracks:
+            return self._finish(None)
+        if not self.lookup.done():
+            self.log('Waiting for AccurateRip data...')
+        while not self.lookup.wait(self.TICK):
+            if self._cancelled:
+                return None
+        ar_pressings = self.lookup.pressings
+
+        if ar_pressings is None or not any(ar_pressings):
+            if self.lookup.not_cached:
+                # Offline, the database was never asked, so this does not pass either.
+                self.log('AccurateRip data for this disc is not cached, and lookups are offline '
+                         '— tracks are not verified.')
+                result = {'ok': False, 'confidence': 0, 'status': 'Not verified (offline, not cached)'}
+            elif self.lookup.error:
+                # Unlike a disc missing from the database, this does not pass.
+                self.log(f'AccurateRip lookup failed — {self.lookup.error}; tracks are not verified.')
+                result = {'ok': False, 'confidence': 0, 'status': 'Not verified (lookup failed)'}
+            else:
+                if ar_pressings is None:
+                    self.log('Disc not found in AccurateRip database — skipping verification.')
+                else:
+                    # Nothing to compare against, so checksums could not change the result.
+                    self.log(f'AccurateRip has no pressing of this disc with {n_tracks} tracks '
+                             f'— skipping verification.')
+                result = {'ok': True, 'confidence': 0, 'status': 'Not in database'}
+            for track_num in self._check_order():
+                if track_num is not None:
+                    self._release(track_num, dict(result))
+            return self._finish(None)
+
+        disc_id_str = accuraterip.disc_id_string(self.disc_obj)
+        drive_offset = None
+        offset_searched = self.offset_window <= 0
+        pending: collections.deque = collections.deque()  # (track_num, future) in track order
+        deferred = []
+        pool = self.pool or concurrent.futures.ThreadPoolExecutor(os.cpu_count() or 1)
+
+        try:
+            for track_num in self._check_order():
+                if self._cancelled:
+                    return None
+                if track_num is not None and not offset_searched:
+                    offset_searched = True
+                    checked, drive_offset = self._first_check(track_num, n_tracks, ar_pressings, pool)
+                    pending.append((track_num, checked))
+                elif track_num is not None:
+                    pending.append((track_num, pool.submit(
+                        self._check, track_num, n_tracks, ar_pressings, drive_offset)))
+                deferred += self._drain(pending, disc_id_str, final=False)
+            deferred += self._drain(pending, disc_id_str, final=True)
+        finally:
+            if pool is not self.pool:
+                pool.shutdown(wait=False, cancel_futures=True)
+
+        if deferred:
+            self._wait_for_drive()
+        for track_num in deferred:
+            if self.segmented and track_num not in self._corrections:
+                ok, confidence, offset = self._rerip_segments(
+                    track_num, n_tracks, ar_pressings, drive_offset)
+            else:
+                ok, confidence, offset = self._rerip_track(
+                    track_num, n_tracks, ar_pressings, drive_offset)
+            if self._cancelled:
+                return None
+            self._release(track_num, self._result(track_num, ok, confidence, offset, disc_id_str))
+
+        return self._finish(ar_pressings)
+
+    def _first_check(self, track_num: int, n_tracks: int, ar_pressings: list,
+                     pool: concurrent.futures.Executor) -> tuple[concurrent.futures.Future, Optional[int]]:
+        """Check the first track to check; return its check and the drive offset.
+
+        A track that matches as ripped shows the offset is right, so the
+        offset search only runs if it does not. A streamed track has no WAV
+        to search, and its checksums are used up by the check.
+        """
+        streamed = track_num in self._streamed
+        checked: concurrent.futures.Future = concurrent.futures.Future()
+        checked.set_result(self._check(track_num, n_tracks, ar_pressings, None))
+        ok, confidence, _ = checked.result()
+        if ok and confidence:
+            self.log(f'Drive offset search skipped: track {track_num:02d} matches as ripped.')
+            return checked, 0
+        if streamed:
+            self.log('Drive offset search skipped (tracks are streamed, not saved).')
+            return checked, None
+        drive_offset = self._detect_offset(track_num, ar_pressings, n_tracks)
+        if drive_offset:
+            checked = pool.submit(self._check, track_num, n_tracks, ar_pressings, drive_offset)
+        return checked, drive_offset
+
+    def _finish(self, ar_pressings: Optional[list]) -> Optional[dict]:
+        if self._cancelled:
+            return None
+        self.disc_result = self._disc_result(ar_pressings)
+        self.log(f'Disc: {self.disc_result["status"]}')
+        return self._results
+
+    def _disc_result(self, ar_pressings: Optional[list]) -> dict:
+        """The verdict on the whole disc, from the results of its tracks.
+
+        A disc whose tracks all match is Accurate with the confidence of the
+        pressing they all match (the lowest of its tracks' confidences), or
+        of the least confident track if no one pressing has them all. Tracks
+        from an earlier rip count towards the pressing if they matched as
+        ripped. 'pressing' is the 1-based index of that pressing, or None.
+        """
+        results = [(tn, self._results[tn]) for tn, _, _ in self.ar_tracks if tn in self._results]
+        n = len(results)
+        failed = [r for _, r in results if not r['ok']]
+        offsets = {r.get('offset', 0) for _, r in results if r['ok']} - {0}
+        offset = offsets.pop() if len(offsets) == 1 else 0
+        confidence = min((r['confidence'] for _, r in results), default=0)
+        pressing = None
+        if failed:
+            if any(r['status'] == 'Inaccurate' for r in failed):
+                status = f'Inaccurate ({len(failed)} of {n} tracks)'
+            elif all(r['status'].startswith('Needs offset correction') for r in failed):
+                status = f'Needs offset correction ({len(failed)} of {n} tracks)'
+            else:
+                status = failed[0]['status']
+            return {'ok': False, 'confidence': 0, 'status': status, 'pressing': None, 'offset': 0}
+        if not confidence:
+            accurate = sum(1 for _, r in results if r['confidence'])
+            status = f'Partly verified ({accurate} of {n} tracks accurate)' if accurate else 'Not in database'
+            return {'ok': True, 'confidence': 0, 'status': status, 'pressing': None, 'offset': 0}
+
+        scores: Optional[dict] = None  # pressing index -> lowest confidence of the tracks so far
+        for track_num, result in results if ar_pressings else []:
+            crcs = self._matched.get(track_num)
+            if crcs is None and not result.get('offset') and 'crc' in result:
+                crcs = (int(result['crc'], 16), 0)
+            found = ar_pressings[track_num - 1].pressings(crcs) if crcs else {}
+            if not found and track_num not in self._matched:
+                continue  # an earlier rip's match this cannot place
+            if scores is None:
+                scores = found
+            else:
+                scores = {p: min(conf, found[p]) for p, conf in scores.items() if p in found}
+        if scores:
+            best, confidence = max(scores.items(), key=lambda item: (item[1], -item[0]))
+            pressing = best + 1
+            status = f'Accurate (pressing {pressing} of {len(ar_pressings[0])}, confidence {confidence})'
+        elif scores is not None:
+            status = f'Accurate (mixed pressings, confidence {confidence})'
+        else:
+            status = f'Accurate (confidence {confidence})'
+        if offset:
+            status += f' at offset {offset:+d}'
+        return {'ok': True, 'confidence': confidence, 'status': status, 'pressing': pressing,
+                'offset': offset}
+
+    def _rerip_track(self, track_num: int, n_tracks: int, ar_pressings: list,
+                     drive_offset: Optional[int], attempts: Optional[int] = None) -> tuple[bool, int, int]:
+        """Re-rip the whole track until it matches.
+
+        A track that matched at an offset is read with that correction, and
+        then has to match as read; the offset returned is the one applied.
+        """
+        ok, confidence, offset = False, 0, 0
+        for attempt in range(1, (attempts or self.retries) + 1):
+            if self._cancelled:
+                break
+            correction = self._corrections.get(track_num, 0)
+            self.log(f'Track {track_num:02d}: re-ripping (attempt {attempt}/{self.retries})'
+                     + (f' with offset correction {correction:+d}' if correction else '') + '...')
+            self.stats.count('retries', track_num)
+            out_name = os.path.basename(self._wav_paths[track_num])
+            # Re-reads use the drive options of the rip, with the correction added to its offset.
+            options = stream.drive_args(self.cdparanoia_opts, correction)
+            try:
+                with self.stats.measure('rerip', track_num) as measured:
+                    measured['cpu'] = run_logged(
+                        self._cdparanoia + options + [str(track_num), out_name], self.log,
+                        cwd=self.tmpdir, started=self.started)
+            except ProcessFailed as e:
+                if self._cancelled:
+                    break
+                self.log(f'Track {track_num:02d}: re-rip failed — {e}')
+                ok, confidence, offset = False, 0, 0
+                continue
+            if correction:
+                ok, confidence, _ = self._check(track_num, n_tracks, ar_pressings, None)
+                offset = correction if ok else 0
+            else:
+                ok, confidence, offset = self._check(track_num, n_tracks, ar_pressings, drive_offset)
+            if ok:
+                break
+        return ok, confidence, offset
+
+    def _rerip_segments(self, track_num: int, n_tracks: int, ar_pressings: list,
+                        drive_offset: Optional[int]) -> tuple[bool, int, int]:
+        """Re-read only the segments whose reads disagree, then rebuild the track.
+
+        Falls back to whole-track re-rips if the segments cannot be read. A
+        streamed track has no WAV to compare against yet, so its first retry
+        re-rips the whole track.
+        """
+        wav_path = self._wav_paths[track_num]
+        seg_name = f'segment{track_num:02d}.wav'
+        workdir = os.path.join(self.tmpdir, f'segments{track_num:02d}')
+        first_attempt = 1
+        if not os.path.exists(wav_path):
+            ok, confidence, offset = self._rerip_track(
+                track_num, n_tracks, ar_pressings, drive_offset, attempts=1)
+            if ok or self.retries == 1 or self._cancelled:
+                return ok, confidence, offset
+            if track_num in self._corrections:
+                # Segments read with the correction would not line up with this WAV.
+                return self._rerip_track(
+                    track_num, n_tracks, ar_pressings, drive_offset, attempts=self.retries - 1)
+            first_attempt = 2
+        ok, confidence, offset = False, 0, 0
+        track = None
+        try:
+            track = rerip.SegmentedTrack.from_wav(workdir, wav_path)
+            for attempt in range(first_attempt, self.retries + 1):
+                if self._cancelled:
+                    break
+                todo = track.unsettled()
+                if not todo:
+                    self.log(
+                        f'Track {track_num:02d}: every segment reads the same each time; '
+                        f'giving up on re-reads.')
+                    break
+                self.log(
+                    f'Track {track_num:02d}: re-reading {len(todo)} of {track.count} segments '
+                    f'(attempt {attempt}/{self.retries})...'
+                )
+                self.stats.count('retries', track_num)
+                with self.stats.measure('rerip', track_num) as measured:
+                    for index in todo:
+                        first, n = track.sectors(index)
+                        measured['cpu'] += run_logged(
+                            self._cdparanoia + stream.drive_args(self.cdparanoia_opts)
+                            + [rerip.span(track_num, first, n), seg_name],
+                            self.log, cwd=self.tmpdir, started=self.started)
+                        track.add_wav(os.path.join(self.tmpdir, seg_name), index)
+                    measured['bytes'] = sum(track.sectors(i)[1] for i in todo) * rerip.SECTOR_BYTES
+                track.write_wav(wav_path)
+                ok, confidence, offset = self._check(track_num, n_tracks, ar_pressings, drive_offset)
+                if ok:
+                    break
+                if track_num in self._corrections and attempt < self.retries:
+                    return self._rerip_track(
+                        track_num, n_tracks, ar_pressings, drive_offset,
+                        attempts=self.retries - attempt)
+        except Exception as e:
+            if self._cancelled:
+                return False, 0, 0
+            self.log(f'Track {track_num:02d}: segment re-read failed — {e}; re-ripping the whole track.')
+            return self._rerip_track(track_num, n_tracks, ar_pressings, drive_offset)
+        finally:
+            if track is not None:
+                track.cleanup()
+        return ok, confidence, offset
+
+    def _drain(self, pending: collections.deque, disc_id_str: str, final: bool) -> list:
+        """Release finished first checks in track order; return tracks needing a re-rip.
+
+        Unless final, a result is only released once the next track's check
+        is done as well, and nothing blocks.
+        """
+        deferred = []
+        while pending:
+            track_num, future = pending[0]
+            if not final and not (
+                    future.done() and len(pending) > 1 and pending[1][1].done()):
+                break
+            ok, confidence, offset = future.result()
+            pending.popleft()
+            if ok or not self.retries:
+                self._release(track_num, self._result(track_num, ok, confidence, offset, disc_id_str))
+            else:
+                self.log(f'Track {track_num:02d}: '
+                         + (f'matches at offset {offset:+d} only' if offset else 'mismatch')
+                         + '; will re-rip once the drive is free.')
+                deferred.append(track_num)
+        return deferred
+
+    def _check_order(self):
+        """Yield ripped tracks in order, each once its successor is ripped too.
+
+        Yields None every TICK seconds while waiting, so the caller can release
+        checks that have finished in the meantime.
+        """
+        order = [tn for tn, _, _ in self.ar_tracks]
+        ripped = set(self._known)
+        i = 0
+        while True:
+            while i < len(order) and order[i] in ripped and (
+                    i + 1 == len(order) or order[i + 1] in ripped):
+                if order[i] not in self._known:
+                    yield order[i]
+                i += 1
+            if i == len(order):
+                return
+            try:
+                track_num = self._ripped.get(timeout=self.TICK)
+            except queue.Empty:
+                yield None
+                continue
+            if track_num is None:
+                self._rip_done = True
+                yield from (tn for tn in order[i:] if tn in ripped and tn not in self._known)
+                return
+            ripped.add(track_num)
+
+    def _wait_for_drive(self) -> None:
+        while not self._rip_done:
+            self._rip_done = self._ripped.get() is None
+
+    def _check(self, track_num: int, n_tracks: int, ar_pressings: list,
+               drive_offset: Optional[int]) -> tuple[bool, int, int]:
+        """Return (ok, confidence, offset) for the track as currently ripped.
+
+        Audio that only matches shifted by drive_offset is not ok, since it
+        was not read at that offset: offset is then the correction it needs.
+        """
+        track_idx = track_num - 1
+        try:
+            crcs = self._streamed.pop(track_num, None)
+            streamed = crcs is not None
+            if not streamed:
+                queued = time.monotonic() - self._ripped_at.get(track_num, time.monotonic())
+                with self.stats.measure('crc', track_num, queued) as measured:
+                    wav_path = self._wav_paths[track_num]
+                    measured['bytes'] = os.path.getsize(wav_path)
+                    crcs = accuraterip.compute_crcs(wav_path, track_idx, n_tracks)
+            self._crcs[track_num] = crcs[0]
+            self._matched.pop(track_num, None)
+            ok, confidence = accuraterip.verify_track(crcs, ar_pressings[track_idx])
+            if not ok and drive_offset and not streamed:
+                shifted = self._offset_crcs(track_num, n_tracks, abs(drive_offset))
+                matches, confidence = accuraterip.verify_track(
+                    (shifted[drive_offset], 0), ar_pressings[track_idx])
+                if matches:
+                    self._corrections[track_num] = drive_offset
+                    return False, confidence, drive_offset
+                return False, 0, 0
+            if ok:
+                self._matched[track_num] = crcs
+            return ok, confidence, 0
+        except Exception as e:
+            self.log(f'Track {track_num:02d}: CRC error — {e}')
+            return True, 0, 0  # don't block encoding on a verification error
+
+    def _result(self, track_num: int, ok: bool, confidence: int, offset: int,
+                disc_id_str: str) -> dict:
+        if ok:
+            if offset:
+                status = f'Accurate at offset {offset:+d} (confidence {confidence})'
+            else:
+                status = f'Accurate (confidence {confidence})' if confidence > 0 else 'Not in database'
+            self.log(f'Track {track_num:02d}: {status}')
+        else:
+            status = f'Needs offset correction ({offset:+d})' if offset else 'Inaccurate'
+            self.log(
+                f'Track {track_num:02d}: FAILED AccurateRip after {self.retries} {"retry" if self.retries == 1 else "retries"}'
+                + (f'; it matches once read with "-O {self._read_offset(offset)}"' if offset else '')
+            )
+        result = {'ok': ok, 'confidence': confidence, 'status': status,
+                  'disc_id': disc_id_str, 'offset': offset}
+        if track_num in self._crcs:
+            result['crc'] = f'{self._crcs[track_num]:08X}'
+        return result
+
+    def _release(self, track_num: int, result: dict) -> None:
+        if self._cancelled:
+            return
+        self._results[track_num] = result
+        self.track_verified(track_num, result)
+
+    def _offset_crcs(self, track_num: int, n_tracks: int, window: int) -> dict:
+        # A neighbour may already have been encoded and deleted; its samples
+        # then count as silence.
+        neighbours = [self._wav_paths.get(tn) for tn in (track_num - 1, track_num + 1)]
+        prev_wav, next_wav = [p if p and os.path.exists(p) else None for p in neighbours]
+        return accuraterip.offset_crcs(
+            self._wav_paths[track_num], track_num - 1, n_tracks, window, prev_wav, next_wav)
+
+    def _detect_offset(self, track_num: int, ar_pressings: list, n_tracks: int) -> Optional[int]:
+        """Search a ripped track's WAV for the drive read offset; None if unknown."""
+        try:
+            with self.stats.measure('offset_search', track_num):
+                crcs = self._offset_crcs(track_num, n_tracks, self.offset_window)
+        except Exception as e:
+            self.log(f'Drive offset search failed — {e}')
+            return None
+
+        matches = accuraterip.find_offsets(crcs, ar_pressings[track_num - 1])
+        if not matches:
+            self.log(
+                f'Drive offset search: no pressing of track {track_num:02d} matched '
+                f'within ±{self.offset_window} samples.')
+            return None
+        for offset, confidence in matches:
+            self.log(
+                f'Drive offset search: track {track_num:02d} matches a pressing '
+                f'(confidence {confidence}) at offset {offset:+d}.')
+
+        offset = matches[0][0]
+        if offset:
+            self.log(
+                f'Drive read offset appears to be {offset:+d} samples off; '
+                f'set "-O {self._read_offset(offset)}" in the cdparanoia options to correct it.')
+        return offset
+
+    def _read_offset(self, correction: int) -> int:
+        """The -O that reads with the correction added to the configured offset."""
+        return stream.sample_offset(self.cdparanoia_opts) + correction
+
+
+class StreamRipper:
+    """Rips a disc track by track, piping cdparanoia straight into flac.
+
+    The AccurateRip checksums are accumulated from the same stream, so each
+    track's audio is read once and no WAV is written. A track that cannot be
+    streamed is ripped to a WAV instead, and reported without checksums;
+    run() raises ProcessFailed if that fails too. The error output of
+    cdparanoia and flac goes to log, and started is called with each of
+    their processes (see stats.run_process()).
+    """
+
+    def __init__(
+        self,
+        jobs: list,
+        n_tracks: int,
+        tmpdir: str,
+        cdparanoia_bin: str,
+        cdparanoia_opts: str,
+        flac_bin: str,
+        flac_opts: str,
+        log: Callable[[str], None] = _nothing,
+        track_streamed: Callable[[int, Optional[tuple]], None] = _nothing,
+        rip_stats: Optional[stats.RipStats] = None,
+        started: Optional[Callable[[subprocess.Popen], None]] = None,
+    ) -> None:
+        self.jobs = jobs  # (track_num, n_samples, wav_path, flac_path) in rip order
+        self.n_tracks = n_tracks
+        self.tmpdir = tmpdir
+        self.cdparanoia_bin = cdparanoia_bin
+        self.cdparanoia_opts = cdparanoia_opts
+        self.flac_bin = flac_bin
+        self.flac_opts = flac_opts
+        self.log = log
+        self.track_streamed = track_streamed
+        self.stats = rip_stats or stats.RipStats()
+        self.started = started
+        self._cancelled = False
+
+    def cancel(self) -> None:
+        """Stop after the current track."""
+        self._cancelled = True
+
+    def run(self) -> None:
+        for track_num, n_samples, wav_path, flac_path in self.jobs:
+            if self._cancelled:
+                return
+            self.log(f'Track {track_num:02d}: ripping and encoding...')
+            acc = accuraterip.CrcAccumulator(n_samples, track_num - 1, self.n_tracks)
+            try:
+                # CPU time here is the checksumming and copying in this thread;
+                # cdparanoia and flac run as child processes.
+                with self.stats.measure('stream', track_num) as measured:
+                    n_bytes = self._stream(track_num, flac_path, acc.update)
+                    measured['bytes'] = n_bytes
+            except (OSError, subprocess.CalledProcessError) as e:
+                if self._cancelled:
+                    return
+                self.log(f'Track {track_num:02d}: streaming failed — {e}; ripping to a WAV instead.')
+                try:
+                    run_logged(
+                        [self.cdparanoia_bin] + stream.cdparanoia_args(
+                            self.cdparanoia_opts, track_num, os.path.basename(wav_path)),
+                        self.log, cwd=self.tmpdir, started=self.started)
+                except ProcessFailed:
+                    if self._cancelled:
+                        return
+                    raise
+                self.track_streamed(track_num, None)
+                continue
+            if n_samples and n_bytes != n_samples * 4:
+                self.log(f'Track {track_num:02d}: read {n_bytes // 4} samples, TOC says {n_samples}.')
+            self.log(f'Track {track_num:02d}: done ({n_bytes / 2**20:.1f} MiB).')
+            self.track_streamed(track_num, acc.crcs())
+
+    def _stream(self, track_num: int, flac_path: str, consumer: Callable) -> int:
+        """stream.tee_pipe() one track into its FLAC, with the error output going to log."""
+        read_fd, write_fd = os.pipe()
+        lines = textlog.LineDecoder(self.log)
+        reader = threading.Thread(target=lines.read, args=(os.fdopen(read_fd, 'rb'),), daemon=True)
+        reader.start()
+        try:
+            return stream.tee_pipe(
+                [self.cdparanoia_bin] + stream.cdparanoia_args(self.cdparanoia_opts, track_num),
+                [self.flac_bin] + stream.flac_args(self.flac_opts, flac_path),
+                consumer,
+                cwd=self.tmpdir,
+                stderr=write_fd,
+                started=self.started,
+            )
+        finally:
+            os.close(write_fd)  # the reader stops once the commands' copies are closed too
+            reader.join()
+
+
+class TrackRipper:
+    """Rips single tracks to WAV files, one after another.
+
+    Used instead of a batch rip of the whole disc when only some tracks are
+    needed, as when an interrupted rip is resumed. cdparanoia's error output
+    goes to log, and started is called with each of its processes (see
+    stats.run_process()); run() raises ProcessFailed if it fails.
+    """
+
+    def __init__(
+        self,
+        jobs: list,
+        tmpdir: str,
+        cdparanoia_bin: str,
+        cdparanoia_opts: str,
+        log: Callable[[str], None] = _nothing,
+        track_ripped: Callable[[int], None] = _nothing,
+        started: Optional[Callable[[subprocess.Popen], None]] = None,
+    ) -> None:
+        self.jobs = jobs  # (track_num, wav_path) in rip order
+        self.tmpdir = tmpdir
+        self.cdparanoia_bin = cdparanoia_bin
+        self.cdparanoia_opts = cdparanoia_opts
+        self.log = log
+        self.track_ripped = track_ripped
+        self.started = started
+        self._cancelled = False
+
+    def cancel(self) -> None:
+        """Stop after the current track."""
+        self._cancelled = True
+
+    def run(self) -> None:
+        for track_num, wav_path in self.jobs:
+            if self._cancelled:
+                return
+            self.log(f'Track {track_num:02d}: ripping...')
+            args = [self.cdparanoia_bin] + stream.cdparanoia_args(
+                self.cdparanoia_opts, track_num, os.path.basename(wav_path))
+            try:
+                run_logged(args, self.log, cwd=self.tmpdir, started=self.started)
+            except ProcessFailed:
+                if self._cancelled:
+                    return
+                raise
+            self.track_ripped(track_num)
+
+
+class EncodePool(concurrent.futures.Executor):
+    """Runs encode jobs on at most `limit` threads, the heaviest waiting job first.
+
+    Jobs submitted with submit_weighted() start in order of weight (the
+    WAV's size), then of submission, so a long track submitted early does
+    not end up encoding alone at the end of the disc. Shared by pipelines
+    ripping side by side, the limit and the order hold across all of them.
+    Threads are only started while jobs are waiting for one.
+    """
+
+    def __init__(self, limit: int) -> None:
+        self.limit = max(limit, 1)
+        self._queue: list = []  # heap of (-weight, order, future, fn, args, kwargs)
+        self._order = itertools.count()
+        self._cond = threading.Condition()
+        self._threads: set = set()
+        self._busy = 0
+        self._shutdown = False
+
+    def submit(self, fn, /, *args, **kwargs) -> concurrent.futures.Future:
+        return self.submit_weighted(0, fn, *args, **kwargs)
+
+    def submit_weighted(self, weight: int, fn, /, *args, **kwargs) -> concurrent.futures.Future:
+        future: concurrent.futures.Future = concurrent.futures.Future()
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError('cannot schedule new futures after shutdown')
+            heapq.heappush(self._queue, (-weight, next(self._order), future, fn, args, kwargs))
+            if len(self._threads) - self._busy < len(self._queue) and len(self._threads) < self.limit:
+                thread = threading.Thread(target=self._work, daemon=True)
+                self._threads.add(thread)
+                thread.start()
+            self._cond.notify()
+        return future
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        with self._cond:
+            self._shutdown = True
+            if cancel_futures:
+                for _, _, future, _, _, _ in self._queue:
+                    future.cancel()
+                self._queue.clear()
+            self._cond.notify_all()
+            threads = list(self._threads)
+        if wait:
+            for thread in threads:
+                thread.join()
+
+    def _work(self) -> None:
+        while True:
+            with self._cond:
+                while not self._queue and not self._shutdown:
+                    self._cond.wait()
+                if not self._queue:
+                    self._threads.discard(threading.current_thread())
+                    return
+                _, _, future, fn, args, kwargs = heapq.heappop(self._queue)
+                self._busy += 1
+            try:
+                if future.set_running_or_notify_cancel():
+                    try:
+                        result = fn(*args, **kwargs)
+                    except BaseException as e:
+                        future.set_exception(e)
+                    else:
+                        future.set_result(result)
+            finally:
+                with self._cond:
+                    self._busy -= 1
+
+
+class Pipeline:
+    """Rip → AccurateRip → encode → tag for one disc, without Qt or Picard.
+
+    When pipelined, each track is verified as soon as cdparanoia has moved
+    past it, and encoded as soon as it is verified; otherwise the whole disc
+    is ripped, then verified, then encoded, longest track first. Streaming
+    rips are always pipelined. FLAC files are written to outdir, named by
+    names (track_num -> file name) or else NN.flac, and tagged with the
+    track number, disc ID and AccurateRip result. Without an outdir they
+    are left in the job, which is detached once the disc is done (see
+    ripjob.RipJob.detach()), onto job_dir if it was in ram_dir; directory
+    is then where they are. Encodes run
+    on an EncodePool of `jobs` threads. Progress goes to the progress
+    callback as dicts with an 'event' key (see _emit()), with the error
+    output of cdparanoia, flac and metaflac as 'log' events; run() returns
+    the per-track results, and disc_result is the verdict on the whole
+    disc. A command that fails raises ProcessFailed, whose message ends with
+    its last lines of output.
+
+    verify_pool may be an executor and encode_pool an EncodePool shared
+    with other pipelines (see Farm); by default each pipeline makes its own.
+    AccurateRip data is fetched from ar_url over the keep-alive connections
+    that every pipeline in the process shares, unless the disc is in the
+    armirror.Mirror at mirror_path.
+
+    cancel() stops a rip from another thread: run() then raises Cancelled
+    and keeps the job, like any other failure.
+
+    Timings of every stage are collected in stats and written to
+    REPORT_NAME next to the FLAC files when the disc is done.
+
+    The WAV files are kept in a ripjob.RipJob under job_dir (by default
+    outdir/JOB_DIR; needed without an outdir) until the disc is done, so
+    ripping a disc again after a failed or interrupted run only re-reads the
+    tracks that were not ripped yet, and skips verifying and encoding tracks
+    that got that far. With a ram_dir (on tmpfs) the job goes there instead
+    if the disc's audio fits, sparing the disk the WAV writes. Before
+    anything is read the space the disc needs is reserved (see
+    scratch.Scratch); if neither place has room the rip waits up to
+    scratch_wait seconds for other rips in the process to free some (None:
+    as long as that can help) and then fails with scratch.NoSpace, rather
+    than running out of space halfway through.
+
+    With a store_dir, tracks that matched AccurateRip are kept in a
+    trackstore.TrackStore when the disc is done, and later rips of the same
+    pressing take them from there instead of reading them again.
+    """
+    REPORT_NAME = 'rip-report.json'
+    JOB_DIR = '.cdripper-jobs'
+
+    def __init__(
+        self,
+        device: str,
+        outdir: Optional[str],
+        cdparanoia_opts: str = CDPARANOIA_OPTS,
+        flac_opts: str = FLAC_OPTS,
+        retries: int = 3,
+        offset_window: int = accuraterip.OFFSET_WINDOW,
+        segmented: bool = True,
+        streaming: bool = False,
+        jobs: int = 0,
+        cache_dir: Optional[str] = None,
+        offline: bool = False,
+        progress: Callable[[dict], None] = _nothing,
+        cdparanoia_bin: str = CDPARANOIA_BIN,
+        flac_bin: str = FLAC_BIN,
+        metaflac_bin: str = METAFLAC_BIN,
+        pipelined: bool = True,
+        names: Optional[dict] = None,
+        verify_pool: Optional[concurrent.futures.Executor] = None,
+        encode_pool: Optional[EncodePool] = None,
+        job_dir: Optional[str] = None,
+        store_dir: Optional[str] = None,
+        store_bytes: int = trackstore.MAX_BYTES,
+        ar_url: str = accuraterip.BASE_URL,
+        mirror_path: Optional[str] = None,
+        ram_dir: Optional[str] = None,
+        scratch_wait: Optional[float] = None,
+    ) -> None:
+        if outdir is None and job_dir is None:
+            raise ValueError('A pipeline without an outdir needs a job_dir')
+        self.device = device
+        self.outdir = outdir
+        self.cdparanoia_opts = cdparanoia_opts
+        self.flac_opts = flac_opts
+        self.retries = retries
+        self.offset_window = offset_window
+        self.segmented = segmented
+        self.streaming = streaming
+        self.pipelined = pipelined or streaming
+        self.jobs = jobs or os.cpu_count() or 1
+        self.cache_dir = cache_dir
+        self.offline = offline
+        self.progress = progress
+        self.cdparanoia_bin = cdparanoia_bin
+        self.flac_bin = flac_bin
+        self.metaflac_bin = metaflac_bin
+        self.names = names or {}
+        self.verify_pool = verify_pool
+        self.encode_pool = encode_pool
+        self.job_dir = job_dir
+        self.store_dir = store_dir
+        self.store_bytes = store_bytes
+        self.ar_url = ar_url
+        self.mirror_path = mirror_path
+        self.ram_dir = ram_dir
+        self.scratch_wait = scratch_wait
+        self.stats = stats.RipStats()
+        self.directory: Optional[str] = None
+        self.disc_result: Optional[dict] = None
+        self._start = time.monotonic()
+        self._stage_start: dict = {}
+        self._lock = threading.Lock()
+        self._cancelled = False
+        self._on_cancel: list = []
+
+    def cancel(self) -> None:
+        """Stop the rip; run() raises Cancelled once the stages running have stopped."""
+        with self._lock:
+            self._cancelled = True
+            stop, self._on_cancel = self._on_cancel, []
+        for fn in stop:
+            fn()
+
+    def _when_cancelled(self, fn: Callable[[], None]) -> None:
+        """Call fn on cancel(), or now if the rip is cancelled already."""
+        with self._lock:
+            if not self._cancelled:
+                self._on_cancel.append(fn)
+                return
+        fn()
+
+    def _check_cancelled(self) -> None:
+        if self._cancelled:
+            raise Cancelled()
+
+    def _kill_on_cancel(self, process: subprocess.Popen) -> None:
+        """The started callback of the rippers and the verifier: cancel() kills their children."""
+        self._when_cancelled(process.kill)
+
+    def _run_process(self, args: list, stage: str) -> float:
+        """run_logged() for a child that cancel() kills, freeing its pool slot at once.
+
+        Its output goes to 'log' events of stage.
+        """
+        kills = []
+
+        def started(process: subprocess.Popen) -> None:
+            kills.append(process.kill)
+            self._when_cancelled(process.kill)
+
+        try:
+            cpu = run_logged(args, lambda line: self._emit('log', stage=stage, message=line),
+                             started=started)
+        except ProcessFailed:
+            self._check_cancelled()
+            raise
+        finally:
+            with self._lock:
+                for kill in kills:
+                    if kill in self._on_cancel:
+                        self._on_cancel.remove(kill)
+        self._check_cancelled()
+        return cpu
+
+    def run(self, disc=None) -> dict:
+        """Rip the disc; return track_num -> {'flac': path, 'ar': result}.
+
+        disc is the discid.Disc of the CD in the device; it is read if not given.
+        """
+        if self.outdir:
+            os.makedirs(self.outdir, exist_ok=True)
+        self._begin('toc')
+        if disc is None:
+            import discid
+            disc = discid.read(self.device)
+        self._end('toc', discid=disc.id, tracks=len(disc.tracks))
+        self.stats.info.update(device=self.device, disc_id=disc.id, streaming=self.streaming,
+                               pipelined=self.pipelined,
+                               encode_jobs=self.encode_pool.limit if self.encode_pool else self.jobs)
+        disk_root = self.job_dir or os.path.join(self.outdir, self.JOB_DIR)
+        need = scratch.disc_bytes(disc)
+        if not self.outdir:
+            need *= 2  # the FLAC files are made next to the WAVs
+        with self._reserve(scratch.Scratch(disk_root, self.ram_dir), disc.id, need) as space:
+            self._emit('log', stage='scratch',
+                       message=f'Ripping {need / 2**20:.0f} MiB of audio into {space.root}')
+            job = ripjob.RipJob(space.root, disc.id)
+            space.directory = job.directory
+            try:
+                results = self._run(disc, job)
+            except BaseException:
+                job.close()  # kept for the next run to resume
+                raise
+            if self.outdir:
+                job.remove()
+                self.directory = self.outdir
+            else:
+                # A job in ram_dir is detached onto disk, where the files can stay.
+                self._detach(job, results, None if space.root == disk_root else disk_root)
+        if space.root != self.job_dir:
+            try:
+                os.rmdir(space.root)
+            except OSError:
+                pass  # other jobs still there
+        report_path = os.path.join(self.directory, self.REPORT_NAME)
+        try:
+            self.stats.write(report_path)
+        except OSError as e:
+            self._emit('log', stage='report', message=f'Could not write {report_path}: {e}')
+            report_path = None
+        self._emit('done', report=report_path, summary=self.stats.summary(), disc=self.disc_result,
+                   tracks={tn: {'flac': r.get('flac'), 'status': r['ar']['status']}
+                           for tn, r in sorted(results.items())})
+        return results
+
+    def _reserve(self, space: scratch.Scratch, disc_id: str, need: int) -> scratch.Reservation:
+        """Reserve the disc's scratch space, waiting up to scratch_wait seconds for it.
+
+        Waits a Verifier.TICK at a time, so that cancel() is not held up.
+        """
+        deadline = None if self.scratch_wait is None else time.monotonic() + self.scratch_wait
+        waiting = False
+        while True:
+            timeout = Verifier.TICK
+            if deadline is not None:
+                timeout = max(min(timeout, deadline - time.monotonic()), 0)
+            try:
+                return space.reserve(disc_id, need, timeout)
+            except scratch.NoSpace as e:
+                self._check_cancelled()
+                if not e.waiting_helps or (deadline is not None and time.monotonic() >= deadline):
+                    raise
+                if not waiting:
+                    waiting = True
+                    self._emit('log', stage='scratch',
+                               message=f'{e.strerror} yet; waiting for another rip to finish...')
+
+    def _detach(self, job: ripjob.RipJob, results: dict, root: Optional[str] = None) -> None:
+        """Leave the FLAC files in the detached job, moved to root if given; point results at them."""
+        for track_num in results:
+            wav_path = job.path(wav_name(track_num))
+            if os.path.exists(wav_path):
+                os.unlink(wav_path)
+        self.directory = job.detach(root)
+        for result in results.values():
+            result['flac'] = os.path.join(self.directory, os.path.basename(result['flac']))
+
+    def _resume(self, job: ripjob.RipJob, tracks: list, results: dict) -> tuple[dict, list, list]:
+        """Sort the disc's tracks by what an earlier run of the job got done.
+
+        Finished tracks go into results. Returns the AccurateRip results of
+        those and of the tracks that were verified, (track_num, crcs) of the
+        tracks that were only ripped, and the tracks still to rip.
+        """
+        verified: dict = {}
+        ripped = []
+        to_rip = []
+        for track_num, wav_path, _ in tracks:
+            if job.done(track_num, 'tagged') and job.done(track_num, 'encoded'):
+                results[track_num] = {'ar': job.get(track_num, 'verified'),
+                                      'flac': job.get(track_num, 'encoded')}
+                verified[track_num] = job.get(track_num, 'verified')
+            elif job.done(track_num, 'verified') and (
+                    job.done(track_num, 'encoded') or job.done(track_num, 'ripped')):
+                verified[track_num] = job.get(track_num, 'verified')
+            elif job.done(track_num, 'ripped'):
+                crcs = job.get(track_num, 'crcs')
+                ripped.append((track_num, tuple(crcs) if crcs else None))
+            else:
+                job.forget(track_num)
+                for path in (wav_path, self._flac_path(track_num, job.directory)):
+                    if os.path.exists(path):
+                        os.unlink(path)  # cut short by the interruption
+                to_rip.append(track_num)
+        if job.resumed:
+            self._emit('log', stage='resume', message=(
+                f'Resuming {job.directory}: {len(results)} tracks done, '
+                f'{len(verified) - len(results)} verified, '
+                f'{len(ripped)} ripped, {len(to_rip)} to rip.'))
+        return verified, ripped, to_rip
+
+    def _reuse(self, store: trackstore.TrackStore, disc_id_str: str, job: ripjob.RipJob,
+               order: list, known: dict) -> list:
+        """Copy the tracks the store has out of order into the job as verified.
+
+        Their results are added to known; returns the tracks reused.
+        """
+        reused = []
+        for track_num in order:
+            hit = store.get(disc_id_str, track_num)
+            if hit is None:
+                continue
+            stored, result = hit
+            flac_path = self._flac_path(track_num, job.directory)
+            with self.stats.measure('reuse', track_num) as measured:
+                try:
+                    shutil.copyfile(stored, flac_path)
+                except OSError:
+                    continue  # evicted meanwhile
+                measured['bytes'] = os.path.getsize(flac_path)
+            job.record(track_num, ripped=job.file(flac_path), verified=result)
+            known[track_num] = result
+            reused.append(track_num)
+        if reused:
+            self._emit('log', stage='store', message=(
+                f'Reusing {len(reused)} verified tracks from {store.directory}; '
+                f'{len(order) - len(reused)} to rip.'))
+        return reused
+
+    def _run(self, disc, job: ripjob.RipJob) -> dict:
+        tmpdir = job.directory
+        tracks = [(t.number, job.path(wav_name(t.number)), t) for t in disc.tracks]
+        n_tracks = len(tracks)
+        cache = None
+        if self.cache_dir:
+            try:
+                cache = arcache.BinCache(self.cache_dir)
+            except OSError as e:
+                self._emit('log', stage='accuraterip', message=f'AccurateRip cache unavailable: {e}')
+        mirror = None
+        if self.mirror_path:
+            try:
+                mirror = armirror.Mirror(self.mirror_path, readonly=True)
+            except sqlite3.Error as e:
+                self._emit('log', stage='accuraterip',
+                           message=f'AccurateRip mirror {self.mirror_path} unavailable: {e}')
+
+        self._begin('lookup')
+        lookup = Lookup(disc, n_tracks, cache, self.offline, self.stats,
+                        accuraterip.shared_client(self.ar_url), mirror)
+        lookup_thread = threading.Thread(target=self._lookup, args=(lookup,), daemon=True)
+        lookup_thread.start()
+
+        store = None
+        if self.store_dir:
+            try:
+                store = trackstore.TrackStore(self.store_dir, self.store_bytes)
+            except OSError as e:
+                self._emit('log', stage='store', message=f'Track store unavailable: {e}')
+        disc_id_str = accuraterip.disc_id_string(disc)
+
+        results: dict = {}
+        encodes: dict = {}
+        known, resumed, order = self._resume(job, tracks, results)
+        reused = self._reuse(store, disc_id_str, job, order, known) if store else []
+        order = [tn for tn in order if tn not in reused]
+        finished = set(results)
+        encoder = self.encode_pool or EncodePool(self.jobs)
+        unverified: list = []  # (track_num, crcs) ripped, until the disc is, unless pipelined
+        unencoded: list = []  # (track_num, result) verified, until the disc is, unless pipelined
+
+        def encode(track_num: int, result: dict) -> None:
+            wav_path = job.path(wav_name(track_num))
+            submitted = time.monotonic()
+            if os.path.exists(wav_path):
+                future = encoder.submit_weighted(
+                    os.path.getsize(wav_path), self._encode, disc, job, track_num, result, submitted)
+            else:  # streamed into its FLAC
+                future = encoder.submit(self._tag_streamed, disc, job, track_num, result, submitted)
+            encodes[track_num] = future
+            self._when_cancelled(future.cancel)
+
+        def verified(track_num: int, result: dict) -> None:
+            if track_num in finished:
+                return
+            if track_num not in known:
+                self._end(f'verify:{track_num}', track=track_num, status=result['status'], ok=result['ok'])
+                job.record(track_num, verified=result)
+            results[track_num] = {'ar': result}
+            if self.pipelined:
+                encode(track_num, result)
+            else:
+                unencoded.append((track_num, result))
+
+        verifier = Verifier(
+            tracks, disc, lookup, self.retries, tmpdir, self.cdparanoia_bin, self.offset_window,
+            pool=self.verify_pool, segmented=self.segmented, device=self.device,
+            cdparanoia_opts=self.cdparanoia_opts,
+            log=lambda message: self._emit('log', stage='accuraterip', message=message),
+            track_verified=verified, rip_stats=self.stats, known_results=known,
+            started=self._kill_on_cancel)
+        self._when_cancelled(verifier.cancel)
+        verify_thread = threading.Thread(target=verifier.run, daemon=True)
+        verify_thread.start()
+
+        def hand_over(track_num: int, crcs: Optional[tuple]) -> None:
+            self._begin(f'verify:{track_num}')
+            verifier.track_ripped(track_num, crcs)
+
+        for track_num, crcs in resumed:
+            if self.pipelined:
+                hand_over(track_num, crcs)
+            else:
+                unverified.append((track_num, crcs))
+
+        sectors = {tn: track.sectors for tn, _, track in tracks}
+
+        def ripped(track_num: int, crcs: Optional[tuple] = None) -> None:
+            self._end(f'rip:{track_num}', track=track_num, bytes=sectors[track_num] * rerip.SECTOR_BYTES,
+                      audio_seconds=sectors[track_num] / SECTORS_PER_SECOND)
+            if crcs is not None:
+                job.record(track_num, ripped=job.file(self._flac_path(track_num, tmpdir)),
+                           crcs=list(crcs))
+            else:
+                job.record(track_num, ripped=job.file(job.path(wav_name(track_num))))
+            following = order[order.index(track_num) + 1:]
+            if following:
+                self._begin(f'rip:{following[0]}')
+            if self.pipelined:
+                hand_over(track_num, crcs)
+            else:
+                unverified.append((track_num, crcs))
+
+        try:
+            if order:
+                self._begin('disc')
+                self._begin(f'rip:{order[0]}')
+                to_rip = [track for track in tracks if track[0] in order]
+                if self.streaming:
+                    self._rip_streaming(disc, to_rip, n_tracks, tmpdir, ripped)
+                elif len(to_rip) < n_tracks:
+                    ripper = TrackRipper(
+                        [(tn, wav_path) for tn, wav_path, _ in to_rip], tmpdir,
+                        self.cdparanoia_bin, f'-d {self.device} {self.cdparanoia_opts}',
+                        log=lambda message: self._emit('log', stage='rip', message=message),
+                        track_ripped=ripped, started=self._kill_on_cancel)
+                    self._when_cancelled(ripper.cancel)
+                    ripper.run()
+                else:
+                    self._rip_batch(tracks, tmpdir, ripped)
+                self._check_cancelled()
+                self._end('disc')
+            for track_num, crcs in unverified:
+                hand_over(track_num, crcs)
+            verifier.rip_done()
+            verify_thread.join()
+            self._check_cancelled()
+            # Longest first: the first one submitted starts before the rest are queued.
+            unencoded.sort(key=lambda item: -self._wav_bytes(job, item[0]))
+            for track_num, result in unencoded:
+                encode(track_num, result)
+            concurrent.futures.wait(list(encodes.values()))
+            self._check_cancelled()
+            for track_num, future in encodes.items():
+                results[track_num]['flac'] = future.result()
+            # The disc's verdict is known only once every track is verified,
+            # after most were encoded, so it is added to the finished files.
+            disc_tags = ar_disc_tags(verifier.disc_result)
+            for future in [encoder.submit(self._tag_disc, track_num, result['flac'], disc_tags)
+                           for track_num, result in results.items()]:
+                future.result()
+        except BaseException:
+            # Nothing may touch the job once run() has kept it for the next run.
+            verifier.cancel()
+            verify_thread.join()
+            for future in encodes.values():
+                future.cancel()
+            concurrent.futures.wait(list(encodes.values()))
+            raise
+        finally:
+            if encoder is not self.encode_pool:
+                encoder.shutdown(wait=False, cancel_futures=True)
+
+        results = dict(sorted(results.items()))
+        self.disc_result = verifier.disc_result
+        self.stats.info['accuraterip'] = verifier.disc_result['status']
+        if store is not None:
+            for track_num, result in results.items():
+                started = time.monotonic()
+                if track_num not in reused and store.put(
+                        disc_id_str, track_num, result['flac'], result['ar']):
+                    self.stats.add('store', track_num, time.monotonic() - started,
+                                   nbytes=os.path.getsize(result['flac']))
+        return results
+
+    def _lookup(self, lookup: Lookup) -> None:
+        lookup.run()
+        if lookup.pressings is not None:
+            self._end('lookup', pressings=len(lookup.pressings[0]) if lookup.pressings else 0)
+        else:
+            self._end('lookup', pressings=0, error=lookup.error)
+
+    def _rip_batch(self, tracks: list, tmpdir: str, ripped: Callable) -> None:
+        # In batch mode tracks are ripped in order, so a track is complete
+        # once the next track's file has been created.
+        order = [tn for tn, _, _ in tracks]
+        process = subprocess.Popen(
+            [self.cdparanoia_bin, '-d', self.device] + self.cdparanoia_opts.split(),
+            cwd=tmpdir, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        lines = textlog.LineDecoder(lambda line: self._emit('log', stage='rip', message=line),
+                                    keep=ERROR_LINES)
+        reader = threading.Thread(target=lines.read, args=(process.stderr,), daemon=True)
+        reader.start()
+        done = 0
+        try:
+            while done < len(order) and not self._cancelled:
+                finished = process.poll() is not None
+                while done + 1 < len(order) and os.path.exists(os.path.join(tmpdir, wav_name(order[done + 1]))):
+                    ripped(order[done])
+                    done += 1
+                if finished:
+                    break
+                time.sleep(Verifier.TICK)
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            reader.join()
+        self._check_cancelled()
+        if process.returncode:
+            raise ProcessFailed(process.returncode, process.args, stderr='\n'.join(lines.last))
+        for tn in order[done:]:
+            ripped(tn)
+
+    def _rip_streaming(self, disc, tracks: list, n_tracks: int, tmpdir: str,
+                       ripped: Callable) -> None:
+        jobs = [(tn, track.sectors * SAMPLES_PER_SECTOR, wav_path, self._flac_path(tn, tmpdir))
+                for tn, wav_path, track in tracks]
+
+        ripper = StreamRipper(
+            jobs, n_tracks, tmpdir, self.cdparanoia_bin, f'-d {self.device} {self.cdparanoia_opts}',
+            self.flac_bin, self.flac_opts,
+            log=lambda message: self._emit('log', stage='rip', message=message),
+            track_streamed=ripped, rip_stats=self.stats, started=self._kill_on_cancel)
+        self._when_cancelled(ripper.cancel)
+        ripper.run()
+
+    def _wav_bytes(self, job: ripjob.RipJob, track_num: int) -> int:
+        """The size of the track's WAV in the job, 0 if it was streamed into its FLAC."""
+        try:
+            return os.path.getsize(job.path(wav_name(track_num)))
+        except FileNotFoundError:
+            return 0
+
+    def _flac_path(self, track_num: int, directory: str) -> str:
+        return os.path.join(directory, self.names.get(track_num) or f'{track_num:02d}.flac')
+
+    def _tags(self, disc, track_num: int, result: dict) -> dict:
+        tags = {'TRACKNUMBER': str(track_num), 'TRACKTOTAL': str(len(disc.tracks)),
+                'MUSICBRAINZ_DISCID': disc.id}
+        tags.update(ar_tags(result))
+        return tags
+
+    def _encode(self, disc, job: ripjob.RipJob, track_num: int, result: dict, submitted: float) -> str:
+        self._begin(f'encode:{track_num}')
+        wav_path = job.path(wav_name(track_num))
+        flac_path = self._flac_path(track_num, self.outdir or job.directory)
+        tags = [f'--tag={name}={value}' for name, value in self._tags(disc, track_num, result).items()]
+        nbytes = os.path.getsize(wav_path)
+        args = [self.flac_bin] + self.flac_opts.split() + ['--force', '--silent'] + tags + ['-o', flac_path, wav_path]
+        cpu = self._run_process(args, 'encode')
+        job.record(track_num, encoded=job.file(flac_path), tagged=True)
+        self._end(f'encode:{track_num}', track=track_num, flac=flac_path, bytes=nbytes, cpu=cpu,
+                  queued=self._started(f'encode:{track_num}') - submitted)
+        return flac_path
+
+    def _tag_streamed(self, disc, job: ripjob.RipJob, track_num: int, result: dict,
+                      submitted: float) -> str:
+        self._begin(f'tag:{track_num}')
+        flac_path = self._flac_path(track_num, self.outdir or job.directory)
+        if not job.done(track_num, 'encoded'):
+            if self.outdir:
+                shutil.move(self._flac_path(track_num, job.directory), flac_path)
+            job.record(track_num, encoded=job.file(flac_path))
+        args = [self.metaflac_bin] + metaflac_args(self._tags(disc, track_num, result), flac_path)
+        cpu = self._run_process(args, 'encode')
+        job.record(track_num, encoded=job.file(flac_path), tagged=True)
+        self._end(f'tag:{track_num}', track=track_num, flac=flac_path, cpu=cpu,
+                  queued=self._started(f'tag:{track_num}') - submitted)
+        return flac_path
+
+    def _tag_disc(self, track_num: int, flac_path: str, tags: dict) -> None:
+        self._begin(f'disc_tag:{track_num}')
+        args = [self.metaflac_bin] + metaflac_args(tags, flac_path)
+        cpu = self._run_process(args, 'encode')
+        self._end(f'disc_tag:{track_num}', track=track_num, flac=flac_path, cpu=cpu)
+
+    def _begin(self, stage: str) -> None:
+        with self._lock:
+            self._stage_start[stage] = time.monotonic()
+
+    def _started(self, stage: str) -> float:
+        with self._lock:
+            return self._stage_start[stage]
+
+    def _end(self, stage: str, **fields) -> None:
+        """Report a stage begun with _begin() ('name' or 'name:track') and record it in stats."""
+        with self._lock:
+            started = self._stage_start.pop(stage, None)
+        name, _, _ = stage.partition(':')
+        seconds = time.monotonic() - started if started is not None else None
+        if name != 'lookup':  # Lookup records its own fetch and parse times
+            self.stats.add(name, fields.get('track'), seconds, fields.get('cpu'), fields.get('bytes'),
+                           fields.get('queued'))
+        self._emit('stage', stage=name, seconds=seconds, **fields)
+
+    def _emit(self, event: str, **fields) -> None:
+        """Report progress as {'event': 'stage'|'log'|'done', 'elapsed': s, ...}."""
+        with self._lock:
+            self.progress({'event': event, 'elapsed': round(time.monotonic() - self._start, 3), **fields})
+
+
+class Farm:
+    """Rips the discs in several drives at once, one Pipeline per drive.
+
+    The checksum and encode work of every drive goes to two shared thread
+    pools of `jobs` workers each (encodes in an EncodePool, longest track
+    first across the drives), so adding drives adds reads, not busy cores.
+    Each drive's progress events are passed on with a 'device' key, and
+    every finished stage is followed by a 'farm' event totalling all drives:
+    tracks ripped, verified and encoded, and the rip throughput as a
+    multiple of real-time playback.
+    """
+
+    def __init__(
+        self,
+        devices: list,
+        outdir: str,
+        jobs: int = 0,
+        progress: Callable[[dict], None] = _nothing,
+        **options,
+    ) -> None:
+        self.devices = devices
+        self.outdir = outdir
+        self.jobs = jobs or os.cpu_count() or 1
+        self.progress = progress
+        self.options = options  # passed on to each Pipeline
+        self._lock = threading.Lock()
+        self._start = time.monotonic()
+        self._drives = {device: {'state': 'waiting', 'ripped': 0, 'verified': 0, 'encoded': 0,
+                                 'audio_seconds': 0.0} for device in devices}
+
+    def run(self) -> dict:
+        """Rip every drive; return device -> Pipeline.run() results, or the exception raised."""
+        results: dict = {}
+        with concurrent.futures.ThreadPoolExecutor(self.jobs) as verify_pool, \
+                EncodePool(self.jobs) as encode_pool, \
+                concurrent.futures.ThreadPoolExecutor(len(self.devices)) as drives:
+            futures = {
+                device: drives.submit(self._rip, device, verify_pool, encode_pool)
+                for device in self.devices
+            }
+            for device, future in futures.items():
+                try:
+                    results[device] = future.result()
+                except Exception as e:
+                    results[device] = e
+        return results
+
+    def _rip(self, device: str, verify_pool, encode_pool) -> dict:
+        pipeline = Pipeline(
+            device, os.path.join(self.outdir, os.path.basename(device)),
+            jobs=self.jobs, progress=lambda event: self._event(device, event),
+            verify_pool=verify_pool, encode_pool=encode_pool, **self.options)
+        self._update(device, state='ripping')
+        try:
+            results = pipeline.run()
+        except Exception as e:
+            self._update(device, state='failed', error=str(e))
+            raise
+        self._update(device, state='done')
+        return results
+
+    def _event(self, device: str, event: dict) -> None:
+        with self._lock:
+            self.progress({**event, 'device': device})
+            if event['event'] != 'stage' or 'track' not in event:
+                return
+            drive = self._drives[device]
+            if event['stage'] == 'rip':
+                drive['ripped'] += 1
+                drive['audio_seconds'] += event['audio_seconds']
+            elif event['stage'] == 'verify':
+                drive['verified'] += 1
+            elif event['stage'] in ('encode', 'tag'):
+                drive['encoded'] += 1
+        self._report()
+
+    def _update(self, device: str, **fields) -> None:
+        with self._lock:
+            self._drives[device].update(fields)
+        self._report()
+
+    def _report(self) -> None:
+        with self._lock:
+            elapsed = time.monotonic() - self._start
+            drives = {device: dict(drive) for device, drive in self._drives.items()}
+            self.progress({
+                'event': 'farm',
+                'elapsed': round(elapsed, 3),
+                'drives': drives,
+                'ripped': sum(d['ripped'] for d in drives.values()),
+                'verified': sum(d['verified'] for d in drives.values()),
+                'encoded': sum(d['encoded'] for d in drives.values()),
+                'speed': round(sum(d['audio_seconds'] for d in drives.values()) / elapsed, 2) if elapsed else 0.0,
+            })
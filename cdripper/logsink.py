@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+
+from typing import Any
+
+from PyQt5 import QtCore
+
+
+class LogSink(QtCore.QObject):
+    """Batches lines for a QPlainTextEdit and appends them on a timer.
+
+    cdparanoia and flac report progress many times a second; appending each
+    read makes the widget re-lay out every time. Lines are collected and
+    appended together at most every INTERVAL ms, and the widget keeps only the
+    last MAX_BLOCKS lines.
+    """
+    INTERVAL = 100
+    MAX_BLOCKS = 2000
+
+    def __init__(self, widget: Any) -> None:
+        super().__init__(widget)
+        self.widget = widget
+        self.widget.setMaximumBlockCount(self.MAX_BLOCKS)
+        self._pending: list = []
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(self.INTERVAL)
+        self._timer.timeout.connect(self.flush)
+
+    def appendPlainText(self, text: str) -> None:
+        self._pending.append(text)
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def flush(self) -> None:
+        if self._pending:
+            text = '\n'.join(self._pending[-self.MAX_BLOCKS:])
+            self._pending.clear()
+            self.widget.appendPlainText(text)
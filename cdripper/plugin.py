@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+
+import concurrent.futures
+import os
+from typing import Any, Optional
+
+import discid
+from PyQt5 import QtCore
+from PyQt5.QtWidgets import QDialog
+from PyQt5.QtCore import pyqtSignal
+
+from picard import formats
+from picard.disc import Disc
+from picard.plugins.cdripper import accuraterip, engine, logsink, ripjob, scratch, ui
+from picard.util import encode_filename, sanitize_filename
+
+
+class RipCDDialog(QDialog):
+    """Dialog for the CD Ripper UI."""
+    def __init__(self, parent: Optional[Any]):
+        super().__init__(parent)
+        self.ui = ui.Ui_CDRipperUI()
+        self.ui.setupUi(self)
+        self.rip_log = logsink.LogSink(self.ui.rip_output)
+        self.encode_log = logsink.LogSink(self.ui.encode_output)
+        self.ar_log = logsink.LogSink(self.ui.ar_output)
+
+
+class PipelineThread(QtCore.QThread):
+    """Runs an engine.Pipeline off the main thread, reporting through signals.
+
+    Threads are kept alive until they are done, so a cancelled rip may wind
+    down after its ripper is gone. An encode pool that is replaced while
+    rips still use it is shut down once the last of them is done.
+    """
+    progress = pyqtSignal(object)  # an engine.Pipeline progress event
+    ripFinished = pyqtSignal(object)  # track_num -> {'flac': path, 'ar': result}
+    ripFailed = pyqtSignal(str)
+
+    _running: set = set()
+    _retired: set = set()  # replaced encode pools, until no running rip uses them
+
+    def __init__(self, disc_obj, device: str, **options) -> None:
+        super().__init__()
+        self.disc_obj = disc_obj
+        self.pipeline = engine.Pipeline(device, None, progress=self.progress.emit, **options)
+        PipelineThread._running.add(self)
+        self.finished.connect(self._done)
+
+    def cancel(self) -> None:
+        self.pipeline.cancel()
+
+    def run(self) -> None:
+        try:
+            results = self.pipeline.run(self.disc_obj)
+        except engine.Cancelled:
+            return
+        except Exception as e:
+            self.ripFailed.emit(str(e))
+        else:
+            self.ripFinished.emit(results)
+
+    def _done(self) -> None:
+        self.wait()
+        PipelineThread._running.discard(self)
+        PipelineThread._shutDownRetired()
+
+    @classmethod
+    def retire(cls, pool: engine.EncodePool) -> None:
+        """Shut an encode pool down, as soon as no running rip uses it any more."""
+        cls._retired.add(pool)
+        cls._shutDownRetired()
+
+    @classmethod
+    def _shutDownRetired(cls) -> None:
+        in_use = {thread.pipeline.encode_pool for thread in cls._running}
+        for pool in cls._retired - in_use:
+            pool.shutdown(wait=False)
+        cls._retired &= in_use
+
+
+class CDRipper(QtCore.QObject):
+    """Rips the album's disc with an engine.Pipeline and hands the FLAC files to Picard.
+
+    The pipeline runs on a PipelineThread, and its progress is shown in the
+    dialog's cdparanoia, flac and AccurateRip logs. See engine.Pipeline for
+    the pipelined and streaming modes, the rip job that is kept (and resumed
+    by ripping the disc again) if the dialog is closed before the rip is
+    done, the scratch space reserved for it in RAM or on disk, and the
+    verified tracks kept for later rips.
+
+    The album's disc is looked for in every drive listed in the CD lookup
+    device setting. Checksums of all running rips share one thread pool and
+    their encodes one engine.EncodePool.
+
+    The FLAC files are left in the detached job and handed to Picard
+    REGISTER_BATCH at a time. The time that takes is added to the rip's
+    report (engine.Pipeline.REPORT_NAME, next to the files), which is then
+    summarised in the encoder log.
+    """
+    _verify_pool: Optional[concurrent.futures.Executor] = None
+    _encode_pool: Optional[engine.EncodePool] = None
+    REGISTER_BATCH = 4  # files handed to Picard per turn of the event loop
+    STAGE_LOGS = {'rip': 'rip_log', 'scratch': 'rip_log', 'resume': 'rip_log', 'store': 'rip_log',
+                  'accuraterip': 'ar_log', 'encode': 'encode_log', 'report': 'encode_log'}
+
+    def __init__(self, album: Any) -> None:
+        super().__init__()
+        self.album = album
+        self.discid: Optional[str] = None
+        self._device: Optional[str] = None
+        self._disc_obj = None  # discid.Disc for AccurateRip
+        self._tracks: dict = {}  # track_num -> the album's track
+        self._thread: Optional[PipelineThread] = None
+        self._pipeline: Optional[engine.Pipeline] = None
+
+        self.widget = RipCDDialog(self.tagger.window)
+        self.widget.ui.cancel_button.clicked.connect(self.widget.reject)
+        self.widget.ui.finished_button.clicked.connect(self.widget.accept)
+
+    def run(self) -> None:
+        self._device, disc = self._findDisc()
+        self.discid = disc.id
+        self.log.debug(f'CD in {self._device} has discid: {disc.id}')
+        self.widget.setWindowTitle(f'{self.widget.windowTitle()} — {self._device}')
+        self.widget.show()
+        try:
+            self._disc_obj = discid.read(encode_filename(self._device))
+        except Exception as e:
+            self.errorHandler(f'could not read the table of contents: {e}')
+            return
+
+        for root in (self._jobRoot(), self._ramRoot()):
+            if root:
+                ripjob.prune(root)
+        self.widget.rejected.connect(self._cleanup)
+        self._start()
+
+    def _start(self) -> None:
+        setting = self.config.setting
+        self._tracks = {int(track.metadata['tracknumber']): track for track in self.album.tracks
+                        if self.discid in track.metadata['~musicbrainz_discids']}
+        cache_root = os.path.join(
+            QtCore.QStandardPaths.writableLocation(QtCore.QStandardPaths.CacheLocation), 'cdripper')
+        store_mb = setting['cdripper_store_mb']
+        self._thread = PipelineThread(
+            self._disc_obj, self._device,
+            cdparanoia_opts=setting['cdripper_cdparanoia_opts'],
+            flac_opts=setting['cdripper_flac_opts'],
+            retries=setting['cdripper_ar_retries'],
+            offset_window=setting['cdripper_ar_offset_window'],
+            segmented=setting['cdripper_ar_segment_rerip'],
+            streaming=setting['cdripper_streaming'],
+            pipelined=setting['cdripper_pipelined'],
+            cache_dir=os.path.join(cache_root, 'accuraterip'),
+            offline=setting['cdripper_ar_offline'],
+            verify_pool=self._verifyPool(),
+            encode_pool=self._encodePool(setting['cdripper_encode_jobs'] or os.cpu_count() or 1),
+            job_dir=self._jobRoot(),
+            ram_dir=self._ramRoot(),
+            store_dir=os.path.join(cache_root, 'tracks') if store_mb else None,
+            store_bytes=store_mb * 2**20,
+            ar_url=self._arUrl(),
+            mirror_path=setting['cdripper_ar_mirror'] or None,
+            names={track_num: self._flacName(track) for track_num, track in self._tracks.items()},
+        )
+        self._pipeline = self._thread.pipeline
+        self._thread.progress.connect(self._progress)
+        self._thread.ripFinished.connect(self._ripFinished)
+        self._thread.ripFailed.connect(self.errorHandler)
+        self.widget.ui.finished_button.setDisabled(True)
+        self.widget.rip_log.appendPlainText('Ripping CD...')
+        self._thread.start()
+
+    def _jobRoot(self) -> str:
+        cache_root = QtCore.QStandardPaths.writableLocation(QtCore.QStandardPaths.CacheLocation)
+        return os.path.join(cache_root, 'cdripper', 'jobs')
+
+    def _ramRoot(self) -> Optional[str]:
+        return scratch.default_ram_root() if self.config.setting['cdripper_ram_scratch'] else None
+
+    def _findDisc(self) -> tuple:
+        """Return (device, picard Disc) of the drive holding this album's disc.
+
+        Falls back to the first readable drive if no disc matches the album.
+        """
+        devices = [d for d in self.config.setting['cd_lookup_device'].split(',') if d]
+        discids = ' '.join(track.metadata['~musicbrainz_discids'] for track in self.album.tracks)
+        readable = []
+        for device in devices:
+            disc = Disc()
+            try:
+                disc.read(encode_filename(device))
+            except Exception as e:
+                self.log.debug(f'No disc read from {device}: {e}')
+                continue
+            if disc.id in discids:
+                return device, disc
+            readable.append((device, disc))
+        if readable:
+            return readable[0]
+        disc = Disc()
+        disc.read(encode_filename(devices[0]))  # raises the read error
+        return devices[0], disc
+
+    def _arUrl(self) -> str:
+        """The configured database URL, or the default one if it is not an http(s) URL."""
+        url = self.config.setting['cdripper_ar_url']
+        try:
+            accuraterip.shared_client(url)
+        except ValueError as e:
+            self.widget.ar_log.appendPlainText(f'{e}; using {accuraterip.BASE_URL} instead.')
+            return accuraterip.BASE_URL
+        return url
+
+    @classmethod
+    def _verifyPool(cls) -> concurrent.futures.Executor:
+        if cls._verify_pool is None:
+            cls._verify_pool = concurrent.futures.ThreadPoolExecutor(os.cpu_count() or 1)
+        return cls._verify_pool
+
+    @classmethod
+    def _encodePool(cls, limit: int) -> engine.EncodePool:
+        """The pool every rip encodes in, made afresh if the number of encoders was changed."""
+        if cls._encode_pool is None or cls._encode_pool.limit != limit:
+            if cls._encode_pool is not None:
+                PipelineThread.retire(cls._encode_pool)  # its threads end with its last encodes
+            cls._encode_pool = engine.EncodePool(limit)
+        return cls._encode_pool
+
+    def _flacName(self, track: Any) -> str:
+        track_num = track.metadata['tracknumber'].zfill(2)
+        return sanitize_filename(f'{track_num} {track.metadata["title"]}.flac')
+
+    def _progress(self, event: dict) -> None:
+        """Show a pipeline progress event in the log it belongs to."""
+        if event['event'] == 'log':
+            getattr(self.widget, self.STAGE_LOGS.get(event['stage'], 'rip_log')).appendPlainText(
+                event['message'])
+            return
+        if event['event'] != 'stage':
+            return
+        stage, track_num, seconds = event['stage'], event.get('track'), event['seconds'] or 0
+        if stage == 'lookup' and not event.get('error'):
+            self.widget.ar_log.appendPlainText(
+                f'AccurateRip data ready ({event["pressings"]} pressings).')
+        elif stage == 'rip':
+            self.widget.rip_log.appendPlainText(f'Track {track_num:02d}: ripped in {seconds:.1f}s')
+        elif stage == 'disc':
+            self.widget.rip_log.appendPlainText('CD ripping complete!')
+            if not self._pipeline.pipelined:
+                self.widget.ui.ripper_tab.setCurrentIndex(2)  # verification starts: AccurateRip tab
+        elif stage in ('encode', 'tag'):
+            done = 'encoded' if stage == 'encode' else 'tagged'
+            self.widget.encode_log.appendPlainText(
+                f'Track {track_num:02d}: {done} in {seconds:.1f}s '
+                f'(queued {event.get("queued") or 0:.1f}s)')
+
+    def _ripFinished(self, results: dict) -> None:
+        failed = [tn for tn, r in results.items() if not r['ar']['ok']]
+        if failed:
+            tracks_str = ', '.join(f'{t:02d}' for t in sorted(failed))
+            self.widget.ar_log.appendPlainText(
+                f'\nWarning: track(s) {tracks_str} did not pass AccurateRip verification.')
+        else:
+            self.widget.ar_log.appendPlainText('\nAll tracks verified successfully.')
+        # The files are Picard's from here on; ripping the disc again starts afresh.
+        flac_files = [(result['flac'], self._tracks[track_num])
+                      for track_num, result in sorted(results.items()) if track_num in self._tracks]
+        self._addFiles(self._pipeline.directory, flac_files)
+
+    def _addFiles(self, directory: str, flac_files: list) -> None:
+        """Hand the files to Picard REGISTER_BATCH at a time.
+
+        Each batch is opened in one turn of the event loop, so the dialog
+        keeps repainting while a long disc is registered.
+        """
+        rip_stats = self._pipeline.stats
+        for path, track in flac_files[:self.REGISTER_BATCH]:
+            with rip_stats.measure('open', int(track.metadata['tracknumber'])):
+                f = formats.open_(path)
+            f.parent = track
+            self.tagger.files[path] = f
+            track.add_file(f)
+            f.load(lambda *_, **__: True)
+        rest = flac_files[self.REGISTER_BATCH:]
+        if rest:
+            QtCore.QTimer.singleShot(0, lambda: self._addFiles(directory, rest))
+            return
+
+        self.log.debug('Encoding successful!')
+        self.album.load()
+        self._writeReport(directory)
+        self.widget.ui.finished_button.setEnabled(True)
+
+    def _writeReport(self, directory: str) -> None:
+        rip_stats = self._pipeline.stats
+        report_path = os.path.join(directory, engine.Pipeline.REPORT_NAME)
+        try:
+            rip_stats.write(report_path)
+        except OSError as e:
+            self.log.debug(f'Failed to write rip report: {e}')
+            report_path = None
+        log = self.widget.encode_log
+        log.appendPlainText('\nTimings' + (f' (report: {report_path})' if report_path else '') + ':')
+        for line in rip_stats.summary():
+            log.appendPlainText(f'  {line}')
+
+    def errorHandler(self, error: Any) -> None:
+        msg = f'Ripping/Encoding failed: {error}'
+        self.log.debug(msg)
+        self.widget.rip_log.appendPlainText(msg)
+
+    def _cleanup(self) -> None:
+        if self._thread is None or not self._thread.isRunning():
+            return
+        # Nothing may reach the closed dialog; the pipeline keeps the job,
+        # so ripping the disc again resumes the rip.
+        for signal in (self._thread.progress, self._thread.ripFinished, self._thread.ripFailed):
+            signal.disconnect()
+        self._thread.cancel()
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+
+from typing import Any, Optional
+
+from picard.config import BoolOption, IntOption, TextOption
+from picard.plugins.cdripper import accuraterip, stream, trackstore
+from picard.ui.itemviews import BaseAction, register_album_action
+from picard.ui.options import OptionsPage, register_options_page
+
+# This is all Picard loads at startup, and most sessions never rip a CD: the
+# ripper (plugin.py, which brings in the engine, discid and the checksum
+# backends) is imported the first time the action is used, and the options
+# page's widgets the first time it is shown. Keep the imports above light;
+# test_imports.py holds them to a time budget.
+
+
+class RipCD(BaseAction):
+    """Album action to start the CD ripper.
+
+    The rip dialog is not modal, so albums in other drives can be ripped at
+    the same time; the action keeps each running ripper alive.
+    """
+    NAME = '&Rip CD...'
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._rippers: set = set()
+
+    def callback(self, objs: list) -> None:
+        from picard.plugins.cdripper.plugin import CDRipper
+
+        album = objs[0]
+        ripper = CDRipper(album)
+        self._rippers.add(ripper)
+        ripper.widget.finished.connect(lambda *_: self._rippers.discard(ripper))
+        ripper.run()
+
+
+class CDRipperOptionsPage(OptionsPage):
+    """Options page for the CD Ripper plugin."""
+    NAME = 'cdripper'
+    TITLE = 'CD Ripper'
+    PARENT = 'plugins'
+
+    options = [
+        TextOption('setting', 'cdripper_cdparanoia_opts', stream.CDPARANOIA_OPTS),
+        TextOption('setting', 'cdripper_flac_opts', stream.FLAC_OPTS),
+        IntOption('setting', 'cdripper_encode_jobs', 0),
+        BoolOption('setting', 'cdripper_pipelined', True),
+        BoolOption('setting', 'cdripper_streaming', False),
+        BoolOption('setting', 'cdripper_ram_scratch', True),
+        IntOption('setting', 'cdripper_ar_retries', 3),
+        BoolOption('setting', 'cdripper_ar_segment_rerip', True),
+        IntOption('setting', 'cdripper_ar_offset_window', accuraterip.OFFSET_WINDOW),
+        BoolOption('setting', 'cdripper_ar_offline', False),
+        TextOption('setting', 'cdripper_ar_url', accuraterip.BASE_URL),
+        TextOption('setting', 'cdripper_ar_mirror', ''),
+        IntOption('setting', 'cdripper_store_mb', trackstore.MAX_BYTES // 2**20),
+    ]
+
+    def __init__(self, parent: Optional[Any] = None) -> None:
+        from picard.plugins.cdripper import ui_options_cdripper
+
+        super().__init__()
+        self.ui = ui_options_cdripper.Ui_CDRipperOptionsPage()
+        self.ui.setupUi(self)
+
+    def load(self) -> None:
+        self.ui.cdparanoia_opts.setText(self.config.setting['cdripper_cdparanoia_opts'])
+        self.ui.flac_opts.setText(self.config.setting['cdripper_flac_opts'])
+        self.ui.pipelined.setChecked(self.config.setting['cdripper_pipelined'])
+        self.ui.streaming.setChecked(self.config.setting['cdripper_streaming'])
+        self.ui.ram_scratch.setChecked(self.config.setting['cdripper_ram_scratch'])
+        self.ui.encode_jobs.setValue(self.config.setting['cdripper_encode_jobs'])
+        self.ui.ar_retries.setValue(self.config.setting['cdripper_ar_retries'])
+        self.ui.ar_segment_rerip.setChecked(self.config.setting['cdripper_ar_segment_rerip'])
+        self.ui.ar_offset_window.setValue(self.config.setting['cdripper_ar_offset_window'])
+        self.ui.ar_offline.setChecked(self.config.setting['cdripper_ar_offline'])
+        self.ui.ar_url.setText(self.config.setting['cdripper_ar_url'])
+        self.ui.ar_mirror.setText(self.config.setting['cdripper_ar_mirror'])
+        self.ui.store_size.setValue(self.config.setting['cdripper_store_mb'])
+
+    def save(self) -> None:
+        self.config.setting['cdripper_cdparanoia_opts'] = self.ui.cdparanoia_opts.text()
+        self.config.setting['cdripper_flac_opts'] = self.ui.flac_opts.text()
+        self.config.setting['cdripper_pipelined'] = self.ui.pipelined.isChecked()
+        self.config.setting['cdripper_streaming'] = self.ui.streaming.isChecked()
+        self.config.setting['cdripper_ram_scratch'] = self.ui.ram_scratch.isChecked()
+        self.config.setting['cdripper_encode_jobs'] = self.ui.encode_jobs.value()
+        self.config.setting['cdripper_ar_retries'] = self.ui.ar_retries.value()
+        self.config.setting['cdripper_ar_segment_rerip'] = self.ui.ar_segment_rerip.isChecked()
+        self.config.setting['cdripper_ar_offset_window'] = self.ui.ar_offset_window.value()
+        self.config.setting['cdripper_ar_offline'] = self.ui.ar_offline.isChecked()
+        self.config.setting['cdripper_ar_url'] = self.ui.ar_url.text().strip() or accuraterip.BASE_URL
+        self.config.setting['cdripper_ar_mirror'] = self.ui.ar_mirror.text().strip()
+        self.config.setting['cdripper_store_mb'] = self.ui.store_size.value()
+
+
+register_options_page(CDRipperOptionsPage)
+register_album_action(RipCD())
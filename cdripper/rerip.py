@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import wave
+import zlib
+
+
+SECTOR_BYTES = 2352
+SECTORS_PER_SECOND = 75
+SEGMENT_SECTORS = 750  # 10 seconds of audio per re-read segment
+
+
+def span(track_num: int, first_sector: int, n_sectors: int) -> str:
+    """cdparanoia span for n_sectors starting first_sector into the track.
+
+    Positions are written as track[h:mm:ss.ff] (ff in sectors); both ends are
+    inclusive.
+    """
+    return f'{track_num}[{_position(first_sector)}]-{track_num}[{_position(first_sector + n_sectors - 1)}]'
+
+
+def _position(sector: int) -> str:
+    seconds, frames = divmod(sector, SECTORS_PER_SECOND)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f'{hours}:{minutes:02d}:{seconds:02d}.{frames:02d}'
+
+
+class SegmentedTrack:
+    """Consensus re-reading of one track in fixed-size sector segments.
+
+    Every distinct read of a segment is stored under workdir, keyed by its
+    CRC-32, together with how often it was seen. A segment is settled once two
+    reads agree, so later attempts only need to re-read the unsettled ones.
+    The track is reassembled from the most frequently seen read of each
+    segment (the latest one on a tie).
+    """
+
+    def __init__(self, workdir: str, n_sectors: int, segment_sectors: int = SEGMENT_SECTORS) -> None:
+        self.workdir = workdir
+        self.n_sectors = n_sectors
+        self.segment_sectors = segment_sectors
+        self.count = -(-n_sectors // segment_sectors)
+        self._reads: list[dict] = [{} for _ in range(self.count)]  # crc -> [hits, last seen]
+        self._seen = 0
+        os.makedirs(workdir, exist_ok=True)
+
+    @classmethod
+    def from_wav(cls, workdir: str, wav_path: str, segment_sectors: int = SEGMENT_SECTORS):
+        """Start from a full read of the track, recording each segment of it."""
+        with wave.open(wav_path, 'rb') as w:
+            n_sectors = w.getnframes() * 4 // SECTOR_BYTES
+        track = cls(workdir, n_sectors, segment_sectors)
+        track.add_wav(wav_path)
+        return track
+
+    def sectors(self, index: int) -> tuple[int, int]:
+        """(first sector, sector count) of segment index, relative to the track."""
+        first = index * self.segment_sectors
+        return first, min(self.segment_sectors, self.n_sectors - first)
+
+    def unsettled(self) -> list[int]:
+        return [i for i, reads in enumerate(self._reads)
+                if max((hits for hits, _ in reads.values()), default=0) < 2]
+
+    def add_wav(self, wav_path: str, index: int = 0) -> None:
+        """Record a read starting at segment index and covering one or more segments.
+
+        Raises ValueError if the file is not 16-bit stereo or does not end on a
+        segment boundary (or the end of the track).
+        """
+        with wave.open(wav_path, 'rb') as w:
+            if (w.getnchannels(), w.getsampwidth()) != (2, 2):
+                raise ValueError(f'{wav_path}: expected 16-bit stereo audio')
+            while True:
+                if index >= self.count:
+                    if w.readframes(1):
+                        raise ValueError(f'{wav_path}: read extends past the end of the track')
+                    return
+                _, n = self.sectors(index)
+                data = w.readframes(n * SECTOR_BYTES // 4)
+                if not data:
+                    return
+                if len(data) != n * SECTOR_BYTES:
+                    raise ValueError(f'{wav_path}: read ends inside segment {index}')
+                self.add_read(index, data)
+                index += 1
+
+    def add_read(self, index: int, data: bytes) -> None:
+        crc = zlib.crc32(data)
+        self._seen += 1
+        reads = self._reads[index]
+        if crc in reads:
+            reads[crc][0] += 1
+            reads[crc][1] = self._seen
+            return
+        with open(self._path(index, crc), 'wb') as f:
+            f.write(data)
+        reads[crc] = [1, self._seen]
+
+    def write_wav(self, wav_path: str) -> None:
+        """Write the consensus of all reads as a 44.1 kHz stereo WAV."""
+        with wave.open(wav_path, 'wb') as w:
+            w.setnchannels(2)
+            w.setsampwidth(2)
+            w.setframerate(44100)
+            for index, reads in enumerate(self._reads):
+                crc = max(reads, key=lambda c: reads[c])
+                with open(self._path(index, crc), 'rb') as f:
+                    w.writeframes(f.read())
+
+    def cleanup(self) -> None:
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def _path(self, index: int, crc: int) -> str:
+        return os.path.join(self.workdir, f'seg{index:04d}-{crc:08x}.pcm')
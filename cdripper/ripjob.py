@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+
+import fcntl
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import Any, Optional
+
+
+MANIFEST = 'manifest.json'
+MAX_AGE = 14 * 24 * 3600  # seconds an abandoned job is kept for resuming
+STEPS = ('ripped', 'crcs', 'verified', 'encoded', 'tagged')
+
+_LOCK = '.lock'
+
+
+class RipJob:
+    """Working directory of one disc's rip, kept until the rip has finished.
+
+    The directory is named after the disc ID, so ripping the same disc again
+    after a crash or a cancelled rip picks up where it stopped. A manifest
+    records for each track which steps are done:
+
+      ripped    the file holding the track's audio (its WAV, or the FLAC of
+                a streamed track)
+      crcs      the AccurateRip (crcv1, crcv2) of a streamed track
+      verified  the AccurateRip result
+      encoded   the FLAC file
+      tagged    True once the FLAC is tagged
+
+    Files are recorded with their size, and a step only counts as done while
+    its file is still there at that size, so a file cut short by the
+    interruption is made again. The manifest is replaced atomically after
+    every change. While a job is open its directory is locked; a second rip
+    of the same disc (another drive, another Picard) gets a directory of its
+    own.
+    """
+
+    def __init__(self, root: str, disc_id: str) -> None:
+        self.disc_id = disc_id
+        os.makedirs(root, exist_ok=True)
+        for n in itertools.count(1):
+            directory = os.path.join(root, disc_id if n == 1 else f'{disc_id}-{n}')
+            os.makedirs(directory, exist_ok=True)
+            lock = open(os.path.join(directory, _LOCK), 'a')
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock.close()
+                continue
+            break
+        self.directory = directory
+        self._lock_file = lock
+        self._lock = threading.Lock()
+        self._tracks = self._load()
+        self.resumed = any(self._tracks.values())
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def get(self, track_num: int, step: str) -> Any:
+        """The value recorded for a step, or None; see done() for files."""
+        with self._lock:
+            value = self._tracks.get(track_num, {}).get(step)
+        if isinstance(value, dict) and 'file' in value:
+            return value['file']
+        return value
+
+    def done(self, track_num: int, step: str) -> bool:
+        with self._lock:
+            value = self._tracks.get(track_num, {}).get(step)
+        if isinstance(value, dict) and 'file' in value:
+            try:
+                return os.path.getsize(value['file']) == value['size']
+            except OSError:
+                return False
+        return value is not None and value is not False
+
+    def record(self, track_num: int, **steps: Any) -> None:
+        """Record steps as done, e.g. record(3, encoded=RipJob.file(path), tagged=True)."""
+        with self._lock:
+            self._tracks.setdefault(track_num, {}).update(steps)
+            self._save()
+
+    @staticmethod
+    def file(path: str) -> dict:
+        """The value recording path as the result of a step, with its current size."""
+        return {'file': os.path.abspath(path), 'size': os.path.getsize(path)}
+
+    def forget(self, track_num: int, *steps: str) -> None:
+        with self._lock:
+            track = self._tracks.get(track_num, {})
+            if [step for step in steps or STEPS if track.pop(step, None) is not None]:
+                self._save()
+
+    def close(self) -> None:
+        """Release the directory, keeping it for a later rip to resume."""
+        self._lock_file.close()
+
+    def remove(self) -> None:
+        """Delete the directory; the rip is finished and nothing in it is needed."""
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self.close()
+
+    def detach(self, root: Optional[str] = None) -> str:
+        """Move the finished rip's files out of the job and return their directory.
+
+        The files stay, under a new name next to the job (or in root, which
+        may be on another file system), for whoever still uses them; a new
+        rip of the disc starts afresh.
+        """
+        for name in (MANIFEST, _LOCK):
+            if os.path.exists(self.path(name)):
+                os.unlink(self.path(name))
+        if root is not None:
+            os.makedirs(root, exist_ok=True)
+        target = tempfile.mkdtemp(prefix=f'{os.path.basename(self.directory)}.',
+                                  dir=root or os.path.dirname(self.directory))
+        if root is None:
+            os.replace(self.directory, target)  # onto the empty directory just made
+        else:
+            for name in os.listdir(self.directory):
+                shutil.move(self.path(name), target)
+            os.rmdir(self.directory)
+        self.close()
+        return target
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path(MANIFEST), encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get('disc_id') != self.disc_id:
+                return {}
+            return {int(tn): steps for tn, steps in manifest['tracks'].items()}
+        except (OSError, ValueError, KeyError, AttributeError):
+            return {}
+
+    def _save(self) -> None:
+        manifest = {'disc_id': self.disc_id,
+                    'tracks': {str(tn): steps for tn, steps in sorted(self._tracks.items())}}
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, indent=1)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path(MANIFEST))
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+
+
+def prune(root: str, max_age: float = MAX_AGE) -> None:
+    """Remove jobs abandoned for longer than max_age and empty finished directories.
+
+    Directories of open jobs and finished ones that still hold files are left alone.
+    """
+    try:
+        entries = list(os.scandir(root))
+    except OSError:
+        return
+    now = time.time()
+    for entry in entries:
+        if not entry.is_dir(follow_symlinks=False):
+            continue
+        lock_path = os.path.join(entry.path, _LOCK)
+        if not os.path.exists(lock_path):
+            try:
+                os.rmdir(entry.path)  # only succeeds once the files have been moved away
+            except OSError:
+                pass
+            continue
+        try:
+            with open(lock_path, 'a') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                manifest = os.path.join(entry.path, MANIFEST)
+                changed = os.stat(manifest if os.path.exists(manifest) else lock_path).st_mtime
+                if now - changed > max_age:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+        except OSError:
+            continue
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+
+import errno
+import os
+import threading
+import time
+from typing import Optional
+
+
+SECTOR_BYTES = 2352  # PCM bytes per CD sector
+RAM_DIR = '/dev/shm'
+RAM_HEADROOM = 256 * 1024 * 1024  # bytes of RAM (and of the RAM filesystem) left free
+
+_cond = threading.Condition()
+_reservations: list = []  # every Reservation held in this process
+
+
+class NoSpace(OSError):
+    """Neither scratch root has room for a disc.
+
+    waiting_helps is True if rips still running in this process hold enough
+    space that the disc would fit once they are done.
+    """
+
+    def __init__(self, message: str, waiting_helps: bool = False) -> None:
+        super().__init__(errno.ENOSPC, message)
+        self.waiting_helps = waiting_helps
+
+
+def disc_bytes(disc) -> int:
+    """Size of the disc's audio as PCM (WAV) files, from its TOC."""
+    return disc.sectors * SECTOR_BYTES
+
+
+def default_ram_root() -> Optional[str]:
+    """Where rips go in RAM by default, or None if there is no RAM-backed directory."""
+    if os.path.isdir(RAM_DIR) and os.access(RAM_DIR, os.W_OK):
+        return os.path.join(RAM_DIR, 'cdripper-jobs')
+    return None
+
+
+def free_bytes(path: str) -> int:
+    """Space an unprivileged process can still write on path's filesystem."""
+    while not os.path.exists(path):
+        path = os.path.dirname(path)
+    st = os.statvfs(path)
+    return st.f_bavail * st.f_frsize
+
+
+def available_memory() -> Optional[int]:
+    """MemAvailable from /proc/meminfo, or None where that is not known."""
+    try:
+        with open('/proc/meminfo', encoding='ascii') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+class Reservation:
+    """Space set aside for one disc under root until release()."""
+
+    def __init__(self, root: str, need: int) -> None:
+        self.root = root
+        self.need = need
+        self.directory: Optional[str] = None  # the job's directory, once made
+        self._device = _device(root)
+
+    def pending(self) -> int:
+        """Bytes reserved but not written yet."""
+        return max(0, self.need - _directory_bytes(self.directory))
+
+    def release(self) -> None:
+        with _cond:
+            if self in _reservations:
+                _reservations.remove(self)
+            _cond.notify_all()
+
+    def __enter__(self) -> 'Reservation':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+
+class Scratch:
+    """Chooses where a disc's rip job goes: in RAM if there is room, else on disk.
+
+    ram_root is a directory on a RAM-backed filesystem (tmpfs), or None to
+    always use disk_root. A disc goes in RAM if both the filesystem and the
+    machine's available memory have room for it plus RAM_HEADROOM, and on
+    disk if that has room. Space reserved by other rips in this process and
+    not written yet counts as used, so drives ripping at the same time do
+    not all count on the same free space. A disc with a job left by an
+    interrupted rip goes where that job is, needing only what it has not
+    written yet.
+    """
+
+    def __init__(self, disk_root: str, ram_root: Optional[str] = None,
+                 headroom: int = RAM_HEADROOM) -> None:
+        self.disk_root = disk_root
+        self.ram_root = ram_root
+        self.headroom = headroom
+
+    def reserve(self, disc_id: str, need: int, timeout: Optional[float] = None) -> Reservation:
+        """Reserve need bytes for the disc; return the reservation, whose root the job goes in.
+
+        If there is no room, waits for other rips in this process to release
+        theirs, for at most timeout seconds (None waits as long as that can
+        help), and then raises NoSpace.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with _cond:
+            while True:
+                roots = self._roots(disc_id)
+                for root, is_ram in roots:
+                    left = need - _directory_bytes(os.path.join(root, disc_id))
+                    if self._room(root, is_ram) >= left:
+                        reservation = Reservation(root, need)
+                        _reservations.append(reservation)
+                        return reservation
+                waiting_helps = any(
+                    self._room(root, is_ram, others=False) >= need for root, is_ram in roots)
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if not waiting_helps or (remaining is not None and remaining <= 0):
+                    where = ' or '.join(root for root, _ in roots)
+                    raise NoSpace(f'Not enough space in {where} for {need / 2**20:.0f} MiB of audio',
+                                  waiting_helps)
+                _cond.wait(remaining)
+
+    def _roots(self, disc_id: str) -> list:
+        roots = [(self.disk_root, False)]
+        if self.ram_root:
+            roots.insert(0, (self.ram_root, True))
+        for root, is_ram in roots:
+            if os.path.isdir(os.path.join(root, disc_id)):
+                return [(root, is_ram)]  # resume where the interrupted rip was
+        return roots
+
+    def _room(self, root: str, is_ram: bool, others: bool = True) -> int:
+        """Bytes a new job under root can use; others=False ignores other rips' reservations."""
+        room = free_bytes(root)
+        if is_ram:
+            memory = available_memory()
+            if memory is not None:
+                room = min(room, memory)
+            room -= self.headroom
+        if others:
+            device = _device(root)
+            room -= sum(r.pending() for r in _reservations if r._device == device)
+        return room
+
+
+def _device(path: str) -> int:
+    while not os.path.exists(path):
+        path = os.path.dirname(path)
+    return os.stat(path).st_dev
+
+
+def _directory_bytes(directory: Optional[str]) -> int:
+    if not directory:
+        return 0
+    try:
+        return sum(entry.stat().st_size for entry in os.scandir(directory) if entry.is_file())
+    except OSError:
+        return 0
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+
+import contextlib
+import json
+import os
+import subprocess
+import threading
+import time
+from typing import Callable, Optional
+
+
+class RipStats:
+    """Per-stage timings of one rip, for finding where a slow disc spends its time.
+
+    Each record is one run of a stage (rip, lookup, crc, encode, tag, ...),
+    optionally for one track, with its wall time and, where known, CPU time,
+    bytes processed and time spent queued before it started. Safe to use
+    from several threads.
+    """
+
+    def __init__(self) -> None:
+        self.info: dict = {}
+        self._records: list = []
+        self._counters: dict = {}
+        self._lock = threading.Lock()
+        self._start = time.monotonic()
+
+    def add(
+        self,
+        stage: str,
+        track: Optional[int] = None,
+        wall: Optional[float] = None,
+        cpu: Optional[float] = None,
+        nbytes: Optional[int] = None,
+        queued: Optional[float] = None,
+    ) -> None:
+        record = {'stage': stage, 'track': track, 'wall': wall, 'cpu': cpu,
+                  'bytes': nbytes, 'queued': queued}
+        with self._lock:
+            self._records.append(record)
+
+    @contextlib.contextmanager
+    def measure(self, stage: str, track: Optional[int] = None, queued: Optional[float] = None):
+        """Time the block as one run of stage; CPU time is this thread's.
+
+        Yields a dict in which the block may set 'bytes' (and add to 'cpu',
+        e.g. for a child process).
+        """
+        fields = {'bytes': None, 'cpu': 0.0}
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield fields
+        finally:
+            self.add(stage, track, time.perf_counter() - wall,
+                     fields['cpu'] + time.thread_time() - cpu, fields['bytes'], queued)
+
+    def count(self, counter: str, track: Optional[int] = None, n: int = 1) -> None:
+        with self._lock:
+            key = (counter, track)
+            self._counters[key] = self._counters.get(key, 0) + n
+
+    def report(self) -> dict:
+        """Totals per stage and per track, as JSON-ready dicts."""
+        with self._lock:
+            records = list(self._records)
+            counters = dict(self._counters)
+        stages: dict = {}
+        tracks: dict = {}
+        for record in records:
+            _accumulate(stages.setdefault(record['stage'], {}), record)
+            if record['track'] is not None:
+                track = tracks.setdefault(str(record['track']), {})
+                _accumulate(track.setdefault(record['stage'], {}), record)
+        for totals in [*stages.values(), *(s for t in tracks.values() for s in t.values())]:
+            if totals.get('bytes') and totals['wall']:
+                totals['mb_per_s'] = round(totals['bytes'] / totals['wall'] / 1e6, 2)
+        totals_by_counter: dict = {}
+        for (counter, track), n in counters.items():
+            totals_by_counter[counter] = totals_by_counter.get(counter, 0) + n
+            if track is not None:
+                tracks.setdefault(str(track), {})[counter] = n
+        return {
+            'info': dict(self.info),
+            'elapsed': round(time.monotonic() - self._start, 3),
+            'stages': stages,
+            'tracks': tracks,
+            'counters': totals_by_counter,
+        }
+
+    def summary(self) -> list:
+        """Human-readable lines: one per stage, slowest first."""
+        report = self.report()
+        lines = []
+        stages = sorted(report['stages'].items(), key=lambda item: -item[1]['wall'])
+        for stage, totals in stages:
+            line = f'{stage}: {totals["count"]}× {totals["wall"]:.1f}s wall'
+            if totals.get('cpu') is not None:
+                line += f', {totals["cpu"]:.1f}s CPU'
+            if totals.get('bytes'):
+                line += f', {totals["bytes"] / 1e6:.1f} MB'
+                if 'mb_per_s' in totals:
+                    line += f' at {totals["mb_per_s"]:.1f} MB/s'
+            if totals.get('queued'):
+                line += f', {totals["queued"]:.1f}s queued'
+            lines.append(line)
+        for counter, n in sorted(report['counters'].items()):
+            lines.append(f'{counter}: {n}')
+        if report['info']:
+            lines.append(', '.join(f'{k}: {v}' for k, v in sorted(report['info'].items())))
+        return lines
+
+    def write(self, path: str) -> None:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=2)
+
+
+def _accumulate(totals: dict, record: dict) -> None:
+    totals['count'] = totals.get('count', 0) + 1
+    totals['wall'] = round(totals.get('wall', 0.0) + (record['wall'] or 0.0), 3)
+    for key in ('cpu', 'bytes', 'queued'):
+        if record[key] is not None:
+            value = totals.get(key) or 0
+            totals[key] = value + record[key] if key == 'bytes' else round(value + record[key], 3)
+
+
+def run_process(args: list, cwd: Optional[str] = None,
+                started: Optional[Callable[[subprocess.Popen], None]] = None,
+                stderr: Optional[Callable[[bytes], None]] = None) -> tuple[int, float]:
+    """Run a command with its output discarded; return (exit status, CPU seconds).
+
+    started, if given, is called with the process as soon as it is running,
+    and stderr with each chunk of its error output as it arrives.
+    """
+    process = subprocess.Popen(args, cwd=cwd, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.PIPE if stderr else subprocess.DEVNULL)
+    if started:
+        started(process)
+    if stderr:
+        with process.stderr:
+            for data in iter(lambda: os.read(process.stderr.fileno(), 65536), b''):
+                stderr(data)
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return process.returncode, usage.ru_utime + usage.ru_stime
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+
+import subprocess
+from typing import Callable, Optional
+
+
+CDPARANOIA_OPTS = '--batch 1:-'  # defaults of the command lines the ripper runs
+FLAC_OPTS = '--verify --replay-gain --delete-input-file'
+CHUNK_BYTES = 1 << 18  # 64k samples; one pipe read
+
+
+def tee_pipe(
+    source_cmd: list,
+    sink_cmd: list,
+    consumer: Callable,
+    cwd: Optional[str] = None,
+    stderr: Optional[int] = None,
+    started: Optional[Callable[[subprocess.Popen], None]] = None,
+) -> int:
+    """Run ``source_cmd | sink_cmd`` and pass every chunk to consumer as well.
+
+    The data only ever exists as one chunk in memory: each read from the
+    source is handed to consumer (e.g. a CrcAccumulator's update) and written
+    to the sink before the next read. Returns the number of bytes streamed.
+    Raises subprocess.CalledProcessError if either command fails.
+
+    The error output of both commands goes to the file descriptor stderr,
+    or is discarded. started, if given, is called with each process as
+    soon as it is running.
+    """
+    if stderr is None:
+        stderr = subprocess.DEVNULL
+    source = subprocess.Popen(source_cmd, cwd=cwd, stdout=subprocess.PIPE, stderr=stderr)
+    if started:
+        started(source)
+    try:
+        sink = subprocess.Popen(sink_cmd, cwd=cwd, stdin=subprocess.PIPE,
+                                stdout=subprocess.DEVNULL, stderr=stderr)
+    except OSError:
+        source.kill()
+        source.wait()
+        raise
+    if started:
+        started(sink)
+
+    total = 0
+    sink_broken = False
+    try:
+        buf = bytearray(CHUNK_BYTES)
+        view = memoryview(buf)
+        while True:
+            n = source.stdout.readinto(buf)
+            if not n:
+                break
+            consumer(view[:n])
+            total += n
+            if not sink_broken:
+                try:
+                    sink.stdin.write(view[:n])
+                except BrokenPipeError:
+                    sink_broken = True  # reported through the sink's exit status
+    finally:
+        source.stdout.close()
+        try:
+            sink.stdin.close()
+        except BrokenPipeError:
+            pass
+        source_status = source.wait()
+        sink_status = sink.wait()
+
+    if source_status:
+        raise subprocess.CalledProcessError(source_status, source_cmd)
+    if sink_status or sink_broken:
+        raise subprocess.CalledProcessError(sink_status or -1, sink_cmd)
+    return total
+
+
+# cdparanoia options that take a separate value; everything else that does
+# not start with '-' is the span (or output file) of a batch rip.
+_CDPARANOIA_VALUE_OPTS = {
+    '-d', '--force-cdrom-device', '-g', '--force-generic-device',
+    '-k', '--force-cooked-device', '-O', '--sample-offset',
+    '-S', '--force-read-speed', '-n', '--force-default-sectors',
+    '-o', '--force-search-overlap', '-T', '--toc-offset',
+}
+_SAMPLE_OFFSET_OPTS = {'-O', '--sample-offset'}
+_CDPARANOIA_OUTPUT_OPTS = {
+    '-B', '--batch', '-w', '--output-wav', '-f', '--output-aiff', '-a', '--output-aifc',
+    '-p', '--output-raw', '-r', '--output-raw-little-endian', '-R', '--output-raw-big-endian',
+}
+_FLAC_RAW_INPUT = [
+    '--force-raw-format', '--endian=little', '--sign=signed',
+    '--channels=2', '--bps=16', '--sample-rate=44100',
+]
+
+
+def drive_args(opts: str, offset_correction: int = 0) -> list:
+    """The drive options (device, offset, speed, ...) in cdparanoia opts.
+
+    Batch mode, output format and the span are left out. An
+    offset_correction is added to the read offset the options set (see
+    sample_offset()), replacing their -O.
+    """
+    args = []
+    tokens = opts.split()
+    for i, token in enumerate(tokens):
+        if token in _CDPARANOIA_OUTPUT_OPTS:
+            continue
+        if offset_correction and _offset_token(tokens, i):
+            continue
+        if token.startswith('-') or (i and tokens[i - 1] in _CDPARANOIA_VALUE_OPTS):
+            args.append(token)
+    if offset_correction:
+        args += ['-O', str(sample_offset(opts) + offset_correction)]
+    return args
+
+
+def sample_offset(opts: str) -> int:
+    """The read offset in samples that cdparanoia opts set with -O, 0 if none."""
+    offset = 0
+    tokens = opts.split()
+    for i, token in enumerate(tokens):
+        if not _offset_token(tokens, i):
+            continue
+        if i and tokens[i - 1] in _SAMPLE_OFFSET_OPTS:
+            offset = int(token)
+        elif token.startswith('--sample-offset='):
+            offset = int(token.partition('=')[2])
+        elif token not in _SAMPLE_OFFSET_OPTS:
+            offset = int(token[2:])  # -O6
+    return offset
+
+
+def _offset_token(tokens: list, i: int) -> bool:
+    """Whether tokens[i] is a -O option or its value."""
+    token = tokens[i]
+    return (bool(i) and tokens[i - 1] in _SAMPLE_OFFSET_OPTS) or token.startswith(
+        ('-O', '--sample-offset'))
+
+
+def cdparanoia_args(opts: str, track_num: int, output: str = '-') -> list:
+    """cdparanoia arguments that rip one track to output.
+
+    By default the track is written as raw little-endian PCM to stdout; any
+    other output is a WAV file name. Drive options are kept from opts (see
+    drive_args()).
+    """
+    args = drive_args(opts)
+    if output == '-':
+        args.append('--output-raw-little-endian')
+    return args + [str(track_num), output]
+
+
+def flac_args(opts: str, flac_path: str) -> list:
+    """flac arguments that encode raw CD audio from stdin into flac_path."""
+    args = [opt for opt in opts.split() if opt != '--delete-input-file']
+    return args + _FLAC_RAW_INPUT + ['-o', flac_path, '-']
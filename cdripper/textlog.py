@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+
+import codecs
+import collections
+import os
+from typing import BinaryIO, Callable
+
+
+class LineDecoder:
+    """Turns a process's raw output into complete lines of text.
+
+    Output arrives in arbitrary chunks, so UTF-8 sequences and lines can be
+    split between reads; both are carried over to the next feed(). A line
+    redrawn with carriage returns (a progress meter) is reduced to its last
+    state. Each complete line is passed to emit, and the last `keep` of
+    them are kept in last (e.g. for the message of a failed command).
+    """
+
+    def __init__(self, emit: Callable[[str], None], keep: int = 0) -> None:
+        self.emit = emit
+        self.last: collections.deque = collections.deque(maxlen=keep)
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self._partial = ''
+
+    def feed(self, data: bytes, final: bool = False) -> None:
+        """Decode data; with final, also flush the last unterminated line."""
+        lines = (self._partial + self._decoder.decode(data, final)).split('\n')
+        self._partial = lines.pop()
+        if final and self._partial:
+            lines.append(self._partial)
+            self._partial = ''
+        for line in lines:
+            line = line.rstrip('\r').rsplit('\r', 1)[-1]
+            self.last.append(line)
+            self.emit(line)
+
+    def read(self, pipe: BinaryIO) -> None:
+        """Feed everything read from pipe until the writers close it, then close it."""
+        with pipe:
+            for data in iter(lambda: os.read(pipe.fileno(), 65536), b''):
+                self.feed(data)
+        self.feed(b'', final=True)
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import shutil
+import tempfile
+import time
+from typing import Optional
+
+
+MAX_BYTES = 4 * 1024 * 1024 * 1024
+
+_FLAC = '.flac'
+_RESULT = '.json'
+
+
+class TrackStore:
+    """On-disk store of verified FLAC files keyed by AccurateRip disc ID and track CRC.
+
+    Each track is ``<disc id>-NN-<CRCv1>.flac`` with a ``.json`` beside it
+    holding the AccurateRip result and the FLAC's size. Only tracks that
+    matched a pressing in the database are kept, so ripping the same pressing
+    again can take them from here instead of reading the drive. When the
+    store grows past max_bytes the least recently used tracks are removed.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = MAX_BYTES) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def get(self, disc_id: str, track_num: int) -> Optional[tuple[str, dict]]:
+        """Return (FLAC path, AccurateRip result) of the stored track, or None.
+
+        If rips with different CRCs are stored, the best confirmed one is
+        returned. The file may be evicted by another rip at any time, so copy
+        it and treat a failed copy as a miss.
+        """
+        prefix = f'{disc_id}-{track_num:02d}-'
+        best = None
+        try:
+            entries = [e for e in os.scandir(self.directory)
+                       if e.name.startswith(prefix) and e.name.endswith(_RESULT)]
+        except OSError:
+            return None
+        for entry in entries:
+            flac_path = entry.path[:-len(_RESULT)] + _FLAC
+            try:
+                with open(entry.path, encoding='utf-8') as f:
+                    stored = json.load(f)
+                if os.path.getsize(flac_path) != stored['size']:
+                    continue
+                result = stored['result']
+                if best is None or result['confidence'] > best[1]['confidence']:
+                    best = flac_path, result
+            except (OSError, ValueError, KeyError, TypeError):
+                continue
+        if best is not None:
+            now = time.time()
+            for path in (best[0], best[0][:-len(_FLAC)] + _RESULT):
+                try:
+                    os.utime(path, (now, os.stat(path).st_mtime))  # access time drives LRU
+                except OSError:
+                    pass
+        return best
+
+    def put(self, disc_id: str, track_num: int, flac_path: str, result: dict) -> bool:
+        """Store a copy of a track's FLAC; return whether it was stored.
+
+        Tracks that did not match AccurateRip (or have no CRC in their result)
+        are not stored. The store is best-effort: write failures are ignored.
+        """
+        if not (result.get('ok') and result.get('confidence', 0) > 0 and result.get('crc')):
+            return False
+        stem = os.path.join(self.directory, f'{disc_id}-{track_num:02d}-{result["crc"]}')
+        tmp_paths = []
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            tmp_paths.append(tmp)
+            with os.fdopen(fd, 'wb') as f, open(flac_path, 'rb') as src:
+                shutil.copyfileobj(src, f)
+            size = os.path.getsize(tmp)
+            fd, tmp_result = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            tmp_paths.append(tmp_result)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'size': size, 'result': result}, f)
+            os.replace(tmp, stem + _FLAC)  # the result last: it marks the track complete
+            os.replace(tmp_result, stem + _RESULT)
+        except OSError:
+            for path in tmp_paths:
+                self._remove(path)
+            return False
+        self.evict()
+        return True
+
+    def evict(self) -> None:
+        """Remove least recently used tracks until the store is under max_bytes."""
+        tracks: dict = {}  # stem -> [last used, bytes, paths]
+        try:
+            entries = list(os.scandir(self.directory))
+        except OSError:
+            return
+        for entry in entries:
+            stem, suffix = os.path.splitext(entry.path)
+            if suffix not in (_FLAC, _RESULT):
+                continue
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            track = tracks.setdefault(stem, [0, 0, []])
+            track[0] = max(track[0], st.st_atime)
+            track[1] += st.st_size
+            track[2].append(entry.path)
+
+        total = sum(size for _, size, _ in tracks.values())
+        for _, size, paths in sorted(tracks.values()):
+            if total <= self.max_bytes:
+                break
+            for path in sorted(paths, key=lambda p: p.endswith(_FLAC)):  # the result first
+                self._remove(path)
+            total -= size
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
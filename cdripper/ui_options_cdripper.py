@@ -2,12 +2,15 @@
 
 # Form implementation generated from reading ui file 'options_cdripper.ui'
 #
-# Created by: PyQt5 UI code generator 5.5.1
+# Created by: PyQt5 UI code generator 5.15.11
 #
-# WARNING! All changes made in this file will be lost!
+# WARNING: Any manual changes made to this file will be lost when pyuic5 is
+# run again.  Do not edit this file unless you know what you are doing.
+
 
 from PyQt5 import QtCore, QtGui, QtWidgets
 
+
 class Ui_CDRipperOptionsPage(object):
     def setupUi(self, CDRipperOptionsPage):
         CDRipperOptionsPage.setObjectName("CDRipperOptionsPage")
@@ -22,6 +25,15 @@ class Ui_CDRipperOptionsPage(object):
         self.vboxlayout1.setContentsMargins(9, 9, 9, 9)
         self.vboxlayout1.setSpacing(2)
         self.vboxlayout1.setObjectName("vboxlayout1")
+        self.pipelined = QtWidgets.QCheckBox(self.media_library_info)
+        self.pipelined.setObjectName("pipelined")
+        self.vboxlayout1.addWidget(self.pipelined)
+        self.streaming = QtWidgets.QCheckBox(self.media_library_info)
+        self.streaming.setObjectName("streaming")
+        self.vboxlayout1.addWidget(self.streaming)
+        self.ram_scratch = QtWidgets.QCheckBox(self.media_library_info)
+        self.ram_scratch.setObjectName("ram_scratch")
+        self.vboxlayout1.addWidget(self.ram_scratch)
         self.vboxlayout.addWidget(self.media_library_info)
         self.cdparanoia_options = QtWidgets.QGroupBox(CDRipperOptionsPage)
         self.cdparanoia_options.setObjectName("cdparanoia_options")
@@ -48,6 +60,19 @@ class Ui_CDRipperOptionsPage(object):
         self.flac_opts = QtWidgets.QLineEdit(self.flac_options)
         self.flac_opts.setObjectName("flac_opts")
         self.vboxlayout3.addWidget(self.flac_opts)
+        self.encode_jobs_layout = QtWidgets.QHBoxLayout()
+        self.encode_jobs_layout.setObjectName("encode_jobs_layout")
+        self.encode_jobs_label = QtWidgets.QLabel(self.flac_options)
+        self.encode_jobs_label.setObjectName("encode_jobs_label")
+        self.encode_jobs_layout.addWidget(self.encode_jobs_label)
+        self.encode_jobs = QtWidgets.QSpinBox(self.flac_options)
+        self.encode_jobs.setMinimum(0)
+        self.encode_jobs.setMaximum(64)
+        self.encode_jobs.setObjectName("encode_jobs")
+        self.encode_jobs_layout.addWidget(self.encode_jobs)
+        spacerItem = QtWidgets.QSpacerItem(40, 20, QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Minimum)
+        self.encode_jobs_layout.addItem(spacerItem)
+        self.vboxlayout3.addLayout(self.encode_jobs_layout)
         self.vboxlayout.addWidget(self.flac_options)
         self.accuraterip_options = QtWidgets.QGroupBox(CDRipperOptionsPage)
         self.accuraterip_options.setObjectName("accuraterip_options")
@@ -56,6 +81,7 @@ class Ui_CDRipperOptionsPage(object):
         self.vboxlayout4.setSpacing(2)
         self.vboxlayout4.setObjectName("vboxlayout4")
         self.ar_retries_layout = QtWidgets.QHBoxLayout()
+        self.ar_retries_layout.setObjectName("ar_retries_layout")
         self.ar_retries_label = QtWidgets.QLabel(self.accuraterip_options)
         self.ar_retries_label.setObjectName("ar_retries_label")
         self.ar_retries_layout.addWidget(self.ar_retries_label)
@@ -64,11 +90,57 @@ class Ui_CDRipperOptionsPage(object):
         self.ar_retries.setMaximum(10)
         self.ar_retries.setObjectName("ar_retries")
         self.ar_retries_layout.addWidget(self.ar_retries)
-        self.ar_retries_layout.addStretch()
+        spacerItem1 = QtWidgets.QSpacerItem(40, 20, QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Minimum)
+        self.ar_retries_layout.addItem(spacerItem1)
         self.vboxlayout4.addLayout(self.ar_retries_layout)
+        self.ar_segment_rerip = QtWidgets.QCheckBox(self.accuraterip_options)
+        self.ar_segment_rerip.setObjectName("ar_segment_rerip")
+        self.vboxlayout4.addWidget(self.ar_segment_rerip)
+        self.ar_offset_window_layout = QtWidgets.QHBoxLayout()
+        self.ar_offset_window_layout.setObjectName("ar_offset_window_layout")
+        self.ar_offset_window_label = QtWidgets.QLabel(self.accuraterip_options)
+        self.ar_offset_window_label.setObjectName("ar_offset_window_label")
+        self.ar_offset_window_layout.addWidget(self.ar_offset_window_label)
+        self.ar_offset_window = QtWidgets.QSpinBox(self.accuraterip_options)
+        self.ar_offset_window.setMinimum(0)
+        self.ar_offset_window.setMaximum(10000)
+        self.ar_offset_window.setObjectName("ar_offset_window")
+        self.ar_offset_window_layout.addWidget(self.ar_offset_window)
+        spacerItem2 = QtWidgets.QSpacerItem(40, 20, QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Minimum)
+        self.ar_offset_window_layout.addItem(spacerItem2)
+        self.vboxlayout4.addLayout(self.ar_offset_window_layout)
+        self.ar_offline = QtWidgets.QCheckBox(self.accuraterip_options)
+        self.ar_offline.setObjectName("ar_offline")
+        self.vboxlayout4.addWidget(self.ar_offline)
+        self.ar_url_label = QtWidgets.QLabel(self.accuraterip_options)
+        self.ar_url_label.setObjectName("ar_url_label")
+        self.vboxlayout4.addWidget(self.ar_url_label)
+        self.ar_url = QtWidgets.QLineEdit(self.accuraterip_options)
+        self.ar_url.setObjectName("ar_url")
+        self.vboxlayout4.addWidget(self.ar_url)
+        self.ar_mirror_label = QtWidgets.QLabel(self.accuraterip_options)
+        self.ar_mirror_label.setObjectName("ar_mirror_label")
+        self.vboxlayout4.addWidget(self.ar_mirror_label)
+        self.ar_mirror = QtWidgets.QLineEdit(self.accuraterip_options)
+        self.ar_mirror.setObjectName("ar_mirror")
+        self.vboxlayout4.addWidget(self.ar_mirror)
+        self.store_size_layout = QtWidgets.QHBoxLayout()
+        self.store_size_layout.setObjectName("store_size_layout")
+        self.store_size_label = QtWidgets.QLabel(self.accuraterip_options)
+        self.store_size_label.setObjectName("store_size_label")
+        self.store_size_layout.addWidget(self.store_size_label)
+        self.store_size = QtWidgets.QSpinBox(self.accuraterip_options)
+        self.store_size.setMinimum(0)
+        self.store_size.setMaximum(1048576)
+        self.store_size.setSingleStep(512)
+        self.store_size.setObjectName("store_size")
+        self.store_size_layout.addWidget(self.store_size)
+        spacerItem3 = QtWidgets.QSpacerItem(40, 20, QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Minimum)
+        self.store_size_layout.addItem(spacerItem3)
+        self.vboxlayout4.addLayout(self.store_size_layout)
         self.vboxlayout.addWidget(self.accuraterip_options)
-        spacerItem = QtWidgets.QSpacerItem(281, 20, QtWidgets.QSizePolicy.Minimum, QtWidgets.QSizePolicy.Expanding)
-        self.vboxlayout.addItem(spacerItem)
+        spacerItem4 = QtWidgets.QSpacerItem(281, 20, QtWidgets.QSizePolicy.Minimum, QtWidgets.QSizePolicy.Expanding)
+        self.vboxlayout.addItem(spacerItem4)
 
         self.retranslateUi(CDRipperOptionsPage)
         QtCore.QMetaObject.connectSlotsByName(CDRipperOptionsPage)
@@ -77,10 +149,19 @@ class Ui_CDRipperOptionsPage(object):
     def retranslateUi(self, CDRipperOptionsPage):
         _translate = QtCore.QCoreApplication.translate
         self.media_library_info.setTitle(_translate("CDRipperOptionsPage", "CD Ripping options"))
+        self.pipelined.setText(_translate("CDRipperOptionsPage", "Verify and encode each track while the rest of the disc is ripped"))
+        self.streaming.setText(_translate("CDRipperOptionsPage", "Stream audio straight into flac without temporary WAV files"))
+        self.ram_scratch.setText(_translate("CDRipperOptionsPage", "Keep temporary files in RAM (tmpfs) when the disc fits"))
         self.cdparanoia_options.setTitle(_translate("CDRipperOptionsPage", "cdparanoia"))
         self.cdparanoia_opts_label.setText(_translate("CDRipperOptionsPage", "Command line options:"))
         self.flac_options.setTitle(_translate("CDRipperOptionsPage", "flac"))
         self.flac_opts_label.setText(_translate("CDRipperOptionsPage", "Command line options:"))
+        self.encode_jobs_label.setText(_translate("CDRipperOptionsPage", "Parallel encoders (0 = one per CPU core):"))
         self.accuraterip_options.setTitle(_translate("CDRipperOptionsPage", "AccurateRip"))
         self.ar_retries_label.setText(_translate("CDRipperOptionsPage", "Max retries per track:"))
-
+        self.ar_segment_rerip.setText(_translate("CDRipperOptionsPage", "On retry, re-read only the parts of the track that differ between reads"))
+        self.ar_offset_window_label.setText(_translate("CDRipperOptionsPage", "Drive offset search (± samples, 0 = off):"))
+        self.ar_offline.setText(_translate("CDRipperOptionsPage", "Offline: only use cached AccurateRip data"))
+        self.ar_url_label.setText(_translate("CDRipperOptionsPage", "Database or mirror URL:"))
+        self.ar_mirror_label.setText(_translate("CDRipperOptionsPage", "Local mirror file, looked up first (optional):"))
+        self.store_size_label.setText(_translate("CDRipperOptionsPage", "Keep verified tracks for re-rips (MiB, 0 = off):"))
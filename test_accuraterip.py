@@ -7,9 +7,13 @@ The module is imported directly by path so that importing the ``cdripper``
 package (which pulls in ``discid`` and ``picard``) is not required.
 """
 
+import http.server
 import importlib.util
 import os
+import random
 import struct
+import tempfile
+import threading
 import unittest
 
 _HERE = os.path.dirname(os.path.abspath(__file__))
@@ -75,28 +79,88 @@ class ComputeDiscIdsTest(unittest.TestCase):
 
 class FetchUrlTest(unittest.TestCase):
     def test_url_fanout_and_filename(self):
-        # Capture the URL fetch() builds without hitting the network.
+        # Capture the path fetch() asks for without hitting the network.
         disc = ComputeDiscIdsTest.DISC
-        captured = {}
+        captured = []
 
-        def fake_urlopen(url, timeout=None):
-            captured['url'] = url
-            raise RuntimeError('stop before network')
-
-        orig = accuraterip.urllib.request.urlopen
-        accuraterip.urllib.request.urlopen = fake_urlopen
-        try:
-            accuraterip.fetch(disc)
-        finally:
-            accuraterip.urllib.request.urlopen = orig
+        class FakeClient:
+            def get(self, path):
+                captured.append(path)
+                return None
 
+        self.assertIsNone(accuraterip.fetch(disc, client=FakeClient()))
         # id1 = 0x0000e89e -> low three nibbles: e, 9, 8
-        self.assertIn('/accuraterip/e/9/8/', captured['url'])
-        self.assertTrue(
-            captured['url'].endswith(
-                'dBAR-003-0000e89e-000307fb-1a2b3c4d.bin'
-            )
-        )
+        self.assertEqual(captured, ['e/9/8/dBAR-003-0000e89e-000307fb-1a2b3c4d.bin'])
+
+
+class _StandIn(http.server.BaseHTTPRequestHandler):
+    """Serves the responses queued in server.answers as (status, body)."""
+    protocol_version = 'HTTP/1.1'  # keep-alive
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def do_GET(self):
+        self.server.paths.append(self.path)
+        status, body = self.server.answers.pop(0) if self.server.answers else (404, b'')
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class ClientTest(unittest.TestCase):
+    def setUp(self):
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), _StandIn)
+        self.server.daemon_threads = True
+        self.server.answers, self.server.paths, self.server.connections = [], [], 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/mirror/'
+        self.client = accuraterip.Client(self.url, backoff=0)
+        self.addCleanup(self.client.close)
+
+    def test_requests_share_one_connection(self):
+        self.server.answers = [(200, b'one'), (200, b'two')]
+        self.assertEqual(self.client.get('a.bin'), b'one')
+        self.assertEqual(self.client.get('b.bin'), b'two')
+        self.assertEqual(self.server.paths, ['/mirror/a.bin', '/mirror/b.bin'])
+        self.assertEqual(self.server.connections, 1)
+
+    def test_missing_file_is_none(self):
+        self.assertIsNone(self.client.get('a.bin'))
+        self.assertEqual(len(self.server.paths), 1)
+
+    def test_server_errors_are_retried(self):
+        self.server.answers = [(503, b''), (500, b''), (200, b'data')]
+        self.assertEqual(self.client.get('a.bin'), b'data')
+        self.assertEqual(len(self.server.paths), 3)
+
+    def test_failure_after_retries_is_an_error_not_a_miss(self):
+        self.server.answers = [(503, b'')] * 4
+        with self.assertRaises(accuraterip.FetchError):
+            self.client.get('a.bin')
+        self.assertEqual(len(self.server.paths), 4)
+        self.server.answers = [(403, b'')]
+        with self.assertRaises(accuraterip.FetchError):
+            self.client.get('a.bin')  # not worth retrying
+        self.assertEqual(len(self.server.paths), 5)
+
+    def test_unreachable_server_is_an_error(self):
+        self.server.shutdown()
+        self.server.server_close()
+        client = accuraterip.Client(self.url, retries=1, backoff=0, timeout=1)
+        with self.assertRaises(accuraterip.FetchError):
+            client.get('a.bin')
+
+    def test_only_http_urls(self):
+        with self.assertRaises(ValueError):
+            accuraterip.Client('file:///srv/accuraterip')
 
 
 class ParseBinTest(unittest.TestCase):
@@ -110,14 +174,243 @@ class ParseBinTest(unittest.TestCase):
         data += struct.pack('<BII', 7, 0xCCCC3333, 0xDDDD4444)   # track 2
 
         result = accuraterip.parse_bin(data, 2)
-        self.assertEqual(result[0], [(10, 0xAAAA1111, 0xBBBB2222)])
-        self.assertEqual(result[1], [(7, 0xCCCC3333, 0xDDDD4444)])
+        self.assertEqual(list(result[0]), [(10, 0xAAAA1111, 0xBBBB2222)])
+        self.assertEqual(list(result[1]), [(7, 0xCCCC3333, 0xDDDD4444)])
 
     def test_mismatched_track_count_skipped(self):
         data = struct.pack('B', 3) + struct.pack('<III', 1, 2, 3)
         data += b'\x00' * (3 * 9)  # 3 track records for a 3-track pressing
         result = accuraterip.parse_bin(data, 2)
-        self.assertEqual(result, [[], []])
+        self.assertEqual([list(entries) for entries in result], [[], []])
+
+    def test_pressings_interleave_and_truncated_pressing_lines_up(self):
+        header = struct.pack('<BIII', 2, 1, 2, 3)
+        data = header + struct.pack('<BII', 1, 0x11, 0x12) + struct.pack('<BII', 2, 0x21, 0x22)
+        data += struct.pack('<BIII', 1, 4, 5, 6) + struct.pack('<BII', 9, 0x99, 0x99)
+        data += header + struct.pack('<BII', 3, 0x13, 0x14)  # cut short after track 1
+        result = accuraterip.parse_bin(data, 2)
+        self.assertEqual(list(result[0]), [(1, 0x11, 0x12), (3, 0x13, 0x14)])
+        self.assertEqual(list(result[1]), [(2, 0x21, 0x22)])
+        self.assertEqual(result[0][1], (3, 0x13, 0x14))
+        self.assertEqual(len(result[0]), 2)
+
+    def test_index_keeps_best_confidence(self):
+        data = b''
+        for conf in (4, 12, 7):
+            data += struct.pack('<BIII', 1, 1, 2, 3) + struct.pack('<BII', conf, 0xAB, 0)
+        entries = accuraterip.parse_bin(data, 1)[0]
+        self.assertEqual(entries.v1_index(), {0xAB: 12})
+        self.assertEqual(entries.v2_index(), {})
+        self.assertEqual(accuraterip.verify_track((0xAB, 0), entries), (True, 12))
+
+
+def _reference_crcs(samples, track_idx, total_tracks):
+    """Straight transcription of the reference C checksum loop."""
+    check_from = 2940 if track_idx == 0 else 0
+    check_to = len(samples) - 2940 if track_idx == total_tracks - 1 else len(samples)
+    lo = hi = 0
+    for mul, sample in enumerate(samples, start=1):
+        if check_from <= mul <= check_to:
+            product = sample * mul
+            lo += product & 0xFFFFFFFF
+            hi += product >> 32
+    return lo & 0xFFFFFFFF, (lo + hi) & 0xFFFFFFFF
+
+
+def _random_samples(n, seed):
+    rng = random.Random(seed)
+    return [rng.getrandbits(32) for _ in range(n)]
+
+
+def _write_wav(samples, extra_chunks=b'', fmt=(1, 2, 44100, 16)):
+    """Write uint32 stereo samples as a WAV file and return its path.
+
+    With no extra_chunks the file has the canonical 44-byte header.
+    """
+    tag, channels, rate, bits = fmt
+    pcm = struct.pack(f'<{len(samples)}I', *samples)
+    fmt_chunk = b'fmt ' + struct.pack(
+        '<IHHIIHH', 16, tag, channels, rate, rate * 4, 4, bits)
+    body = b'WAVE' + fmt_chunk + extra_chunks + b'data' + struct.pack('<I', len(pcm)) + pcm
+    f = tempfile.NamedTemporaryFile(suffix='.wav', delete=False)
+    with f:
+        f.write(b'RIFF' + struct.pack('<I', len(body)) + body)
+    return f.name
+
+
+class ComputeCrcsTest(unittest.TestCase):
+    # Long enough for both the first- and last-track skips to leave samples.
+    SAMPLES = _random_samples(7000, seed=1234)
+    POSITIONS = [(0, 3), (1, 3), (2, 3), (0, 1)]
+
+    def setUp(self):
+        self.path = _write_wav(self.SAMPLES)
+        self.addCleanup(os.unlink, self.path)
+
+    def test_pure_matches_reference_v1(self):
+        for idx, total in self.POSITIONS:
+            with self.subTest(track=idx, total=total):
+                expected, _ = _reference_crcs(self.SAMPLES, idx, total)
+                self.assertEqual(
+                    accuraterip._compute_crcv1_pure(self.path, idx, total), expected)
+
+    @unittest.skipUnless(accuraterip._HAS_NUMPY, 'numpy not installed')
+    def test_numpy_matches_reference(self):
+        for idx, total in self.POSITIONS:
+            with self.subTest(track=idx, total=total):
+                self.assertEqual(
+                    accuraterip._compute_crcs_numpy(self.path, idx, total),
+                    _reference_crcs(self.SAMPLES, idx, total),
+                )
+
+    @unittest.skipUnless(accuraterip._HAS_NUMPY, 'numpy not installed')
+    def test_numpy_batches_are_seamless(self):
+        orig = accuraterip.NUMPY_BATCH
+        accuraterip.NUMPY_BATCH = 1000
+        try:
+            crcs = accuraterip._compute_crcs_numpy(self.path, 0, 3)
+        finally:
+            accuraterip.NUMPY_BATCH = orig
+        self.assertEqual(crcs, _reference_crcs(self.SAMPLES, 0, 3))
+
+    def test_small_read_chunks(self):
+        orig = accuraterip.CHUNK_BYTES
+        accuraterip.CHUNK_BYTES = 4096
+        try:
+            crc = accuraterip._compute_crcv1_pure(self.path, 2, 3)
+        finally:
+            accuraterip.CHUNK_BYTES = orig
+        self.assertEqual(crc, _reference_crcs(self.SAMPLES, 2, 3)[0])
+
+    def test_first_track_includes_multiplier_2940(self):
+        samples = [0] * 2939 + [1] + [0] * 100
+        path = _write_wav(samples)
+        self.addCleanup(os.unlink, path)
+        self.assertEqual(accuraterip._compute_crcv1_pure(path, 0, 2), 2940)
+
+    def test_backend_name(self):
+        self.assertIn(accuraterip.crc_backend(), ('native', 'numpy', 'pure'))
+
+
+class ParseWavHeaderTest(unittest.TestCase):
+    def _parse(self, path):
+        self.addCleanup(os.unlink, path)
+        with open(path, 'rb') as f:
+            return accuraterip.parse_wav_header(f)
+
+    def test_canonical_header(self):
+        self.assertEqual(self._parse(_write_wav([1, 2, 3])), (44, 12))
+
+    def test_skips_list_chunk_with_padding(self):
+        # Odd-length chunk: one pad byte follows before the next chunk.
+        extra = b'LIST' + struct.pack('<I', 5) + b'INFOx' + b'\x00'
+        self.assertEqual(self._parse(_write_wav([1, 2, 3], extra)), (58, 12))
+
+    def test_rejects_non_cd_format(self):
+        path = _write_wav([1, 2, 3], fmt=(1, 2, 48000, 16))
+        with self.assertRaises(ValueError):
+            self._parse(path)
+
+    def test_rejects_non_riff(self):
+        f = tempfile.NamedTemporaryFile(suffix='.wav', delete=False)
+        with f:
+            f.write(b'\x00' * 64)
+        with self.assertRaises(ValueError):
+            self._parse(f.name)
+
+    def test_crcs_ignore_extra_chunks(self):
+        samples = ComputeCrcsTest.SAMPLES
+        extra = b'fact' + struct.pack('<II', 4, len(samples))
+        path = _write_wav(samples, extra)
+        self.addCleanup(os.unlink, path)
+        self.assertEqual(
+            accuraterip._compute_crcv1_pure(path, 1, 3),
+            _reference_crcs(samples, 1, 3)[0],
+        )
+
+
+class CrcAccumulatorTest(unittest.TestCase):
+    SAMPLES = ComputeCrcsTest.SAMPLES
+    PCM = struct.pack(f'<{len(SAMPLES)}I', *SAMPLES)
+
+    def _feed(self, chunk_size, use_numpy):
+        acc = accuraterip.CrcAccumulator(
+            len(self.SAMPLES), 0, 1, use_numpy=use_numpy)
+        for i in range(0, len(self.PCM), chunk_size):
+            acc.update(self.PCM[i:i + chunk_size])
+        return acc.crcs()
+
+    def test_unaligned_chunks_pure(self):
+        expected, _ = _reference_crcs(self.SAMPLES, 0, 1)
+        for chunk_size in (1, 3, 4, 1001):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(self._feed(chunk_size, False), (expected, 0))
+
+    @unittest.skipUnless(accuraterip._HAS_NUMPY, 'numpy not installed')
+    def test_unaligned_chunks_numpy(self):
+        expected = _reference_crcs(self.SAMPLES, 0, 1)
+        for chunk_size in (3, 4, 1001, len(self.PCM)):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(self._feed(chunk_size, True), expected)
+
+
+class OffsetSearchTest(unittest.TestCase):
+    PREV = _random_samples(400, seed=97)
+    TRACK = _random_samples(7000, seed=98)
+    NEXT = _random_samples(400, seed=99)
+
+    def setUp(self):
+        self.paths = [_write_wav(s) for s in (self.PREV, self.TRACK, self.NEXT)]
+        for path in self.paths:
+            self.addCleanup(os.unlink, path)
+
+    def _shifted(self, s, with_neighbours=True):
+        prev = self.PREV if with_neighbours else [0] * len(self.PREV)
+        nxt = self.NEXT if with_neighbours else [0] * len(self.NEXT)
+        z = prev + self.TRACK + nxt
+        start = len(prev) + s
+        return z[start:start + len(self.TRACK)]
+
+    def test_matches_reference_for_every_shift(self):
+        prev_path, path, next_path = self.paths
+        crcs = accuraterip.offset_crcs(path, 1, 3, 300, prev_path, next_path)
+        self.assertEqual(sorted(crcs), list(range(-300, 301)))
+        for s in (-300, -7, 0, 1, 299, 300):
+            with self.subTest(offset=s):
+                expected, _ = _reference_crcs(self._shifted(s), 1, 3)
+                self.assertEqual(crcs[s], expected)
+
+    def test_first_track_without_neighbours(self):
+        _, path, _ = self.paths
+        crcs = accuraterip.offset_crcs(path, 0, 2, 300)
+        for s in (-300, 0, 300):
+            with self.subTest(offset=s):
+                expected, _ = _reference_crcs(self._shifted(s, False), 0, 2)
+                self.assertEqual(crcs[s], expected)
+
+    def test_offset_zero_matches_compute_crcs(self):
+        _, path, _ = self.paths
+        crcs = accuraterip.offset_crcs(path, 2, 3, 10)
+        self.assertEqual(crcs[0], accuraterip._compute_crcv1_pure(path, 2, 3))
+
+    def test_pure_window_sums(self):
+        prev_path, path, next_path = self.paths
+        with_numpy = accuraterip.offset_crcs(path, 1, 3, 50, prev_path, next_path)
+        orig = accuraterip._HAS_NUMPY
+        accuraterip._HAS_NUMPY = False
+        try:
+            pure = accuraterip.offset_crcs(path, 1, 3, 50, prev_path, next_path)
+        finally:
+            accuraterip._HAS_NUMPY = orig
+        self.assertEqual(pure, with_numpy)
+
+    def test_find_offsets_prefers_confidence_then_small_shift(self):
+        crcs = {-6: 0xAAAA, 0: 0xBBBB, 4: 0xCCCC, 6: 0xAAAA}
+        entries = [(2, 0xAAAA, 0), (9, 0xCCCC, 0), (1, 0xDDDD, 0)]
+        self.assertEqual(
+            accuraterip.find_offsets(crcs, entries),
+            [(4, 9), (-6, 2), (6, 2)],
+        )
 
 
 class VerifyTrackTest(unittest.TestCase):
@@ -144,6 +437,13 @@ class VerifyTrackTest(unittest.TestCase):
         matched, _ = accuraterip.verify_track((0x12345678, 0), entries)
         self.assertFalse(matched)
 
+    def test_pressings_lists_every_matching_pressing(self):
+        entries = accuraterip.TrackEntries.from_tuples(
+            self.ENTRIES + [(0, 0x11111111, 0), (7, 0x11111111, 0)])
+        self.assertEqual(entries.pressings((0x11111111, 0)), {0: 5, 3: 7})
+        self.assertEqual(entries.pressings((0x33333333, 0x22222222)), {0: 5, 1: 3})
+        self.assertEqual(entries.pressings((0x12345678, 0)), {})
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for cdripper/arcache.py.
+
+Run with:  python3 -m unittest test_arcache
+
+The modules are imported directly by path so that importing the ``cdripper``
+package (which pulls in ``discid`` and ``picard``) is not required.
+"""
+
+import importlib.util
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def _load(name):
+    spec = importlib.util.spec_from_file_location(
+        name, os.path.join(_HERE, 'cdripper', f'{name}.py')
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+arcache = _load('arcache')
+accuraterip = _load('accuraterip')
+
+DISC_ID = '003-0000e89e-000307fb-1a2b3c4d'
+
+
+class BinCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+
+    def _age(self, disc_id, suffix, seconds):
+        path = os.path.join(self.dir, f'dBAR-{disc_id}{suffix}')
+        then = time.time() - seconds
+        os.utime(path, (then, then))
+
+    def test_round_trip(self):
+        cache = arcache.BinCache(self.dir)
+        self.assertEqual(cache.get(DISC_ID), (False, None))
+        cache.put(DISC_ID, b'payload')
+        self.assertEqual(cache.get(DISC_ID), (True, b'payload'))
+
+    def test_negative_entry(self):
+        cache = arcache.BinCache(self.dir)
+        cache.put(DISC_ID, None)
+        self.assertEqual(cache.get(DISC_ID), (True, None))
+        # A later positive answer replaces the negative one.
+        cache.put(DISC_ID, b'payload')
+        self.assertEqual(cache.get(DISC_ID), (True, b'payload'))
+        self.assertEqual(len(os.listdir(self.dir)), 1)
+
+    def test_negative_entries_expire_sooner(self):
+        cache = arcache.BinCache(self.dir, max_age=1000, negative_ttl=10)
+        cache.put('a', None)
+        cache.put('b', b'x')
+        self._age('a', '.missing', 100)
+        self._age('b', '.bin', 100)
+        self.assertEqual(cache.get('a'), (False, None))
+        self.assertEqual(cache.get('b'), (True, b'x'))
+
+    def test_size_eviction_drops_least_recently_used(self):
+        cache = arcache.BinCache(self.dir, max_bytes=25)
+        cache.put('old', b'x' * 10)
+        cache.put('new', b'x' * 10)
+        self._age('old', '.bin', 50)
+        self._age('new', '.bin', 40)
+        cache.get('old')  # touching it makes 'new' the eviction candidate
+        cache.put('third', b'x' * 10)
+        self.assertTrue(cache.get('old')[0])
+        self.assertFalse(cache.get('new')[0])
+        self.assertTrue(cache.get('third')[0])
+
+
+class _FakeTrack:
+    def __init__(self, offset):
+        self.offset = offset
+
+
+class _FakeDisc:
+    def __init__(self):
+        self.tracks = [_FakeTrack(o) for o in (150, 10000, 20000)]
+        self.sectors = 30000
+        self.freedb_id = '1a2b3c4d'
+
+
+class CachedFetchTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.cache = arcache.BinCache(self.dir)
+        self.calls = 0
+
+    def _serve(self, answer):
+        """A client that answers every request with answer, or raises it."""
+        test = self
+
+        class Client:
+            def get(self, path):
+                test.calls += 1
+                if isinstance(answer, BaseException):
+                    raise answer
+                return answer
+
+        return Client()
+
+    def test_404_is_remembered(self):
+        client = self._serve(None)
+        self.assertIsNone(accuraterip.fetch(_FakeDisc(), self.cache, client=client))
+        self.assertIsNone(accuraterip.fetch(_FakeDisc(), self.cache, client=client))
+        self.assertEqual(self.calls, 1)
+
+    def test_transport_error_is_not_cached(self):
+        client = self._serve(accuraterip.FetchError('timed out'))
+        with self.assertRaises(accuraterip.FetchError):
+            accuraterip.fetch(_FakeDisc(), self.cache, client=client)
+        self.assertEqual(self.cache.get(DISC_ID), (False, None))
+
+    def test_offline_serves_cache_only(self):
+        client = self._serve(AssertionError('network used in offline mode'))
+        self.cache.put(DISC_ID, b'payload')
+        self.assertEqual(accuraterip.fetch(_FakeDisc(), self.cache, offline=True, client=client),
+                         b'payload')
+        with self.assertRaises(accuraterip.NotCached):
+            accuraterip.fetch(_FakeDisc(), offline=True, client=client)
+        self.cache.put(DISC_ID, None)  # a remembered 404 is still an answer
+        self.assertIsNone(accuraterip.fetch(_FakeDisc(), self.cache, offline=True, client=client))
+        self.assertEqual(self.calls, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for cdripper/armirror.py.
+
+Run with:  python3 -m unittest test_armirror
+
+The modules are imported directly by path so that importing the ``cdripper``
+package (which pulls in ``discid`` and ``picard``) is not required.
+"""
+
+import importlib.util
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def _load(name):
+    spec = importlib.util.spec_from_file_location(
+        name, os.path.join(_HERE, 'cdripper', f'{name}.py')
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+armirror = _load('armirror')
+accuraterip = _load('accuraterip')
+
+DISC_ID = '003-0000e89e-000307fb-1a2b3c4d'
+IDS = (0x0000e89e, 0x000307fb, 0x1a2b3c4d)
+
+
+class _FakeTrack:
+    def __init__(self, offset):
+        self.offset = offset
+
+
+class _FakeDisc:
+    tracks = [_FakeTrack(150), _FakeTrack(10000), _FakeTrack(20000)]
+    sectors = 30000
+    freedb_id = '1a2b3c4d'
+
+
+def _pressing(n, *entries):
+    return struct.pack('<BIII', n, *IDS) + b''.join(struct.pack('<BII', *e) for e in entries)
+
+
+ONE = _pressing(3, (5, 1, 11), (5, 2, 12), (5, 3, 13))
+TWO = _pressing(3, (2, 4, 14), (2, 5, 15), (2, 6, 16))
+
+
+class MirrorTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.db = os.path.join(self.dir, 'mirror.db')
+        self.mirror = armirror.Mirror(self.db)
+        self.addCleanup(self.mirror.close)
+
+    def _bin(self, data, disc_id=DISC_ID, subdir='e/9/8'):
+        directory = os.path.join(self.dir, 'tree', subdir)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'dBAR-{disc_id}.bin')
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_import_tree_and_look_up(self):
+        self._bin(ONE + TWO)
+        self._bin(_pressing(2, (1, 1, 1), (1, 2, 2)), '002-00000001-00000002-00000003', '1/0/0')
+        self.assertEqual(self.mirror.import_files([os.path.join(self.dir, 'tree')]), (2, 0, 0))
+        self.assertEqual(len(self.mirror), 2)
+        self.assertEqual(self.mirror.get(DISC_ID), ONE + TWO)
+        self.assertIsNone(self.mirror.get('003-0000e89e-000307fb-00000000'))
+        self.assertIsNone(self.mirror.get('not a disc id'))
+
+    def test_only_complete_pressings_of_the_disc_are_kept(self):
+        other = _pressing(2, (9, 9, 9), (9, 9, 9))
+        self._bin(other + ONE + TWO[:-4])
+        self.mirror.import_files([os.path.join(self.dir, 'tree')])
+        data = self.mirror.get(DISC_ID)
+        self.assertEqual(data, ONE)
+        self.assertEqual([list(t) for t in accuraterip.parse_bin(data, 3)],
+                         [[(5, 1, 11)], [(5, 2, 12)], [(5, 3, 13)]])
+
+    def test_reimport_skips_unchanged_files_and_replaces_changed_ones(self):
+        path = self._bin(ONE)
+        tree = os.path.join(self.dir, 'tree')
+        self.assertEqual(self.mirror.import_files([tree]), (1, 0, 0))
+        self.assertEqual(self.mirror.import_files([tree]), (0, 1, 0))
+        with open(path, 'wb') as f:
+            f.write(ONE + TWO)
+        self.assertEqual(self.mirror.import_files([path]), (1, 0, 0))
+        self.assertEqual(self.mirror.get(DISC_ID), ONE + TWO)
+        self.assertEqual(len(self.mirror), 1)
+
+    def test_unusable_files_are_rejected(self):
+        misnamed = os.path.join(self.dir, 'disc.bin')
+        with open(misnamed, 'wb') as f:
+            f.write(ONE)
+        empty = self._bin(b'')
+        self.assertEqual(self.mirror.import_files([misnamed, empty, misnamed + '.gone']), (0, 0, 3))
+        self.assertEqual(len(self.mirror), 0)
+
+    def test_compact(self):
+        path = self._bin(ONE + TWO * 200)
+        self.mirror.import_files([path])
+        with open(path, 'wb') as f:
+            f.write(ONE)
+        os.utime(path, (0, 0))
+        self.mirror.import_files([path])
+        before, after = self.mirror.compact()
+        self.assertLessEqual(after, before)
+        self.assertEqual(self.mirror.get(DISC_ID), ONE)
+
+    def test_fetch_consults_the_mirror_first(self):
+        self.mirror.import_files([self._bin(ONE)])
+        self.mirror.close()
+        mirror = armirror.Mirror(self.db, readonly=True)
+        self.addCleanup(mirror.close)
+
+        class Offline:
+            def get(self, path):
+                raise AssertionError('network used for a disc in the mirror')
+
+        self.assertEqual(accuraterip.fetch(_FakeDisc(), offline=True, mirror=mirror), ONE)
+        self.assertEqual(accuraterip.fetch(_FakeDisc(), client=Offline(), mirror=mirror), ONE)
+
+    def test_readonly_mirror_must_exist(self):
+        with self.assertRaises(armirror.sqlite3.Error):
+            armirror.Mirror(os.path.join(self.dir, 'missing.db'), readonly=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
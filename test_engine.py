@@ -0,0 +1,711 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for cdripper/engine.py.
+
+Run with:  python3 -m unittest test_engine
+
+The engine needs neither Qt nor Picard, so the package is imported normally.
+cdparanoia, flac and metaflac are replaced by small scripts that copy audio
+from prepared files, and the AccurateRip data comes from a primed cache.
+"""
+
+import concurrent.futures
+import json
+import os
+import random
+import shutil
+import stat
+import struct
+import subprocess
+import sys
+import tempfile
+import textwrap
+import threading
+import time
+import types
+import unittest
+import wave
+from unittest import mock
+
+from cdripper import accuraterip, arcache, engine
+
+SECTORS = 12  # per track; more than the 5-sector first/last track skip
+
+FAKE_CDPARANOIA = '''
+import os, shutil, sys, time
+args = sys.argv[1:]
+src = os.environ['FAKE_CD']
+offset = args[args.index('-O') + 1] if '-O' in args else None
+print('reading', 'batch' if '--batch' in args else args[-2], file=sys.stderr)
+with open(os.path.join(src, 'reads.log'), 'a') as log:
+    log.write(('batch' if '--batch' in args else args[-2]) + ('@' + offset if offset else '') + '\\n')
+if os.environ.get('FAKE_CD_SLEEP') and '--batch' not in args:
+    open(os.path.join(src, 'reading'), 'w').close()
+    time.sleep(float(os.environ['FAKE_CD_SLEEP']))
+def wav(n):
+    # Reads at the offset that corrects the drive's come from cd/corrected.
+    corrected = offset is not None and offset == os.environ.get('FAKE_CD_OFFSET')
+    return os.path.join(src, 'corrected' if corrected else '', 'track%02d.cdda.wav' % n)
+if args[-1] == '-':
+    import wave
+    with wave.open(wav(int(args[-2]))) as w:
+        sys.stdout.buffer.write(w.readframes(w.getnframes()))
+elif '--batch' in args:
+    n = 1
+    while os.path.exists(wav(n)):
+        if n == int(os.environ.get('FAKE_CD_FAIL_AT', 0)):
+            sys.exit('read error in track %d' % n)
+        shutil.copy(wav(n), os.path.basename(wav(n)))
+        n += 1
+    # With FAKE_CD_HOLD the rip only finishes once that file is in cd.
+    hold = os.environ.get('FAKE_CD_HOLD')
+    for _ in range(1000):
+        if not hold or os.path.exists(os.path.join(src, hold)):
+            break
+        time.sleep(0.01)
+    else:
+        sys.exit(1)
+elif '[' in args[-2]:
+    # A segment, track[h:mm:ss.ff]-track[h:mm:ss.ff] with both ends inclusive.
+    import wave
+    def sector(position):
+        hms, ff = position.split('[')[1].rstrip(']').split('.')
+        h, m, s = map(int, hms.split(':'))
+        return ((h * 60 + m) * 60 + s) * 75 + int(ff)
+    first, last = map(sector, args[-2].split('-'))
+    with wave.open(wav(int(args[-2].split('[')[0]))) as w, wave.open(args[-1], 'wb') as out:
+        out.setparams(w.getparams())
+        w.setpos(first * 588)
+        out.writeframes(w.readframes((last + 1 - first) * 588))
+else:
+    shutil.copy(wav(int(args[-2])), args[-1])
+'''
+
+FAKE_FLAC = '''
+import json, os, shutil, sys, time
+args = sys.argv[1:]
+if os.environ.get('FAKE_FLAC_SLEEP'):
+    open(os.path.join(os.environ['FAKE_CD'], 'encoding'), 'w').close()
+    time.sleep(float(os.environ['FAKE_FLAC_SLEEP']))
+out = args[args.index('-o') + 1]
+with open(os.path.join(os.environ['FAKE_CD'], 'encodes.log'), 'a') as log:
+    log.write(os.path.basename(out) + '\\n')
+src = sys.stdin.buffer if args[-1] == '-' else open(args[-1], 'rb')
+with open(out, 'wb') as f:
+    shutil.copyfileobj(src, f)
+with open(out + '.tags', 'w') as f:
+    json.dump([a[6:] for a in args if a.startswith('--tag=')], f)
+'''
+
+FAKE_METAFLAC = '''
+import json, os, sys
+if os.path.basename(sys.argv[-1]) == os.environ.get('FAKE_METAFLAC_FAIL'):
+    sys.exit(1)
+removed = tuple(a[13:] + '=' for a in sys.argv[1:] if a.startswith('--remove-tag='))
+try:
+    with open(sys.argv[-1] + '.tags') as f:
+        tags = [t for t in json.load(f) if not t.startswith(removed)]
+except FileNotFoundError:
+    tags = []
+with open(sys.argv[-1] + '.tags', 'w') as f:
+    json.dump(tags + [a[10:] for a in sys.argv[1:] if a.startswith('--set-tag=')], f)
+'''
+
+
+class _Track:
+    def __init__(self, number, offset):
+        self.number = number
+        self.offset = offset
+        self.sectors = SECTORS
+
+
+class _Disc:
+    id = 'fake-disc-id'
+    freedb_id = '02000102'
+
+    def __init__(self, n_tracks):
+        self.tracks = [_Track(i + 1, 150 + i * SECTORS) for i in range(n_tracks)]
+        self.sectors = 150 + n_tracks * SECTORS
+
+
+class _FakeDriveTest(unittest.TestCase):
+    N_TRACKS = 3
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.cd = os.path.join(self.dir, 'cd')
+        os.mkdir(self.cd)
+        os.environ['FAKE_CD'] = self.cd
+        self.addCleanup(os.environ.pop, 'FAKE_CD')
+        self.bins = {name: self._script(name, body) for name, body in (
+            ('cdparanoia', FAKE_CDPARANOIA), ('flac', FAKE_FLAC), ('metaflac', FAKE_METAFLAC))}
+
+        rng = random.Random(14)
+        self.disc = _Disc(self.N_TRACKS)
+        self.crcs = {}
+        for t in self.disc.tracks:
+            path = os.path.join(self.cd, engine.wav_name(t.number))
+            with wave.open(path, 'wb') as w:
+                w.setnchannels(2)
+                w.setsampwidth(2)
+                w.setframerate(44100)
+                w.writeframes(rng.randbytes(SECTORS * 2352))
+            self.crcs[t.number] = accuraterip.compute_crcs(path, t.number - 1, self.N_TRACKS)
+        self.cache_dir = os.path.join(self.dir, 'cache')
+        v1, v2 = self.crcs[2]
+        self._prime([(5,) + self.crcs[1], (5, v1 ^ 1, v2 ^ 1), (5,) + self.crcs[3]])  # no match for track 2
+
+    def _prime(self, *pressings):
+        """Cache the disc's AccurateRip data: pressings of (confidence, crcv1, crcv2) per track."""
+        data = b''.join(struct.pack('<BIII', len(entries), 1, 2, 3)
+                        + b''.join(struct.pack('<BII', *entry) for entry in entries)
+                        for entries in pressings)
+        arcache.BinCache(self.cache_dir).put(accuraterip.disc_id_string(self.disc), data)
+
+    def _script(self, name, body):
+        path = os.path.join(self.dir, name)
+        with open(path, 'w') as f:
+            f.write(f'#!{sys.executable}\n' + textwrap.dedent(body))
+        os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+        return path
+
+    def _shift(self, offset, configured=0):
+        """Make the drive read offset samples early, so tracks only match shifted by offset.
+
+        The audio read with "-O configured + offset" goes to cd/corrected,
+        and the cache is primed with its checksums; reads with any other
+        offset are as early as without one.
+        """
+        os.environ['FAKE_CD_OFFSET'] = str(configured + offset)
+        self.addCleanup(os.environ.pop, 'FAKE_CD_OFFSET')
+        rng = random.Random(4)
+        n_samples = SECTORS * 588
+        disc = rng.randbytes((self.N_TRACKS * n_samples + offset) * 4)
+        os.mkdir(os.path.join(self.cd, 'corrected'))
+        entries = []
+        for t in self.disc.tracks:
+            start = (t.number - 1) * n_samples
+            for subdir, first in (('', start), ('corrected', start + offset)):
+                path = os.path.join(self.cd, subdir, engine.wav_name(t.number))
+                with wave.open(path, 'wb') as w:
+                    w.setnchannels(2)
+                    w.setsampwidth(2)
+                    w.setframerate(44100)
+                    w.writeframes(disc[first * 4:(first + n_samples) * 4])
+            entries.append((5,) + accuraterip.compute_crcs(path, t.number - 1, self.N_TRACKS))
+        self._prime(entries)
+
+    def _reads(self):
+        """What the fake drive was asked to read: 'batch', a track or a segment, in order.
+
+        Reads with an offset correction are suffixed with @ and the offset.
+        """
+        return self._log('reads.log')
+
+    def _encodes(self):
+        """The FLAC files the fake encoder was started on, in order."""
+        return self._log('encodes.log')
+
+    def _log(self, name):
+        try:
+            with open(os.path.join(self.cd, name)) as f:
+                return f.read().split()
+        except FileNotFoundError:
+            return []
+
+    def _options(self):
+        return dict(retries=0, offset_window=0, cache_dir=self.cache_dir, offline=True,
+                    cdparanoia_bin=self.bins['cdparanoia'], flac_bin=self.bins['flac'],
+                    metaflac_bin=self.bins['metaflac'])
+
+
+class PipelineTest(_FakeDriveTest):
+    def _run(self, **kwargs):
+        events = []
+        out = os.path.join(self.dir, 'out')
+        pipeline = engine.Pipeline(
+            '/dev/fake', out, progress=events.append, **{**self._options(), **kwargs})
+        results = pipeline.run(self.disc)
+        json.dumps(events)  # progress must be machine-readable
+        return out, results, events
+
+    def _check(self, out, results, events):
+        self.assertEqual(sorted(results), [1, 2, 3])
+        self.assertEqual([results[tn]['ar']['ok'] for tn in (1, 2, 3)], [True, False, True])
+        for tn in (1, 2, 3):
+            flac = os.path.join(out, f'{tn:02d}.flac')
+            self.assertEqual(results[tn]['flac'], flac)
+            with open(flac, 'rb') as f, wave.open(os.path.join(self.cd, engine.wav_name(tn))) as w:
+                self.assertTrue(w.readframes(w.getnframes()) in f.read())
+            with open(flac + '.tags') as f:
+                tags = json.load(f)
+            self.assertIn(f'TRACKNUMBER={tn}', tags)
+            self.assertIn('MUSICBRAINZ_DISCID=fake-disc-id', tags)
+            self.assertIn('ACCURATERIP_DISC_RESULT=Inaccurate (1 of 3 tracks)', tags)
+        self.assertEqual(events[-1]['event'], 'done')
+        self.assertFalse(events[-1]['disc']['ok'])
+        stages = {(e['stage'], e.get('track')) for e in events if e['event'] == 'stage'}
+        for tn in (1, 2, 3):
+            self.assertIn(('rip', tn), stages)
+            self.assertIn(('verify', tn), stages)
+        self.assertFalse(os.path.exists(os.path.join(out, engine.Pipeline.JOB_DIR)))
+        with open(os.path.join(out, engine.Pipeline.REPORT_NAME)) as f:
+            report = json.load(f)
+        self.assertEqual(events[-1]['report'], os.path.join(out, engine.Pipeline.REPORT_NAME))
+        self.assertEqual(report['info']['disc_id'], 'fake-disc-id')
+        for stage in ('rip', 'verify'):
+            self.assertEqual(report['stages'][stage]['count'], 3)
+        self.assertEqual(report['stages']['parse']['count'], 1)
+        self.assertIn('rip', report['tracks']['2'])
+
+    def test_batch_rip_verifies_and_encodes_every_track(self):
+        out, results, events = self._run()
+        self._check(out, results, events)
+        stages = {(e['stage'], e.get('track')) for e in events if e['event'] == 'stage'}
+        self.assertIn(('encode', 3), stages)
+        with open(os.path.join(out, engine.Pipeline.REPORT_NAME)) as f:
+            self.assertEqual(json.load(f)['stages']['crc']['count'], 3)
+
+    def test_flac_writes_track_tags_and_metaflac_only_the_disc_verdict(self):
+        out, results, events = self._run()
+        stages = [e['stage'] for e in events if e['event'] == 'stage']
+        self.assertNotIn('tag', stages)
+        self.assertEqual(stages.count('disc_tag'), 3)
+        for tn in (1, 2, 3):
+            with open(results[tn]['flac'] + '.tags') as f:
+                tags = json.load(f)
+            # The fake metaflac appends what it sets, after what flac wrote.
+            self.assertEqual(tags[-1], 'ACCURATERIP_DISC_RESULT=Inaccurate (1 of 3 tracks)')
+            self.assertIn('ACCURATERIP_RESULT=' + results[tn]['ar']['status'], tags[:-1])
+            self.assertIn(f'TRACKNUMBER={tn}', tags[:-1])
+
+    def test_streaming_rip_tags_streamed_flacs(self):
+        out, results, events = self._run(streaming=True)
+        self._check(out, results, events)
+        stages = {(e['stage'], e.get('track')) for e in events if e['event'] == 'stage'}
+        self.assertIn(('tag', 3), stages)
+        self.assertEqual(results[1]['ar']['status'], 'Accurate (confidence 5)')
+        logged = [e['message'] for e in events if e['event'] == 'log' and e['stage'] == 'rip']
+        self.assertEqual([line for line in logged if line.startswith('reading')],
+                         ['reading 1', 'reading 2', 'reading 3'])
+
+    def test_streamed_mismatch_does_not_search_for_the_offset(self):
+        v1, v2 = self.crcs[1]
+        self._prime([(5, v1 ^ 1, v2 ^ 1), (5,) + self.crcs[2], (5,) + self.crcs[3]])
+        out, results, events = self._run(streaming=True, offset_window=50)
+        self.assertEqual([results[tn]['ar']['ok'] for tn in (1, 2, 3)], [False, True, True])
+        messages = [e['message'] for e in events if e.get('stage') == 'accuraterip']
+        self.assertIn('Drive offset search skipped (tracks are streamed, not saved).', messages)
+        self.assertFalse([m for m in messages if 'offset search failed' in m], messages)
+        with open(os.path.join(out, engine.Pipeline.REPORT_NAME)) as f:
+            self.assertNotIn('offset_search', json.load(f)['stages'])
+
+    def test_lookup_runs_while_the_disc_is_ripped(self):
+        fetch = accuraterip.fetch
+
+        def fetch_during_rip(*args):
+            # The rip has started but cannot finish until the lookup is under way.
+            deadline = time.monotonic() + 10
+            while not self._reads():
+                self.assertLess(time.monotonic(), deadline, 'the rip waited for the lookup')
+                time.sleep(0.01)
+            open(os.path.join(self.cd, 'looked-up'), 'w').close()
+            return fetch(*args)
+
+        with mock.patch.object(accuraterip, 'fetch', side_effect=fetch_during_rip), \
+                mock.patch.dict(os.environ, {'FAKE_CD_HOLD': 'looked-up'}):
+            out, results, events = self._run()
+        self._check(out, results, events)
+        stages = [(e['stage'], e.get('track')) for e in events if e['event'] == 'stage']
+        self.assertLess(stages.index(('lookup', None)), stages.index(('disc', None)))
+
+    def test_interrupted_batch_rip_resumes_with_the_missing_tracks(self):
+        with mock.patch.dict(os.environ, {'FAKE_CD_FAIL_AT': '3'}), \
+                self.assertRaises(subprocess.CalledProcessError):
+            self._run()
+        self.assertEqual(self._reads(), ['batch'])
+        self.assertTrue(os.path.exists(os.path.join(
+            self.dir, 'out', engine.Pipeline.JOB_DIR, 'fake-disc-id', 'manifest.json')))
+
+        out, results, events = self._run()
+        self.assertEqual(self._reads(), ['batch', '2', '3'])
+        self.assertEqual([e['track'] for e in events if e.get('stage') == 'rip' and 'track' in e],
+                         [2, 3])
+        self.assertEqual([results[tn]['ar']['ok'] for tn in (1, 2, 3)], [True, False, True])
+        for tn in (1, 2, 3):
+            with open(results[tn]['flac'] + '.tags') as f:
+                self.assertIn(f'TRACKNUMBER={tn}', json.load(f))
+        self.assertFalse(os.path.exists(os.path.join(out, engine.Pipeline.JOB_DIR)))
+
+    def test_command_output_is_logged_and_ends_the_message_of_a_failure(self):
+        events = []
+        pipeline = engine.Pipeline('/dev/fake', os.path.join(self.dir, 'out'),
+                                   progress=events.append, **self._options())
+        with mock.patch.dict(os.environ, {'FAKE_CD_FAIL_AT': '3'}), \
+                self.assertRaises(engine.ProcessFailed) as failed:
+            pipeline.run(self.disc)
+        self.assertTrue(str(failed.exception).endswith('\nreading batch\nread error in track 3'))
+        self.assertEqual([e['message'] for e in events if e.get('stage') == 'rip' and 'message' in e],
+                         ['reading batch', 'read error in track 3'])
+
+    def test_interrupted_streaming_rip_resumes_without_reading_the_disc(self):
+        with mock.patch.dict(os.environ, {'FAKE_METAFLAC_FAIL': '03.flac'}), \
+                self.assertRaises(subprocess.CalledProcessError):
+            self._run(streaming=True)
+        self.assertEqual(self._reads(), ['1', '2', '3'])
+
+        out, results, events = self._run(streaming=True)
+        self.assertEqual(self._reads(), ['1', '2', '3'])
+        self.assertEqual([e['track'] for e in events if e.get('stage') == 'tag'], [3])
+        self.assertEqual(results[1]['ar']['status'], 'Accurate (confidence 5)')
+        self.assertEqual(results[3]['flac'], os.path.join(out, '03.flac'))
+        with open(results[3]['flac'] + '.tags') as f:
+            self.assertIn('TRACKNUMBER=3', json.load(f))
+
+    def test_without_outdir_flacs_are_left_in_the_detached_job(self):
+        jobs = os.path.join(self.dir, 'jobs')
+        events = []
+        pipeline = engine.Pipeline('/dev/fake', None, progress=events.append, job_dir=jobs,
+                                   names={1: '01 First.flac'}, **self._options())
+        results = pipeline.run(self.disc)
+        self.assertEqual(os.path.dirname(pipeline.directory), jobs)
+        self.assertEqual(os.listdir(jobs), [os.path.basename(pipeline.directory)])
+        self.assertEqual(sorted(os.listdir(pipeline.directory)), [
+            '01 First.flac', '01 First.flac.tags', '02.flac', '02.flac.tags', '03.flac', '03.flac.tags',
+            engine.Pipeline.REPORT_NAME])
+        self.assertEqual(results[1]['flac'], os.path.join(pipeline.directory, '01 First.flac'))
+        self.assertEqual(events[-1]['report'], os.path.join(pipeline.directory, engine.Pipeline.REPORT_NAME))
+        self.assertFalse(pipeline.disc_result['ok'])
+
+    def test_without_outdir_a_job_in_ram_dir_is_detached_onto_disk(self):
+        jobs, ram = os.path.join(self.dir, 'jobs'), os.path.join(self.dir, 'ram')
+        events = []
+        pipeline = engine.Pipeline('/dev/fake', None, progress=events.append, job_dir=jobs,
+                                   ram_dir=ram, **self._options())
+        results = pipeline.run(self.disc)
+        self.assertIn(f'into {ram}', [e for e in events if e.get('stage') == 'scratch'][0]['message'])
+        self.assertFalse(os.path.exists(ram))
+        self.assertEqual(os.path.dirname(pipeline.directory), jobs)
+        self.assertEqual(sorted(os.listdir(pipeline.directory)), [
+            '01.flac', '01.flac.tags', '02.flac', '02.flac.tags', '03.flac', '03.flac.tags',
+            engine.Pipeline.REPORT_NAME])
+        self.assertEqual(results[1]['flac'], os.path.join(pipeline.directory, '01.flac'))
+
+    def _cancel_at(self, marker, **kwargs):
+        """Start a rip and cancel it once marker is in cd; it must stop well before a 60s sleep ends."""
+        pipeline = engine.Pipeline('/dev/fake', os.path.join(self.dir, 'out'),
+                                   **{**self._options(), **kwargs})
+        outcome = concurrent.futures.Future()
+
+        def rip():
+            try:
+                outcome.set_result(pipeline.run(self.disc))
+            except BaseException as e:
+                outcome.set_exception(e)
+
+        threading.Thread(target=rip, daemon=True).start()
+        deadline = time.monotonic() + 10
+        while not os.path.exists(os.path.join(self.cd, marker)):
+            self.assertLess(time.monotonic(), deadline, f'{marker} was not written')
+            time.sleep(0.01)
+        pipeline.cancel()
+        with self.assertRaises(engine.Cancelled):
+            outcome.result(timeout=10)
+
+    def test_cancel_kills_the_encoder_and_frees_its_pool_slot(self):
+        pool = engine.EncodePool(1)
+        self.addCleanup(pool.shutdown)
+        with mock.patch.dict(os.environ, {'FAKE_FLAC_SLEEP': '60'}):
+            self._cancel_at('encoding', encode_pool=pool)
+        # The slot of the killed encoder is free for another rip's encodes.
+        self.assertEqual(pool.submit(lambda: 'ran').result(timeout=5), 'ran')
+        self.assertTrue(os.path.exists(os.path.join(
+            self.dir, 'out', engine.Pipeline.JOB_DIR, 'fake-disc-id', 'manifest.json')))
+
+    def test_cancel_kills_a_streamed_read_without_ripping_the_track_again(self):
+        with mock.patch.dict(os.environ, {'FAKE_CD_SLEEP': '60'}):
+            self._cancel_at('reading', streaming=True)
+        self.assertEqual(self._reads(), ['1'])
+
+    def test_cancel_kills_the_track_read_of_a_resumed_rip(self):
+        with mock.patch.dict(os.environ, {'FAKE_CD_FAIL_AT': '3'}), \
+                self.assertRaises(engine.ProcessFailed):
+            self._run()
+        with mock.patch.dict(os.environ, {'FAKE_CD_SLEEP': '60'}):
+            self._cancel_at('reading')
+        self.assertEqual(self._reads(), ['batch', '2'])
+
+    def test_cancel_kills_a_rerip(self):
+        with mock.patch.dict(os.environ, {'FAKE_CD_SLEEP': '60'}):
+            self._cancel_at('reading', retries=3, segmented=False)
+        self.assertEqual(self._reads(), ['batch', '2'])
+
+    def test_cancel_kills_a_segment_reread(self):
+        with mock.patch.dict(os.environ, {'FAKE_CD_SLEEP': '60'}):
+            self._cancel_at('reading', retries=3)
+        self.assertEqual(self._reads(), ['batch', '2[0:00:00.00]-2[0:00:00.11]'])
+
+    def test_cancel_stops_waiting_for_the_lookup(self):
+        looked_up = threading.Event()
+        self.addCleanup(looked_up.set)
+
+        def fetch(*args):
+            open(os.path.join(self.cd, 'looking-up'), 'w').close()
+            looked_up.wait()
+
+        with mock.patch.object(engine.accuraterip, 'fetch', fetch):
+            self._cancel_at('looking-up')
+
+    def test_stored_tracks_are_not_read_again(self):
+        store = os.path.join(self.dir, 'store')
+        self._run(store_dir=store)
+        self.assertEqual(self._reads(), ['batch'])
+        self.assertEqual(len([n for n in os.listdir(store) if n.endswith('.flac')]), 2)
+
+        shutil.rmtree(os.path.join(self.dir, 'out'))
+        out, results, events = self._run(store_dir=store)
+        self.assertEqual(self._reads(), ['batch', '2'])  # track 2 did not verify, so was not kept
+        self.assertEqual([results[tn]['ar']['ok'] for tn in (1, 2, 3)], [True, False, True])
+        self.assertEqual(results[1]['ar']['status'], 'Accurate (confidence 5)')
+        for tn in (1, 3):
+            with open(results[tn]['flac'], 'rb') as f, \
+                    wave.open(os.path.join(self.cd, engine.wav_name(tn))) as w:
+                self.assertTrue(w.readframes(w.getnframes()) in f.read())
+            with open(results[tn]['flac'] + '.tags') as f:
+                self.assertIn(f'TRACKNUMBER={tn}', json.load(f))
+        with open(os.path.join(out, engine.Pipeline.REPORT_NAME)) as f:
+            self.assertEqual(json.load(f)['stages']['reuse']['count'], 2)
+
+    def test_disc_verdict_names_the_pressing_every_track_matches(self):
+        self._prime([(5,) + self.crcs[tn] for tn in (1, 2, 3)],
+                     [(9,) + self.crcs[1], (9, 0, 0), (9,) + self.crcs[3]])
+        out, results, events = self._run(offset_window=50)
+        self.assertEqual([results[tn]['ar']['confidence'] for tn in (1, 2, 3)], [9, 5, 9])
+        disc = events[-1]['disc']
+        self.assertEqual((disc['ok'], disc['pressing'], disc['confidence']), (True, 1, 5))
+        self.assertEqual(disc['status'], 'Accurate (pressing 1 of 2, confidence 5)')
+        for tn in (1, 2, 3):
+            with open(results[tn]['flac'] + '.tags') as f:
+                tags = json.load(f)
+            self.assertIn('ACCURATERIP_DISC_RESULT=Accurate (pressing 1 of 2, confidence 5)', tags)
+            self.assertIn('ACCURATERIP_RESULT=' + results[tn]['ar']['status'], tags)
+        # Track 1 matched as ripped, so the drive offset was not searched for.
+        with open(os.path.join(out, engine.Pipeline.REPORT_NAME)) as f:
+            report = json.load(f)
+        self.assertNotIn('offset_search', report['stages'])
+        self.assertEqual(report['info']['accuraterip'], disc['status'])
+
+    def test_tracks_matching_at_the_drive_offset_are_reripped_with_it(self):
+        self._shift(12)
+        out, results, events = self._run(offset_window=50, retries=1)
+        self.assertEqual(self._reads(), ['batch', '1@12', '2@12', '3@12'])
+        for tn in (1, 2, 3):
+            self.assertEqual(results[tn]['ar']['status'], 'Accurate at offset +12 (confidence 5)')
+            with open(results[tn]['flac'], 'rb') as f, \
+                    wave.open(os.path.join(self.cd, 'corrected', engine.wav_name(tn))) as w:
+                self.assertTrue(w.readframes(w.getnframes()) in f.read())
+        disc = events[-1]['disc']
+        self.assertEqual((disc['ok'], disc['offset']), (True, 12))
+        self.assertEqual(disc['status'], 'Accurate (pressing 1 of 1, confidence 5) at offset +12')
+
+    def test_rereads_use_the_drive_options_of_the_rip(self):
+        self._shift(12)
+        crcs = [accuraterip.compute_crcs(os.path.join(self.cd, 'corrected', engine.wav_name(tn)),
+                                         tn - 1, self.N_TRACKS) for tn in (1, 2, 3)]
+        self._prime([(5,) + crcs[0], (5, 0, 0), (5,) + crcs[2]])  # no match for track 2
+        # The segment read the same twice is settled, so segments are only re-read once.
+        for segmented, reads in ((False, ['batch@12', '2@12', '2@12']),
+                                 (True, ['batch@12', '2[0:00:00.00]-2[0:00:00.11]@12'])):
+            with self.subTest(segmented=segmented):
+                out, results, events = self._run(
+                    cdparanoia_opts='-O 12 --batch 1:-', retries=2, segmented=segmented)
+                read = self._reads()
+                os.unlink(os.path.join(self.cd, 'reads.log'))
+                self.assertEqual(read, reads)
+                self.assertEqual([results[tn]['ar']['ok'] for tn in (1, 2, 3)], [True, False, True])
+
+    def test_offset_correction_is_added_to_the_configured_offset(self):
+        self._shift(12, configured=5)
+        out, results, events = self._run(
+            cdparanoia_opts='-O 5 --batch 1:-', offset_window=50, retries=1)
+        self.assertEqual(self._reads(), ['batch@5', '1@17', '2@17', '3@17'])
+        self.assertEqual({results[tn]['ar']['status'] for tn in (1, 2, 3)},
+                         {'Accurate at offset +12 (confidence 5)'})
+        self.assertTrue(any('"-O 17"' in e.get('message', '') for e in events))
+
+    def test_tracks_matching_at_the_drive_offset_fail_without_retries(self):
+        self._shift(12)
+        out, results, events = self._run(offset_window=50)
+        self.assertEqual(self._reads(), ['batch'])
+        self.assertEqual({results[tn]['ar']['status'] for tn in (1, 2, 3)},
+                         {'Needs offset correction (+12)'})
+        self.assertFalse(any(results[tn]['ar']['ok'] for tn in (1, 2, 3)))
+        self.assertEqual(events[-1]['disc']['status'], 'Needs offset correction (3 of 3 tracks)')
+
+    def test_no_pressing_with_the_track_count_skips_checksums(self):
+        self._prime([(5,) + self.crcs[1], (5,) + self.crcs[2]])
+        out, results, events = self._run()
+        self.assertEqual({results[tn]['ar']['status'] for tn in (1, 2, 3)}, {'Not in database'})
+        self.assertEqual(events[-1]['disc']['status'], 'Not in database')
+        with open(os.path.join(out, engine.Pipeline.REPORT_NAME)) as f:
+            self.assertNotIn('crc', json.load(f)['stages'])
+
+    def test_offline_disc_not_cached_is_not_verified(self):
+        shutil.rmtree(self.cache_dir)
+        out, results, events = self._run()
+        status = 'Not verified (offline, not cached)'
+        self.assertEqual({results[tn]['ar']['status'] for tn in (1, 2, 3)}, {status})
+        self.assertFalse(any(results[tn]['ar']['ok'] for tn in (1, 2, 3)))
+        self.assertEqual(events[-1]['disc']['status'], status)
+        self.assertFalse(events[-1]['disc']['ok'])
+
+    def test_disc_that_fits_is_ripped_in_ram_dir(self):
+        ram = os.path.join(self.dir, 'ram')
+        out, results, events = self._run(ram_dir=ram)
+        self._check(out, results, events)
+        self.assertIn(f'into {ram}', [e for e in events if e.get('stage') == 'scratch'][0]['message'])
+        self.assertFalse(os.path.exists(ram))
+
+    def test_disc_without_room_is_refused_before_reading(self):
+        with mock.patch.object(engine.scratch, 'free_bytes', return_value=0), \
+                self.assertRaises(engine.scratch.NoSpace):
+            self._run(ram_dir=os.path.join(self.dir, 'ram'))
+        self.assertEqual(self._reads(), [])
+
+
+class PipeliningTest(_FakeDriveTest):
+    # A track is verified once the drive has moved past the next one, so
+    # four tracks leave one still being read while the first is encoded.
+    N_TRACKS = 4
+
+    def setUp(self):
+        super().setUp()
+        self._prime([(5,) + self.crcs[tn] for tn in (1, 2, 3, 4)])
+
+    def _run(self, **kwargs):
+        events = []
+        results = engine.Pipeline('/dev/fake', os.path.join(self.dir, 'out'), progress=events.append,
+                                  **{**self._options(), **kwargs}).run(self.disc)
+        stages = [(e['stage'], e.get('track')) for e in events if e['event'] == 'stage']
+        return results, stages
+
+    def test_pipelined_tracks_are_encoded_while_the_disc_is_ripped(self):
+        # The rip cannot finish until an encode has started.
+        with mock.patch.dict(os.environ, {'FAKE_CD_HOLD': 'encodes.log'}):
+            results, stages = self._run()
+        self.assertEqual({results[tn]['ar']['status'] for tn in (1, 2, 3, 4)},
+                         {'Accurate (confidence 5)'})
+        self.assertEqual(self._encodes()[0], '01.flac')
+        self.assertLess(stages.index(('encode', 1)), stages.index(('disc', None)))
+
+    def test_tracks_are_checksummed_in_parallel(self):
+        compute_crcs = accuraterip.compute_crcs
+        both = threading.Barrier(2, timeout=5)
+
+        def meet(path, track_idx, n_tracks):
+            # Tracks 2 and 3 only get their checksums if they are computed at once.
+            if track_idx in (1, 2):
+                both.wait()
+            return compute_crcs(path, track_idx, n_tracks)
+
+        with concurrent.futures.ThreadPoolExecutor(2) as pool, \
+                mock.patch.object(accuraterip, 'compute_crcs', side_effect=meet):
+            results, stages = self._run(verify_pool=pool)
+        self.assertFalse(both.broken)
+        self.assertEqual([results[tn]['ar']['status'] for tn in (1, 2, 3, 4)],
+                         ['Accurate (confidence 5)'] * 4)
+
+    def test_unpipelined_tracks_are_encoded_after_the_rip_longest_first(self):
+        for tn, factor in ((2, 2), (4, 3)):
+            path = os.path.join(self.cd, engine.wav_name(tn))
+            with wave.open(path) as w:
+                frames = w.readframes(w.getnframes())
+            with wave.open(path, 'wb') as w:
+                w.setnchannels(2)
+                w.setsampwidth(2)
+                w.setframerate(44100)
+                w.writeframes(frames * factor)
+        results, stages = self._run(pipelined=False, jobs=1)
+        self.assertEqual(self._encodes(), ['04.flac', '02.flac', '01.flac', '03.flac'])
+        disc = stages.index(('disc', None))
+        verifies = [i for i, (stage, _) in enumerate(stages) if stage == 'verify']
+        encodes = [i for i, (stage, _) in enumerate(stages) if stage == 'encode']
+        self.assertEqual((len(verifies), len(encodes)), (4, 4))
+        self.assertLess(disc, min(verifies))
+        self.assertLess(max(verifies), min(encodes))
+
+
+class FarmTest(_FakeDriveTest):
+    def test_drives_rip_concurrently_with_aggregated_progress(self):
+        events = []
+        out = os.path.join(self.dir, 'out')
+        discid = types.SimpleNamespace(read=lambda device: self.disc)
+        with mock.patch.dict(sys.modules, {'discid': discid}):
+            results = engine.Farm(['/dev/sr0', '/dev/sr1'], out, jobs=2,
+                                  progress=events.append, **self._options()).run()
+
+        self.assertEqual(sorted(results), ['/dev/sr0', '/dev/sr1'])
+        for device in ('sr0', 'sr1'):
+            self.assertTrue(os.path.exists(os.path.join(out, device, '03.flac')))
+        self.assertEqual({e['device'] for e in events if e['event'] == 'done'},
+                         {'/dev/sr0', '/dev/sr1'})
+        farm = [e for e in events if e['event'] == 'farm'][-1]
+        self.assertEqual((farm['ripped'], farm['verified'], farm['encoded']), (6, 6, 6))
+        self.assertEqual({d['state'] for d in farm['drives'].values()}, {'done'})
+        self.assertGreater(farm['speed'], 0)
+
+
+class EncodePoolTest(unittest.TestCase):
+    def test_jobs_of_every_submitter_start_heaviest_first(self):
+        pool = engine.EncodePool(1)
+        self.addCleanup(pool.shutdown)
+        release = threading.Event()
+        blocker = pool.submit(release.wait)
+        started = []
+
+        def submit(name, weights):
+            return [pool.submit_weighted(weight, started.append, f'{name}{weight}') for weight in weights]
+
+        # Two pipelines' encodes queue up behind the busy worker.
+        futures = submit('a', [10, 30]) + submit('b', [20, 30, 5]) + [pool.submit(started.append, 'b-tag')]
+        release.set()
+        concurrent.futures.wait([blocker] + futures, timeout=5)
+        self.assertEqual(started, ['a30', 'b30', 'b20', 'a10', 'b5', 'b-tag'])
+
+    def test_no_more_than_limit_jobs_run_at_once(self):
+        pool = engine.EncodePool(2)
+        self.addCleanup(pool.shutdown)
+        lock = threading.Lock()
+        running = []
+        peak = []
+
+        def job():
+            with lock:
+                running.append(1)
+                peak.append(len(running))
+            time.sleep(0.02)
+            with lock:
+                running.pop()
+
+        futures = [pool.submit_weighted(n, job) for n in range(8)]
+        concurrent.futures.wait(futures, timeout=5)
+        self.assertTrue(all(f.done() and f.exception() is None for f in futures))
+        self.assertEqual(max(peak), 2)
+        self.assertLessEqual(len(pool._threads), 2)
+
+    def test_cancelled_jobs_do_not_run(self):
+        pool = engine.EncodePool(1)
+        self.addCleanup(pool.shutdown)
+        release = threading.Event()
+        blocker = pool.submit(release.wait)
+        ran = []
+        future = pool.submit(ran.append, 1)
+        self.assertTrue(future.cancel())
+        release.set()
+        blocker.result(timeout=5)
+        self.assertEqual(pool.submit(lambda: 'ran').result(timeout=5), 'ran')
+        self.assertEqual(ran, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
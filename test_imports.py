@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""Import-time budget of what Picard loads at startup (cdripper/register.py).
+
+Run with:  python3 -m unittest test_imports
+
+register.py itself needs Picard, so this checks the cdripper modules it
+imports: they must not pull in the checksum backends, the engine or the
+network stack, and must load within IMPORT_BUDGET_MS in a fresh
+interpreter (as reported by ``python -X importtime``).
+"""
+
+import ast
+import os
+import subprocess
+import sys
+import unittest
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+_PACKAGE = os.path.join(_HERE, 'cdripper')
+
+IMPORT_BUDGET_MS = 100  # NumPy alone takes longer than this
+HEAVY = ('numpy', 'accuraterip_checksum', 'discid', 'http.client', 'engine', 'plugin',
+         'ui', 'ui_options_cdripper')
+
+
+def _load_time_modules():
+    """The cdripper modules register.py imports."""
+    with open(os.path.join(_PACKAGE, 'register.py'), encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+    return [alias.name for node in tree.body if isinstance(node, ast.ImportFrom)
+            and node.module == 'picard.plugins.cdripper' for alias in node.names]
+
+
+class ImportBudgetTest(unittest.TestCase):
+    def _import(self, modules):
+        """Import modules in a fresh interpreter; return (loaded modules, cumulative µs of each)."""
+        code = (f'import sys; sys.path.insert(0, {_PACKAGE!r}); '
+                f'import {", ".join(modules)}; print(" ".join(sys.modules))')
+        env = dict(os.environ)
+        env.pop('PYTHONDONTWRITEBYTECODE', None)  # time the imports, not compiling them
+        subprocess.run([sys.executable, '-c', code], env=env, check=True, capture_output=True)
+        done = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                              env=env, check=True, capture_output=True, text=True)
+        times = {}
+        for line in done.stderr.splitlines():
+            if line.startswith('import time:') and not line.endswith('package'):
+                _, cumulative, name = line.split('|')
+                times[name.strip()] = int(cumulative)
+        return set(done.stdout.split()), times
+
+    def test_startup_imports_are_light(self):
+        modules = _load_time_modules()
+        self.assertIn('accuraterip', modules)
+        loaded, times = self._import(modules)
+        self.assertEqual([name for name in HEAVY if name in loaded], [])
+        total_ms = sum(times[name] for name in modules) / 1000
+        self.assertLess(total_ms, IMPORT_BUDGET_MS, times)
+
+    def test_checksum_backends_load_on_first_use(self):
+        code = (f'import sys; sys.path.insert(0, {_PACKAGE!r}); import accuraterip; '
+                'assert "numpy" not in sys.modules; '
+                'print(accuraterip.crc_backend(), accuraterip._HAS_NUMPY == ("numpy" in sys.modules))')
+        done = subprocess.run([sys.executable, '-c', code], check=True, capture_output=True, text=True)
+        backend, consistent = done.stdout.split()
+        self.assertIn(backend, ('native', 'numpy', 'pure'))
+        self.assertEqual(consistent, 'True')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for cdripper/logsink.py.
+
+Run with:  python3 -m unittest test_logsink
+
+The module is imported directly by path so that importing the ``cdripper``
+package (which pulls in ``discid`` and ``picard``) is not required. It needs
+PyQt5 (without a display: the offscreen platform is used); the tests are
+skipped if it is not installed.
+"""
+
+import importlib.util
+import os
+import unittest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+try:
+    from PyQt5 import QtCore, QtWidgets
+except ImportError:
+    QtWidgets = None
+else:
+    _HERE = os.path.dirname(os.path.abspath(__file__))
+    _spec = importlib.util.spec_from_file_location(
+        'logsink', os.path.join(_HERE, 'cdripper', 'logsink.py')
+    )
+    logsink = importlib.util.module_from_spec(_spec)
+    _spec.loader.exec_module(logsink)
+
+
+@unittest.skipIf(QtWidgets is None, 'PyQt5 is not installed')
+class LogSinkTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+    def setUp(self):
+        self.widget = QtWidgets.QPlainTextEdit()
+        self.addCleanup(self.widget.deleteLater)
+        self.appended = []
+        append = self.widget.appendPlainText
+        self.widget.appendPlainText = lambda text: (self.appended.append(text), append(text))
+        self.sink = logsink.LogSink(self.widget)
+
+    def _wait(self, ms):
+        loop = QtCore.QEventLoop()
+        QtCore.QTimer.singleShot(ms, loop.quit)
+        loop.exec_()
+
+    def test_lines_are_appended_together_on_the_timer(self):
+        for line in ('one', 'two', 'three'):
+            self.sink.appendPlainText(line)
+        self.assertEqual(self.widget.toPlainText(), '')
+        self._wait(3 * logsink.LogSink.INTERVAL)
+        self.assertEqual(self.appended, ['one\ntwo\nthree'])
+        self.assertEqual(self.widget.toPlainText(), 'one\ntwo\nthree')
+
+    def test_widget_keeps_only_the_last_max_blocks_lines(self):
+        n = logsink.LogSink.MAX_BLOCKS
+        for i in range(n + 500):
+            self.sink.appendPlainText(str(i))
+        self.sink.flush()
+        self.assertEqual(self.widget.toPlainText().split('\n'), [str(i) for i in range(500, n + 500)])
+        # Older lines go as later batches are appended.
+        self.sink.appendPlainText('more')
+        self.sink.flush()
+        self.assertEqual(self.widget.blockCount(), n)
+        self.assertEqual(self.widget.toPlainText().split('\n')[-2:], [str(n + 499), 'more'])
+
+
+if __name__ == '__main__':
+    unittest.main()
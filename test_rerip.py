@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for cdripper/rerip.py.
+
+Run with:  python3 -m unittest test_rerip
+
+The module is imported directly by path so that importing the ``cdripper``
+package (which pulls in ``discid`` and ``picard``) is not required.
+"""
+
+import importlib.util
+import os
+import shutil
+import tempfile
+import unittest
+import wave
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+_spec = importlib.util.spec_from_file_location(
+    'rerip', os.path.join(_HERE, 'cdripper', 'rerip.py')
+)
+rerip = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(rerip)
+
+SECTOR = rerip.SECTOR_BYTES
+
+
+def _sectors(*fills):
+    """PCM made of whole sectors, each filled with one byte value."""
+    return b''.join(bytes([fill]) * SECTOR for fill in fills)
+
+
+class SpanTest(unittest.TestCase):
+    def test_span_is_inclusive_and_uses_sector_frames(self):
+        # 75 sectors per second: sector 4574 is 1:00 + 74 frames.
+        self.assertEqual(rerip.span(3, 0, 4575), '3[0:00:00.00]-3[0:01:00.74]')
+
+    def test_span_hours(self):
+        self.assertEqual(rerip.span(1, 75 * 3600, 1), '1[1:00:00.00]-1[1:00:00.00]')
+
+
+class SegmentedTrackTest(unittest.TestCase):
+    GOOD = _sectors(1, 2, 3, 4, 5)  # 5 sectors, segments of 2 -> [2, 2, 1]
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+
+    def _wav(self, name, pcm):
+        path = os.path.join(self.dir, name)
+        with wave.open(path, 'wb') as w:
+            w.setnchannels(2)
+            w.setsampwidth(2)
+            w.setframerate(44100)
+            w.writeframes(pcm)
+        return path
+
+    def _read_pcm(self, path):
+        with wave.open(path, 'rb') as w:
+            return w.readframes(w.getnframes())
+
+    def test_segment_layout(self):
+        track = rerip.SegmentedTrack(os.path.join(self.dir, 'w'), 5, segment_sectors=2)
+        self.assertEqual(track.count, 3)
+        self.assertEqual(track.sectors(2), (4, 1))
+
+    def test_only_disagreeing_segments_stay_unsettled(self):
+        first = self._wav('first.wav', _sectors(1, 2, 9, 4, 5))
+        track = rerip.SegmentedTrack.from_wav(os.path.join(self.dir, 'w'), first, 2)
+        self.assertEqual(track.unsettled(), [0, 1, 2])
+
+        track.add_wav(self._wav('second.wav', _sectors(1, 2, 8, 4, 5)))
+        self.assertEqual(track.unsettled(), [1])
+
+        track.add_wav(self._wav('seg.wav', _sectors(3, 4)), index=1)
+        track.add_wav(self._wav('seg.wav', _sectors(3, 4)), index=1)
+        self.assertEqual(track.unsettled(), [])
+
+        out = os.path.join(self.dir, 'out.wav')
+        track.write_wav(out)
+        self.assertEqual(self._read_pcm(out), self.GOOD)
+
+    def test_consensus_prefers_majority_then_latest(self):
+        track = rerip.SegmentedTrack(os.path.join(self.dir, 'w'), 1, segment_sectors=1)
+        track.add_read(0, _sectors(7))
+        track.add_read(0, _sectors(6))
+        out = os.path.join(self.dir, 'out.wav')
+        track.write_wav(out)
+        self.assertEqual(self._read_pcm(out), _sectors(6))
+        track.add_read(0, _sectors(7))
+        track.write_wav(out)
+        self.assertEqual(self._read_pcm(out), _sectors(7))
+
+    def test_partial_segment_read_rejected(self):
+        track = rerip.SegmentedTrack(os.path.join(self.dir, 'w'), 5, segment_sectors=2)
+        with self.assertRaises(ValueError):
+            track.add_wav(self._wav('short.wav', _sectors(1, 2, 3)))
+
+
+if __name__ == '__main__':
+    unittest.main()
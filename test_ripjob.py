@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for cdripper/ripjob.py.
+
+Run with:  python3 -m unittest test_ripjob
+
+The module is imported directly by path so that importing the ``cdripper``
+package (which pulls in ``discid`` and ``picard``) is not required.
+"""
+
+import importlib.util
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+_spec = importlib.util.spec_from_file_location(
+    'ripjob', os.path.join(_HERE, 'cdripper', 'ripjob.py')
+)
+ripjob = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(ripjob)
+
+
+class RipJobTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+
+    def _file(self, job, name, data=b'audio'):
+        path = job.path(name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_steps_survive_reopening(self):
+        job = ripjob.RipJob(self.root, 'disc')
+        self.assertFalse(job.resumed)
+        wav = self._file(job, 'track01.cdda.wav')
+        job.record(1, ripped=job.file(wav), verified={'ok': True, 'status': 'Accurate'})
+        job.record(2, crcs=[1, 2])
+        job.close()
+
+        job = ripjob.RipJob(self.root, 'disc')
+        self.addCleanup(job.close)
+        self.assertTrue(job.resumed)
+        self.assertEqual(job.directory, os.path.join(self.root, 'disc'))
+        self.assertTrue(job.done(1, 'ripped'))
+        self.assertEqual(job.get(1, 'ripped'), wav)
+        self.assertEqual(job.get(1, 'verified')['status'], 'Accurate')
+        self.assertEqual(job.get(2, 'crcs'), [1, 2])
+        self.assertFalse(job.done(1, 'encoded'))
+        self.assertFalse(job.done(3, 'ripped'))
+
+    def test_file_step_needs_the_file_at_its_recorded_size(self):
+        job = ripjob.RipJob(self.root, 'disc')
+        self.addCleanup(job.close)
+        wav = self._file(job, 'track01.cdda.wav')
+        job.record(1, ripped=job.file(wav))
+        self._file(job, 'track01.cdda.wav', b'cut')
+        self.assertFalse(job.done(1, 'ripped'))
+        os.unlink(wav)
+        self.assertFalse(job.done(1, 'ripped'))
+
+    def test_forget(self):
+        job = ripjob.RipJob(self.root, 'disc')
+        self.addCleanup(job.close)
+        job.record(1, crcs=[1, 2], tagged=True)
+        job.forget(1, 'tagged')
+        self.assertEqual((job.done(1, 'crcs'), job.done(1, 'tagged')), (True, False))
+        job.forget(1)
+        self.assertFalse(job.done(1, 'crcs'))
+
+    def test_open_job_gets_a_directory_of_its_own(self):
+        first = ripjob.RipJob(self.root, 'disc')
+        self.addCleanup(first.close)
+        second = ripjob.RipJob(self.root, 'disc')
+        self.addCleanup(second.close)
+        self.assertEqual(second.directory, os.path.join(self.root, 'disc-2'))
+
+    def test_corrupt_manifest_starts_afresh(self):
+        os.makedirs(os.path.join(self.root, 'disc'))
+        with open(os.path.join(self.root, 'disc', ripjob.MANIFEST), 'w') as f:
+            f.write('{"disc_id": "disc", "tra')
+        job = ripjob.RipJob(self.root, 'disc')
+        self.addCleanup(job.close)
+        self.assertFalse(job.resumed)
+
+    def test_detach_keeps_the_files_and_ends_the_job(self):
+        job = ripjob.RipJob(self.root, 'disc')
+        self._file(job, '01.flac')
+        job.record(1, tagged=True)
+        directory = job.detach()
+        self.assertEqual(os.listdir(directory), ['01.flac'])
+        self.assertFalse(os.path.exists(os.path.join(self.root, 'disc')))
+
+        job = ripjob.RipJob(self.root, 'disc')
+        self.addCleanup(job.close)
+        self.assertFalse(job.resumed)
+
+    def test_detach_to_another_root_moves_the_files(self):
+        job = ripjob.RipJob(self.root, 'disc')
+        self._file(job, '01.flac')
+        disk = os.path.join(self.root, 'disk')
+        directory = job.detach(disk)
+        self.assertEqual(os.path.dirname(directory), disk)
+        self.assertEqual(os.listdir(directory), ['01.flac'])
+        self.assertEqual(sorted(os.listdir(self.root)), ['disk'])
+
+    def test_prune(self):
+        old = ripjob.RipJob(self.root, 'old')
+        old.record(1, tagged=True)
+        old.close()
+        then = time.time() - ripjob.MAX_AGE - 1
+        os.utime(old.path(ripjob.MANIFEST), (then, then))
+        fresh = ripjob.RipJob(self.root, 'fresh')
+        fresh.record(1, tagged=True)
+        fresh.close()
+        busy = ripjob.RipJob(self.root, 'busy')
+        self.addCleanup(busy.close)
+        busy.record(1, tagged=True)
+        os.utime(busy.path(ripjob.MANIFEST), (then, then))
+        empty = ripjob.RipJob(self.root, 'empty').detach()
+        kept = ripjob.RipJob(self.root, 'kept')
+        self._file(kept, '01.flac')
+        kept = kept.detach()
+
+        ripjob.prune(self.root)
+        self.assertEqual(sorted(os.listdir(self.root)),
+                         sorted(['fresh', 'busy', os.path.basename(kept)]))
+        self.assertFalse(os.path.exists(empty))
+
+
+if __name__ == '__main__':
+    unittest.main()
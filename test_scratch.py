@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for cdripper/scratch.py.
+
+Run with:  python3 -m unittest test_scratch
+
+The module is imported directly by path so that importing the ``cdripper``
+package (which pulls in ``discid`` and ``picard``) is not required.
+"""
+
+import importlib.util
+import os
+import shutil
+import tempfile
+import threading
+import types
+import unittest
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+_spec = importlib.util.spec_from_file_location(
+    'scratch', os.path.join(_HERE, 'cdripper', 'scratch.py')
+)
+scratch = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(scratch)
+
+MiB = 2**20
+
+
+class ScratchTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        # Two directories standing in for separate filesystems.
+        self.disk = os.path.join(self.dir, 'disk')
+        self.ram = os.path.join(self.dir, 'ram')
+        os.makedirs(self.disk)
+        os.makedirs(self.ram)
+        self.free = {self.disk: 1000 * MiB, self.ram: 500 * MiB}
+        self.memory = 8000 * MiB
+        self._patch('free_bytes', lambda path: self.free[path])
+        self._patch('available_memory', lambda: self.memory)
+        self._patch('_device', lambda path: path)
+        self.space = scratch.Scratch(self.disk, self.ram, headroom=100 * MiB)
+
+    def _patch(self, name, value):
+        original = getattr(scratch, name)
+        setattr(scratch, name, value)
+        self.addCleanup(setattr, scratch, name, original)
+
+    def _reserve(self, disc_id, need, timeout=0):
+        reservation = self.space.reserve(disc_id, need, timeout)
+        self.addCleanup(reservation.release)
+        return reservation
+
+    def test_disc_bytes_from_toc(self):
+        self.assertEqual(scratch.disc_bytes(types.SimpleNamespace(sectors=75)), 75 * 2352)
+
+    def test_disc_that_fits_goes_in_ram(self):
+        self.assertEqual(self._reserve('a', 300 * MiB).root, self.ram)
+
+    def test_ram_headroom_and_available_memory_are_respected(self):
+        self.assertEqual(self._reserve('a', 450 * MiB).root, self.disk)
+        self.memory = 200 * MiB
+        self.assertEqual(self._reserve('b', 150 * MiB).root, self.disk)
+
+    def test_reservations_of_other_rips_count_as_used(self):
+        self.assertEqual(self._reserve('a', 300 * MiB).root, self.ram)
+        self.assertEqual(self._reserve('b', 300 * MiB).root, self.disk)
+        with self.assertRaises(scratch.NoSpace) as caught:
+            self._reserve('c', 800 * MiB)
+        self.assertTrue(caught.exception.waiting_helps)
+
+    def test_written_data_is_not_counted_twice(self):
+        first = self._reserve('a', 300 * MiB)
+        first.directory = os.path.join(self.ram, 'a')
+        os.makedirs(first.directory)
+        with open(os.path.join(first.directory, 'track01.cdda.wav'), 'wb') as f:
+            f.truncate(100 * MiB)
+        self.assertEqual(first.pending(), 200 * MiB)
+
+    def test_disc_too_big_for_either_is_refused(self):
+        with self.assertRaises(scratch.NoSpace) as caught:
+            self._reserve('a', 2000 * MiB)
+        self.assertFalse(caught.exception.waiting_helps)
+        self.assertEqual(caught.exception.errno, scratch.errno.ENOSPC)
+
+    def test_queued_rip_starts_when_space_is_released(self):
+        first = self._reserve('a', 900 * MiB)
+        self.space.ram_root = None
+        got = []
+        waiter = threading.Thread(target=lambda: got.append(self._reserve('b', 900 * MiB, None)))
+        waiter.start()
+        waiter.join(0.2)
+        self.assertTrue(waiter.is_alive())
+        first.release()
+        waiter.join(5)
+        self.assertEqual([r.root for r in got], [self.disk])
+
+    def test_interrupted_job_is_resumed_where_it_is(self):
+        os.makedirs(os.path.join(self.disk, 'a'))
+        with open(os.path.join(self.disk, 'a', 'track01.cdda.wav'), 'wb') as f:
+            f.truncate(600 * MiB)
+        self.free[self.disk] = 500 * MiB
+        self.assertEqual(self._reserve('a', 1000 * MiB).root, self.disk)
+
+    def test_without_ram_root_everything_goes_to_disk(self):
+        self.space.ram_root = None
+        self.assertEqual(self._reserve('a', 10 * MiB).root, self.disk)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for cdripper/stats.py.
+
+Run with:  python3 -m unittest test_stats
+
+The module is imported directly by path so that importing the ``cdripper``
+package (which pulls in ``discid`` and ``picard``) is not required.
+"""
+
+import importlib.util
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+_spec = importlib.util.spec_from_file_location(
+    'stats', os.path.join(_HERE, 'cdripper', 'stats.py')
+)
+stats = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(stats)
+
+
+class RipStatsTest(unittest.TestCase):
+    def test_report_totals_stages_tracks_and_counters(self):
+        rip_stats = stats.RipStats()
+        rip_stats.info['crc_backend'] = 'numpy'
+        rip_stats.add('rip', 1, 2.0, nbytes=4_000_000)
+        rip_stats.add('rip', 2, 1.0, nbytes=1_000_000)
+        rip_stats.add('encode', 1, 0.5, cpu=0.25, queued=1.5)
+        rip_stats.count('retries', 2)
+        rip_stats.count('retries', 2)
+
+        report = rip_stats.report()
+        self.assertEqual(report['info'], {'crc_backend': 'numpy'})
+        self.assertEqual(report['stages']['rip'],
+                         {'count': 2, 'wall': 3.0, 'bytes': 5_000_000, 'mb_per_s': 1.67})
+        self.assertEqual(report['tracks']['1']['rip']['mb_per_s'], 2.0)
+        self.assertEqual(report['tracks']['1']['encode'],
+                         {'count': 1, 'wall': 0.5, 'cpu': 0.25, 'queued': 1.5})
+        self.assertEqual(report['tracks']['2']['retries'], 2)
+        self.assertEqual(report['counters'], {'retries': 2})
+        json.dumps(report)
+
+        summary = rip_stats.summary()
+        self.assertTrue(summary[0].startswith('rip: 2× 3.0s wall, 5.0 MB at 1.7 MB/s'))
+        self.assertIn('retries: 2', summary)
+
+    def test_measure_records_block_even_if_it_raises(self):
+        rip_stats = stats.RipStats()
+        with rip_stats.measure('crc', 3, queued=0.5) as measured:
+            measured['bytes'] = 100
+        with self.assertRaises(ValueError), rip_stats.measure('crc', 4):
+            raise ValueError
+        crc = rip_stats.report()['stages']['crc']
+        self.assertEqual((crc['count'], crc['bytes'], crc['queued']), (2, 100, 0.5))
+        self.assertGreaterEqual(crc['cpu'], 0)
+
+    def test_run_process_reports_status_and_child_cpu(self):
+        status, cpu = stats.run_process(
+            [sys.executable, '-c', 'sum(range(200000)); raise SystemExit(3)'])
+        self.assertEqual(status, 3)
+        self.assertGreater(cpu, 0)
+
+    def test_run_process_hands_over_the_running_process(self):
+        status, cpu = stats.run_process([sys.executable, '-c', 'import time; time.sleep(60)'],
+                                        started=lambda process: process.kill())
+        self.assertEqual(status, -9)
+
+    def test_run_process_passes_on_error_output(self):
+        chunks = []
+        status, _ = stats.run_process(
+            [sys.executable, '-c', 'import sys; print("to stdout"); sys.exit("read error")'],
+            stderr=chunks.append)
+        self.assertEqual(status, 1)
+        self.assertEqual(b''.join(chunks).strip(), b'read error')
+
+    def test_write(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        rip_stats = stats.RipStats()
+        rip_stats.add('tag', 1, 0.1)
+        path = os.path.join(tmpdir, 'report.json')
+        rip_stats.write(path)
+        with open(path) as f:
+            self.assertEqual(json.load(f)['stages']['tag']['count'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for cdripper/stream.py.
+
+Run with:  python3 -m unittest test_stream
+
+The module is imported directly by path so that importing the ``cdripper``
+package (which pulls in ``discid`` and ``picard``) is not required.
+"""
+
+import importlib.util
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+_spec = importlib.util.spec_from_file_location(
+    'stream', os.path.join(_HERE, 'cdripper', 'stream.py')
+)
+stream = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(stream)
+
+PAYLOAD_SIZE = 3 * stream.CHUNK_BYTES + 17
+SOURCE = [sys.executable, '-c',
+          f'import sys; sys.stdout.buffer.write(bytes(i % 251 for i in range({PAYLOAD_SIZE})))']
+
+
+def _sink(path, status=0):
+    return [sys.executable, '-c',
+            f'import shutil, sys; shutil.copyfileobj(sys.stdin.buffer, open({path!r}, "wb")); '
+            f'sys.exit({status})']
+
+
+class TeePipeTest(unittest.TestCase):
+    def setUp(self):
+        f = tempfile.NamedTemporaryFile(delete=False)
+        f.close()
+        self.out = f.name
+        self.addCleanup(os.unlink, self.out)
+
+    def test_consumer_and_sink_see_the_same_bytes(self):
+        seen = bytearray()
+        total = stream.tee_pipe(SOURCE, _sink(self.out), seen.extend)
+        expected = bytes(i % 251 for i in range(PAYLOAD_SIZE))
+        self.assertEqual(total, PAYLOAD_SIZE)
+        self.assertEqual(bytes(seen), expected)
+        with open(self.out, 'rb') as f:
+            self.assertEqual(f.read(), expected)
+
+    def test_started_sees_both_processes(self):
+        started = []
+        stream.tee_pipe(SOURCE, _sink(self.out), lambda chunk: None, started=started.append)
+        self.assertEqual([process.args for process in started], [SOURCE, _sink(self.out)])
+
+    def test_source_failure_raises(self):
+        with self.assertRaises(subprocess.CalledProcessError):
+            stream.tee_pipe([sys.executable, '-c', 'raise SystemExit(3)'],
+                            _sink(self.out), lambda chunk: None)
+
+    def test_sink_failure_raises(self):
+        with self.assertRaises(subprocess.CalledProcessError):
+            stream.tee_pipe(SOURCE, _sink(self.out, status=1), lambda chunk: None)
+
+
+class ArgsTest(unittest.TestCase):
+    def test_cdparanoia_keeps_drive_options_and_replaces_span(self):
+        self.assertEqual(
+            stream.cdparanoia_args('-d /dev/sr1 -O 6 --batch 1:- -z', 4),
+            ['-d', '/dev/sr1', '-O', '6', '-z', '--output-raw-little-endian', '4', '-'])
+
+    def test_drive_options_leave_out_batch_mode_and_span(self):
+        self.assertEqual(stream.drive_args('-d /dev/sr1 -O 6 --batch 1:- -z'),
+                         ['-d', '/dev/sr1', '-O', '6', '-z'])
+
+    def test_offset_correction_replaces_the_configured_offset(self):
+        for opts in ('-d /dev/sr1 -O 6 -z', '-d /dev/sr1 -O6 -z', '-d /dev/sr1 --sample-offset=6 -z'):
+            with self.subTest(opts=opts):
+                self.assertEqual(stream.sample_offset(opts), 6)
+                self.assertEqual(stream.drive_args(opts, -10), ['-d', '/dev/sr1', '-z', '-O', '-4'])
+        self.assertEqual(stream.drive_args('-z', 3), ['-z', '-O', '3'])
+
+    def test_flac_reads_raw_stdin(self):
+        args = stream.flac_args('--verify --delete-input-file', 'out.flac')
+        self.assertNotIn('--delete-input-file', args)
+        self.assertEqual(args[0], '--verify')
+        self.assertIn('--force-raw-format', args)
+        self.assertEqual(args[-3:], ['-o', 'out.flac', '-'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for cdripper/textlog.py.
+
+Run with:  python3 -m unittest test_textlog
+
+The module is imported directly by path so that importing the ``cdripper``
+package (which pulls in ``discid`` and ``picard``) is not required.
+"""
+
+import importlib.util
+import os
+import subprocess
+import sys
+import unittest
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+_spec = importlib.util.spec_from_file_location(
+    'textlog', os.path.join(_HERE, 'cdripper', 'textlog.py')
+)
+textlog = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(textlog)
+
+
+class LineDecoderTest(unittest.TestCase):
+    def setUp(self):
+        self.lines = []
+        self.decoder = textlog.LineDecoder(self.lines.append)
+
+    def test_lines_and_utf8_split_across_reads(self):
+        data = 'Ripping “Café”\nTrack 2\n'.encode('utf-8')
+        for i in range(len(data)):
+            self.decoder.feed(data[i:i + 1])
+        self.assertEqual(self.lines, ['Ripping “Café”', 'Track 2'])
+
+    def test_final_flushes_unterminated_line(self):
+        self.decoder.feed(b'done')
+        self.assertEqual(self.lines, [])
+        self.decoder.feed(b'', final=True)
+        self.assertEqual(self.lines, ['done'])
+
+    def test_progress_redraws_keep_last_state(self):
+        self.decoder.feed(b'10%\r50%\r100%\r\nok\r\n')
+        self.assertEqual(self.lines, ['100%', 'ok'])
+
+    def test_last_lines_are_kept(self):
+        decoder = textlog.LineDecoder(self.lines.append, keep=2)
+        decoder.feed(b'one\ntwo\nthree')
+        decoder.feed(b'', final=True)
+        self.assertEqual(list(decoder.last), ['two', 'three'])
+        self.assertEqual(list(self.decoder.last), [])
+
+    def test_read_until_the_process_exits(self):
+        process = subprocess.Popen([sys.executable, '-c', 'print("a"); print("b", end="")'],
+                                   stdout=subprocess.PIPE)
+        self.decoder.read(process.stdout)
+        process.wait()
+        self.assertEqual(self.lines, ['a', 'b'])
+        self.assertTrue(process.stdout.closed)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""Unit tests for cdripper/trackstore.py.
+
+Run with:  python3 -m unittest test_trackstore
+
+The module is imported directly by path so that importing the ``cdripper``
+package (which pulls in ``discid`` and ``picard``) is not required.
+"""
+
+import importlib.util
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+_spec = importlib.util.spec_from_file_location(
+    'trackstore', os.path.join(_HERE, 'cdripper', 'trackstore.py')
+)
+trackstore = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(trackstore)
+
+DISC = '003-00000001-00000002-00000003'
+
+
+def _result(crc, confidence=5, ok=True):
+    return {'ok': ok, 'confidence': confidence, 'status': 'Accurate', 'crc': crc}
+
+
+class TrackStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.store = trackstore.TrackStore(os.path.join(self.dir, 'store'))
+
+    def _flac(self, data):
+        path = os.path.join(self.dir, 'track.flac')
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def _read(self, path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def test_put_then_get(self):
+        self.assertIsNone(self.store.get(DISC, 1))
+        self.assertTrue(self.store.put(DISC, 1, self._flac(b'one'), _result('0000ABCD')))
+        path, result = self.store.get(DISC, 1)
+        self.assertEqual(self._read(path), b'one')
+        self.assertEqual(result['crc'], '0000ABCD')
+        self.assertIsNone(self.store.get(DISC, 2))
+        self.assertIsNone(self.store.get('003-00000001-00000002-00000004', 1))
+
+    def test_only_tracks_confirmed_by_accuraterip_are_kept(self):
+        flac = self._flac(b'one')
+        self.assertFalse(self.store.put(DISC, 1, flac, _result('00000001', ok=False)))
+        self.assertFalse(self.store.put(DISC, 1, flac, _result('00000001', confidence=0)))
+        self.assertFalse(self.store.put(DISC, 1, flac, {'ok': True, 'confidence': 5}))
+        self.assertIsNone(self.store.get(DISC, 1))
+
+    def test_best_confirmed_rip_is_returned(self):
+        self.store.put(DISC, 1, self._flac(b'low'), _result('00000001', confidence=2))
+        self.store.put(DISC, 1, self._flac(b'high'), _result('00000002', confidence=9))
+        path, result = self.store.get(DISC, 1)
+        self.assertEqual((self._read(path), result['confidence']), (b'high', 9))
+
+    def test_truncated_file_is_a_miss(self):
+        self.store.put(DISC, 1, self._flac(b'one'), _result('00000001'))
+        path, _ = self.store.get(DISC, 1)
+        with open(path, 'wb') as f:
+            f.write(b'o')
+        self.assertIsNone(self.store.get(DISC, 1))
+
+    def test_least_recently_used_tracks_are_evicted(self):
+        self.store.max_bytes = 2048
+        for tn in (1, 2):
+            self.store.put(DISC, tn, self._flac(b'x' * 600), _result(f'0000000{tn}'))
+        then = time.time() - 60
+        for name in os.listdir(self.store.directory):
+            os.utime(os.path.join(self.store.directory, name), (then, then))
+        self.store.get(DISC, 1)  # now more recently used than track 2
+        self.store.put(DISC, 3, self._flac(b'x' * 600), _result('00000003'))
+
+        self.assertIsNotNone(self.store.get(DISC, 1))
+        self.assertIsNone(self.store.get(DISC, 2))
+        self.assertIsNotNone(self.store.get(DISC, 3))
+        self.assertEqual(len(os.listdir(self.store.directory)), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()